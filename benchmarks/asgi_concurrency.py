@@ -0,0 +1,192 @@
+"""
+Compares WSGI and ASGI serving of character reads when storage is slow.
+
+Every sheet read sleeps for --latency seconds to stand in for network or
+busy-disk storage. WSGI requests are served by --workers threads, like that
+many sync gunicorn workers; ASGI requests by one event loop that pushes the
+blocking reads to threads. Both run in process against a throwaway SQLite
+database, no server is needed:
+
+    python -m benchmarks.asgi_concurrency --requests 400 --latency 0.1
+
+Once request handling itself saturates the CPU, ASGI stops gaining; the
+gap shows how much of a sync worker's time is spent waiting.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import wsgiref.util
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+
+def setup_django(workdir: Path, characters: int, latency: float) -> list[str]:
+    """Prepares a database with characters and returns URLs to request."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "my_app.settings")
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.DATABASES["default"]["NAME"] = workdir / "bench.sqlite3"
+    settings.MEDIA_ROOT = workdir / "media"
+    settings.CHARACTER_STORAGE = "file"
+    # every request has to go to storage
+    settings.CHARACTER_SHEET_CACHE = {"MAX_ENTRIES": 0, "SHARED_CACHE": None}
+    settings.ALLOWED_HOSTS = ["*"]
+    settings.DEBUG = False
+
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+
+    from dnd.models import Campaign, Character, Player
+
+    player = Player.objects.create(telegram_id=1)
+    campaign = Campaign.objects.create(title="Benchmark")
+    ids = []
+    for n in range(characters):
+        char_obj = Character.objects.create(owner=player, campaign=campaign)
+        char_obj.save_data({"name": f"Character {n}", "level": n % 20})
+        ids.append(char_obj.id)
+
+    # slow down the storage itself, whichever way the views read sheets
+    storage = Character._meta.get_field("data").storage
+    storage_open = storage.open
+
+    def slow_open(*args, **kwargs):
+        time.sleep(latency)
+        return storage_open(*args, **kwargs)
+
+    storage.open = slow_open
+    return [f"/api/character/get/?char_id={char_id}" for char_id in ids]
+
+
+def wsgi_request(application, url: str) -> float:
+    started = time.perf_counter()
+    parts = urlsplit(url)
+    environ = {"PATH_INFO": parts.path, "QUERY_STRING": parts.query}
+    wsgiref.util.setup_testing_defaults(environ)
+    statuses = []
+    body = application(
+        environ, lambda status, headers: statuses.append(status)
+    )
+    b"".join(body)
+    body.close()
+    if not statuses[0].startswith("200"):
+        raise RuntimeError(f"{url}: {statuses[0]}")
+    return time.perf_counter() - started
+
+
+async def asgi_request(application, url: str) -> float:
+    started = time.perf_counter()
+    parts = urlsplit(url)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "server": ("localhost", 80),
+        "client": ("127.0.0.1", 50000),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    statuses = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # the client never disconnects
+        await asyncio.Future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await application(scope, receive, send)
+    if statuses[0] != 200:
+        raise RuntimeError(f"{url}: {statuses[0]}")
+    return time.perf_counter() - started
+
+
+def run_wsgi(urls: list[str], workers: int) -> tuple[float, list[float]]:
+    from my_app.wsgi import application
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(
+            pool.map(lambda url: wsgi_request(application, url), urls)
+        )
+    return time.perf_counter() - started, latencies
+
+
+def run_asgi(urls: list[str], concurrency: int) -> tuple[float, list[float]]:
+    from my_app.asgi import application
+
+    async def main():
+        limit = asyncio.Semaphore(concurrency)
+
+        async def limited(url):
+            async with limit:
+                return await asgi_request(application, url)
+
+        return await asyncio.gather(*(limited(url) for url in urls))
+
+    started = time.perf_counter()
+    latencies = asyncio.run(main())
+    return time.perf_counter() - started, latencies
+
+
+def report(name: str, elapsed: float, latencies: list[float]):
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:<28} {len(latencies) / elapsed:8.1f} req/s"
+        f"  p50 {quantiles[49] * 1000:7.1f} ms"
+        f"  p95 {quantiles[94] * 1000:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--characters", type=int, default=50)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.1,
+        help="seconds added to every sheet read",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="sync WSGI workers"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=32,
+        help="requests in flight against the ASGI app",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        urls = setup_django(Path(workdir), args.characters, args.latency)
+        urls = [urls[n % len(urls)] for n in range(args.requests)]
+
+        report(f"WSGI, {args.workers} workers", *run_wsgi(urls, args.workers))
+        report(
+            f"ASGI, {args.concurrency} in flight",
+            *run_asgi(urls, args.concurrency),
+        )
+
+
+if __name__ == "__main__":
+    main()
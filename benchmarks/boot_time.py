@@ -0,0 +1,116 @@
+"""
+Measures how long a fresh worker takes to boot and answer its first request.
+
+For each settings module a new interpreter imports the WSGI application and
+serves GET /api/ping/ in process. Wall time of the whole run is reported
+as time to first response, and one run under -X importtime breaks the
+imports down by top-level package:
+
+    python -m benchmarks.boot_time my_app.settings my_app.settings_api
+
+Exits with status 1 when the median time exceeds --max-ms or a module
+from --forbid gets imported during boot, so it can guard CI.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+BOOT = """
+import os, sys, wsgiref.util
+os.environ["DJANGO_SETTINGS_MODULE"] = sys.argv[1]
+from my_app.wsgi import application
+environ = {"PATH_INFO": "/api/ping/"}
+wsgiref.util.setup_testing_defaults(environ)
+statuses = []
+b"".join(application(environ, lambda status, headers: statuses.append(status)))
+assert statuses[0].startswith("200"), statuses[0]
+print(" ".join(sorted(sys.modules)))
+"""
+
+
+def boot(settings_module: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *options, "-c", BOOT, settings_module],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def time_to_first_response(settings_module: str, runs: int) -> list[float]:
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        boot(settings_module)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def import_times(settings_module: str) -> tuple[Counter, set[str]]:
+    """Self import time in microseconds per top-level package."""
+    result = boot(settings_module, "-X", "importtime")
+    packages = Counter()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        packages[name.strip().split(".")[0]] += int(self_us)
+    return packages, set(result.stdout.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "settings",
+        nargs="*",
+        default=["my_app.settings", "my_app.settings_api"],
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument(
+        "--max-ms", type=float, help="fail above this median boot time"
+    )
+    parser.add_argument(
+        "--forbid",
+        nargs="*",
+        default=["PIL"],
+        help="modules that must not be imported while booting",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for settings_module in args.settings:
+        times = time_to_first_response(settings_module, args.runs)
+        packages, modules = import_times(settings_module)
+        median = statistics.median(times) * 1000
+
+        print(f"{settings_module}")
+        print(
+            f"  first response  median {median:7.1f} ms"
+            f"  min {min(times) * 1000:7.1f} ms  ({args.runs} runs)"
+        )
+        print(f"  imports         {sum(packages.values()) / 1000:7.1f} ms")
+        for package, self_us in packages.most_common(args.top):
+            print(f"    {package:<24} {self_us / 1000:7.1f} ms")
+
+        forbidden = sorted(set(args.forbid) & modules)
+        if forbidden:
+            print(f"  imported at boot: {', '.join(forbidden)}")
+            failed = True
+        if args.max_ms is not None and median > args.max_ms:
+            print(f"  slower than {args.max_ms} ms")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Compares database connection handling for a simple campaign read.
+
+Each mode runs in its own interpreter with the DB_* variables of
+my_app.database set accordingly:
+
+    connect     DB_CONN_MAX_AGE=0, a new connection for every request
+    persistent  DB_CONN_MAX_AGE=600, one connection per thread kept open
+    pooled      DB_POOL=true, connections borrowed from a psycopg pool
+
+The database itself comes from the environment, as for the application.
+A throwaway test database is created next to it and dropped afterwards;
+requests go through the WSGI application in process:
+
+    DATABASE=POSTGRESQL DB_HOST=127.0.0.1 python -m benchmarks.db_connections
+
+On SQLite opening a connection is cheap and pooled is skipped; the gap
+grows with the network round trips and authentication of a real server.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+MODES = {
+    "connect": {"DB_CONN_MAX_AGE": "0", "DB_POOL": "false"},
+    "persistent": {"DB_CONN_MAX_AGE": "600", "DB_POOL": "false"},
+    "pooled": {"DB_POOL": "true"},
+}
+
+RUN = """
+import json, os, sys, tempfile, time, wsgiref.util
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["DJANGO_SETTINGS_MODULE"] = "my_app.settings"
+import django
+from django.conf import settings
+
+django.setup()
+settings.ALLOWED_HOSTS = ["*"]
+settings.DEBUG = False
+
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+
+test_name = f"{tempfile.mkdtemp()}/bench.sqlite3"
+if connection.vendor == "postgresql":
+    test_name = "dnd_bench_connections"
+connection.settings_dict["TEST"]["NAME"] = test_name
+old_name = connection.creation.create_test_db(
+    verbosity=0, autoclobber=True, serialize=False
+)
+
+from dnd.models import Campaign
+from my_app.wsgi import application
+
+campaign_id = Campaign.objects.create(title="Benchmark").id
+connection.close()
+
+connects = []
+connection_created.connect(lambda **kwargs: connects.append(1), weak=False)
+
+
+def get(_):
+    environ = {
+        "PATH_INFO": "/api/campaign/get/",
+        "QUERY_STRING": f"campaign_id={campaign_id}",
+    }
+    wsgiref.util.setup_testing_defaults(environ)
+    statuses = []
+    b"".join(application(environ, lambda s, h: statuses.append(s)))
+    assert statuses[0].startswith("200"), statuses[0]
+
+
+requests, threads = int(sys.argv[1]), int(sys.argv[2])
+with ThreadPoolExecutor(threads) as pool:
+    list(pool.map(get, range(threads)))  # warm up
+    connects.clear()
+    started = time.perf_counter()
+    list(pool.map(get, range(requests)))
+    elapsed = time.perf_counter() - started
+    # persistent connections live in the worker threads, close them there
+    list(pool.map(lambda _: close_old_connections(), range(threads)))
+
+request_finished.disconnect(close_old_connections)
+connection.creation.destroy_test_db(old_name, verbosity=0)
+print(json.dumps({
+    "vendor": connection.vendor,
+    "elapsed": elapsed,
+    "connects": len(connects),
+}))
+"""
+
+
+def run_mode(mode: str, requests: int, threads: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", RUN, str(requests), str(threads)],
+        cwd=BASE_DIR,
+        env={**os.environ, **MODES[mode]},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        sys.exit(f"{mode} failed:\n{result.stderr}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument(
+        "--modes", nargs="*", choices=list(MODES), default=list(MODES)
+    )
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        if mode == "pooled" and os.environ.get("DATABASE", "").upper() in {
+            "",
+            "SQLITE3",
+        }:
+            print(f"{mode:<12} skipped, pools need PostgreSQL")
+            continue
+        result = run_mode(mode, args.requests, args.threads)
+        print(
+            f"{mode:<12} {args.requests / result['elapsed']:8.1f} req/s"
+            f"  {result['elapsed'] / args.requests * 1000:6.2f} ms/req"
+            f"  {result['connects']:5d} connections ({result['vendor']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
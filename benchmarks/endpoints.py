@@ -0,0 +1,318 @@
+"""
+Benchmarks the main API endpoints at several dataset sizes.
+
+Each size gets a fresh SQLite database in a temporary directory with that
+many campaigns, twice as many players, a few members per campaign and one
+character (with the sheet from dnd/tests/example-character.json) per
+campaign. Every scenario then sends --requests requests one after another
+through the Django test client, picking ids with a fixed --seed, so runs
+are comparable:
+
+    python -m benchmarks.endpoints --sizes 100 1000 --output results.json
+
+Throughput and p50/p95/p99 latency are printed and written as JSON. With
+--baseline the results are compared with a stored run and the command
+exits with status 1 when a scenario got slower than --threshold allows
+(p95 up or throughput down by more than that share). Timings depend on the
+machine: record the baseline where it is compared, with --update-baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "endpoints_baseline.json"
+SHEET = BASE_DIR / "dnd" / "tests" / "example-character.json"
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "my_app.settings")
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.ALLOWED_HOSTS = ["*"]
+    settings.DEBUG = False
+    settings.METRICS = {"TOKEN": "", "DIR": "", "FLUSH_SECONDS": 3600}
+
+
+def use_database(path: Path):
+    """Points the default connection at a new database and migrates it."""
+    from django.core.cache import caches
+    from django.core.management import call_command
+    from django.db import connection
+
+    from dnd.services.sheet_cache import get_sheet_cache
+
+    connection.close()
+    connection.settings_dict["NAME"] = path
+    call_command("migrate", verbosity=0)
+    for cache in caches.all():
+        cache.clear()
+    get_sheet_cache().clear()
+
+
+def seed(size: int, rng: random.Random) -> dict:
+    from dnd.models import Campaign, CampaignMembership, Character, Player
+
+    sheet = json.loads(SHEET.read_text(encoding="utf-8"))
+    players = Player.objects.bulk_create(
+        Player(telegram_id=100_000 + n) for n in range(size * 2)
+    )
+    campaigns = Campaign.objects.bulk_create(
+        Campaign(title=f"Campaign {n}", private=n % 5 == 0)
+        for n in range(size)
+    )
+    memberships = []
+    members = {}
+    for n, campaign in enumerate(campaigns):
+        owner = players[n]
+        others = rng.sample(players, 4)
+        members[campaign.id] = [p.id for p in others if p is not owner]
+        memberships.append(
+            CampaignMembership(user=owner, campaign=campaign, status=2)
+        )
+        memberships += [
+            CampaignMembership(user=p, campaign=campaign, status=0)
+            for p in others
+            if p is not owner
+        ]
+    CampaignMembership.objects.bulk_create(memberships, batch_size=500)
+    characters = Character.objects.bulk_create(
+        (
+            Character(
+                owner=players[n], campaign=campaign, sheet=sheet, version=1
+            )
+            for n, campaign in enumerate(campaigns)
+        ),
+        batch_size=200,
+    )
+    return {
+        "sheet": sheet,
+        "players": players,
+        "campaigns": campaigns,
+        "members": members,
+        "characters": [c.id for c in characters],
+    }
+
+
+def scenarios(data: dict, rng: random.Random) -> dict[str, Callable]:
+    """name -> function sending one request and returning the response."""
+    from django.test import Client
+
+    client = Client()
+    players, campaigns = data["players"], data["campaigns"]
+
+    def post(url, body):
+        return client.post(
+            url, json.dumps(body), content_type="application/json"
+        )
+
+    def owned():
+        n = rng.randrange(len(campaigns))
+        return campaigns[n], players[n]
+
+    def ping():
+        return client.get("/api/ping/")
+
+    def campaign_create():
+        return post(
+            "/api/campaign/create/",
+            {
+                "telegram_id": rng.choice(players).telegram_id,
+                "title": "Benchmark",
+            },
+        )
+
+    def campaign_get():
+        campaign, owner = owned()
+        return client.get(
+            f"/api/campaign/get/?campaign_id={campaign.id}&user_id={owner.id}"
+        )
+
+    def campaign_list():
+        return client.get(
+            f"/api/campaign/get/?user_id={rng.choice(players).id}&limit=50"
+        )
+
+    def membership_add():
+        campaign, owner = owned()
+        return post(
+            f"/api/campaign/{campaign.id}/add/",
+            {"owner_id": owner.id, "user_id": rng.choice(players).id},
+        )
+
+    def membership_edit():
+        campaign, owner = owned()
+        return post(
+            f"/api/campaign/{campaign.id}/edit-permissions/",
+            {
+                "owner_id": owner.id,
+                "user_id": rng.choice(data["members"][campaign.id]),
+                "status": rng.choice([0, 1]),
+            },
+        )
+
+    def character_upload():
+        campaign, owner = owned()
+        return post(
+            "/api/character/post/",
+            {
+                "owner_id": owner.id,
+                "campaign_id": campaign.id,
+                "data": data["sheet"],
+            },
+        )
+
+    def character_get():
+        return client.get(
+            f"/api/character/get/?char_id={rng.choice(data['characters'])}"
+        )
+
+    return {
+        "ping": ping,
+        "campaign_create": campaign_create,
+        "campaign_get": campaign_get,
+        "campaign_list": campaign_list,
+        "membership_add": membership_add,
+        "membership_edit": membership_edit,
+        "character_upload": character_upload,
+        "character_get": character_get,
+    }
+
+
+def measure(send: Callable, requests: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        send()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        sent = time.perf_counter()
+        response = send()
+        latencies.append(time.perf_counter() - sent)
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"{response.status_code}: {response.content[:200]!r}"
+            )
+    elapsed = time.perf_counter() - started
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(quantiles[49] * 1000, 3),
+        "p95_ms": round(quantiles[94] * 1000, 3),
+        "p99_ms": round(quantiles[98] * 1000, 3),
+    }
+
+
+def run(args) -> dict:
+    import django
+
+    setup_django()
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            rng = random.Random(args.seed)
+            use_database(Path(workdir) / f"bench-{size}.sqlite3")
+            data = seed(size, rng)
+            results[str(size)] = {}
+            for name, send in scenarios(data, rng).items():
+                if args.only and name not in args.only:
+                    continue
+                result = measure(send, args.requests, args.warmup)
+                results[str(size)][name] = result
+                print(
+                    f"{size:>7} {name:<18} {result['rps']:8.1f} req/s"
+                    f"  p50 {result['p50_ms']:7.2f} ms"
+                    f"  p95 {result['p95_ms']:7.2f} ms"
+                    f"  p99 {result['p99_ms']:7.2f} ms"
+                )
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "machine": platform.machine(),
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def regressions(current: dict, baseline: dict, threshold: float) -> list:
+    found = []
+    for size, scenarios_ in current["results"].items():
+        for name, result in scenarios_.items():
+            before = baseline["results"].get(size, {}).get(name)
+            if before is None:
+                continue
+            if result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+                found.append(
+                    f"{size} {name}: p95 {before['p95_ms']} ms"
+                    f" -> {result['p95_ms']} ms"
+                )
+            if result["rps"] < before["rps"] * (1 - threshold):
+                found.append(
+                    f"{size} {name}: {before['rps']} req/s"
+                    f" -> {result['rps']} req/s"
+                )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="*", help="scenarios to run")
+    parser.add_argument("--output", type=Path, help="write results here")
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        nargs="?",
+        const=BASELINE,
+        help=f"compare with this run (default {BASELINE.name})",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed slowdown against the baseline, 0.25 = 25%%",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store the results as the new baseline",
+    )
+    args = parser.parse_args()
+
+    current = run(args)
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2) + "\n")
+    if args.update_baseline:
+        path = args.baseline or BASELINE
+        path.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"baseline written to {path}")
+        return
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        found = regressions(current, baseline, args.threshold)
+        for line in found:
+            print(f"regression: {line}")
+        if found:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
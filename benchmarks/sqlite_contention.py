@@ -0,0 +1,197 @@
+"""
+Measures SQLite under concurrent writers, as with several gunicorn workers
+sharing db.sqlite3.
+
+--processes interpreters serve a mix of writes (campaign creations and bulk
+membership edits, which read before they write in one transaction) and
+campaign list reads through the WSGI application for --seconds against one
+database file, once with the default settings and once with
+DB_SQLITE_TUNED=true:
+
+    python -m benchmarks.sqlite_contention --processes 4 --writes 0.3
+
+Failed requests are mostly "database is locked" errors; the tuned mode
+should have none and more reads, as WAL lets them run beside the writer.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SETUP = """
+import os, sys
+os.environ["DJANGO_SETTINGS_MODULE"] = "my_app.settings"
+import django
+
+django.setup()
+from django.core.management import call_command
+
+call_command("migrate", verbosity=0)
+from dnd.models import Campaign, CampaignMembership, Player
+
+# player n owns campaign n
+players = Player.objects.bulk_create(
+    Player(telegram_id=n) for n in range(1, int(sys.argv[1]) + 1)
+)
+campaigns = Campaign.objects.bulk_create(
+    Campaign(title=f"Campaign {p.id}") for p in players
+)
+CampaignMembership.objects.bulk_create(
+    CampaignMembership(user=p, campaign=c, status=2)
+    for p, c in zip(players, campaigns)
+)
+"""
+
+WORKER = """
+import json, logging, os, random, sys, time, wsgiref.util
+os.environ["DJANGO_SETTINGS_MODULE"] = "my_app.settings"
+import django
+from django.conf import settings
+
+django.setup()
+settings.ALLOWED_HOSTS = ["*"]
+settings.DEBUG = False
+logging.disable(logging.CRITICAL)  # failed requests are counted instead
+
+from my_app.wsgi import application
+
+seed, players, seconds, writes = sys.argv[1:]
+rng = random.Random(int(seed))
+
+
+def call(method, path, query="", body=b""):
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+    }
+    wsgiref.util.setup_testing_defaults(environ)
+    environ["wsgi.input"].write(body)
+    environ["wsgi.input"].seek(0)
+    statuses = []
+    b"".join(application(environ, lambda s, h: statuses.append(s)))
+    return int(statuses[0].split()[0])
+
+
+result = {"read": [], "write": [], "failed": 0}
+deadline = time.perf_counter() + float(seconds)
+while time.perf_counter() < deadline:
+    started = time.perf_counter()
+    owner = rng.randint(1, int(players))
+    roll = rng.random()
+    if roll < float(writes) / 2:
+        kind = "write"
+        body = json.dumps({
+            "telegram_id": owner,
+            "title": f"Campaign {rng.random()}",
+        }).encode()
+        status = call("POST", "/api/campaign/create/", body=body)
+    elif roll < float(writes):
+        # reads memberships, then writes them in one transaction
+        kind = "write"
+        members = rng.sample(range(1, int(players) + 1), 5)
+        body = json.dumps({
+            "owner_id": owner,
+            "changes": [
+                {"user_id": user_id, "status": rng.choice([0, 1, None])}
+                for user_id in members
+                if user_id != owner
+            ],
+        }).encode()
+        status = call("POST", f"/api/campaign/{owner}/members/", body=body)
+    else:
+        kind = "read"
+        status = call("GET", "/api/campaign/get/", "limit=20")
+    if status >= 500:
+        result["failed"] += 1
+    else:
+        result[kind].append(time.perf_counter() - started)
+print(json.dumps(result))
+"""
+
+
+def run(tuned: bool, args) -> dict:
+    workdir = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        "DATABASE": "SQLITE3",
+        "DB_NAME": f"{workdir}/contention.sqlite3",
+        "DB_SQLITE_TUNED": "true" if tuned else "false",
+        "DB_CONN_MAX_AGE": "600",
+    }
+    subprocess.run(
+        [sys.executable, "-c", SETUP, str(args.players)],
+        cwd=BASE_DIR,
+        env=env,
+        check=True,
+    )
+    workers = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                WORKER,
+                str(n),
+                str(args.players),
+                str(args.seconds),
+                str(args.writes),
+            ],
+            cwd=BASE_DIR,
+            env=env,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for n in range(args.processes)
+    ]
+    total = {"read": [], "write": [], "failed": 0}
+    for worker in workers:
+        stdout, _ = worker.communicate()
+        if worker.returncode:
+            sys.exit(f"worker failed with status {worker.returncode}")
+        result = json.loads(stdout.splitlines()[-1])
+        total["read"] += result["read"]
+        total["write"] += result["write"]
+        total["failed"] += result["failed"]
+    return total
+
+
+def describe(times: list[float], seconds: float) -> str:
+    if not times:
+        return "      none"
+    p95 = statistics.quantiles(times, n=20)[-1] if len(times) > 1 else 0
+    return (
+        f"{len(times) / seconds:8.1f}/s"
+        f"  p50 {statistics.median(times) * 1000:6.1f} ms"
+        f"  p95 {p95 * 1000:6.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument(
+        "--writes", type=float, default=0.3, help="share of writes"
+    )
+    parser.add_argument("--players", type=int, default=100)
+    args = parser.parse_args()
+
+    for tuned in (False, True):
+        total = run(tuned, args)
+        print("tuned" if tuned else "default")
+        print(f"  reads   {describe(total['read'], args.seconds)}")
+        print(f"  writes  {describe(total['write'], args.seconds)}")
+        print(f"  failed  {total['failed']:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,109 +1,367 @@
 import base64
-from io import BytesIO
+import binascii
+import json
+from collections.abc import AsyncIterator, Iterator
+from typing import Literal
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.core.files.base import ContentFile
-from django.http import HttpRequest
-from django.shortcuts import get_object_or_404
-from ninja import Router
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from ninja import Query, Router
 from ninja.errors import HttpError
 from ninja.responses import Response
-from PIL import Image as PILImage
 
-from dnd.models import Campaign, CampaignMembership, Player
+from dnd.models import Campaign, CampaignMembership, Character, Player
 from dnd.schemas import (
     AddToCampaignRequest,
+    BulkMembershipOut,
+    BulkMembershipRequest,
     CampaignEditPermissions,
     CampaignModelSchema,
+    CampaignPage,
+    CharacterOut,
     CreateCampaignRequest,
     ForbiddenError,
+    MembershipOutcome,
     Message,
     NotFoundError,
     ValidationError,
 )
+from dnd.services.campaign_icons import schedule_icon
+from dnd.services.counts import estimate_count
+from dnd.services.etag import aggregate_etag, etag_matches, not_modified
+from dnd.services.roles import invalidate_roles, is_owner
+from dnd.services.uploads import (
+    UploadRejectedError,
+    check_image,
+    receive_upload,
+)
 
 router = Router()
 
 
+async def aget_visible_campaign_or_404(
+    campaign_id: int, user_id: int | None
+) -> Campaign:
+    """
+    Campaign with the user's role, private ones look non-existent. One
+    query for visible campaigns; a hidden or missing one takes a second
+    query, which tells them apart for their different 404 bodies.
+    """
+    campaign_obj = (
+        await Campaign.objects.visible_to(user_id)
+        .filter(id=campaign_id)
+        .afirst()
+    )
+    if campaign_obj is None:
+        await aget_object_or_404(Campaign, id=campaign_id)
+        # disguise private campaigns as non-existent
+        raise HttpError(404, "requested campaign does not exist")
+    return campaign_obj
+
+
 @router.post(
     "create/",
     response={
         201: Message,
+        400: ValidationError,
         404: NotFoundError,
+        413: ValidationError,
     },
 )
-def create_campaign_api(
+async def create_campaign_api(
     request: HttpRequest,
     campaign_request: CreateCampaignRequest,
 ):
     user_id = campaign_request.telegram_id
-    user_obj = get_object_or_404(Player, telegram_id=user_id)
-
-    campaign_title = campaign_request.title
-
-    campaign_obj = Campaign.objects.create(
-        title=campaign_title,
-        verified=user_obj.verified,
-    )
+    user_obj = await aget_object_or_404(Player, telegram_id=user_id)
 
+    icon = None
     if campaign_request.icon:
-        decoded_icon = base64.b64decode(campaign_request.icon)
-        image = PILImage.open(BytesIO(decoded_icon))
-        buffer = BytesIO()
-        image.save(buffer, format="PNG")
-        buffer.seek(0)
-        campaign_obj.icon = ContentFile(buffer.read(), f"{campaign_title}.png")
-
-    if campaign_request.description:
-        campaign_obj.description = campaign_request.description
-
-    campaign_obj.save()
-
-    CampaignMembership.objects.create(
-        user=user_obj,
-        campaign=campaign_obj,
-        status=2,
-    )
+        try:
+            icon = ContentFile(
+                base64.b64decode(campaign_request.icon, validate=True)
+            )
+        except binascii.Error:
+            return 400, ValidationError(message="Icon is not valid base64")
+        if icon.size > settings.CAMPAIGN_ICON_MAX_BYTES:
+            return 413, ValidationError(message="Upload is too large")
+        try:
+            await sync_to_async(check_image)(icon)
+        except UploadRejectedError as e:
+            return e.status, ValidationError(message=str(e))
+
+    await sync_to_async(_create_campaign)(campaign_request, user_obj, icon)
     return 201, Message(message="created")
 
 
+def _create_campaign(
+    campaign_request: CreateCampaignRequest,
+    user_obj: Player,
+    icon: ContentFile | None,
+):
+    with transaction.atomic():
+        campaign_obj = Campaign.objects.create(
+            title=campaign_request.title,
+            description=campaign_request.description or "",
+            verified=user_obj.verified,
+        )
+
+        # decoding and resizing happen in the worker, see campaign_icons
+        if icon:
+            schedule_icon(campaign_obj, icon)
+
+        CampaignMembership.objects.create(
+            user=user_obj,
+            campaign=campaign_obj,
+            status=2,
+        )
+
+
+@router.post(
+    "{campaign_id}/icon/",
+    response={
+        202: Message,
+        400: ValidationError,
+        403: ForbiddenError,
+        404: NotFoundError,
+        413: ValidationError,
+    },
+)
+async def upload_campaign_icon_api(
+    request: HttpRequest,
+    campaign_id: int,
+    owner_id: int,
+):
+    """
+    Replaces campaign icon with a file sent as the "icon" field of
+    multipart/form-data or as the raw request body. The upload is spooled
+    to disk and only its header is read here, size limits are enforced
+    before any pixels are decoded; the worker does the rest.
+    """
+    campaign_obj = await aget_object_or_404(Campaign, id=campaign_id)
+
+    # Verify owner permissions
+    if not await sync_to_async(is_owner)(campaign_obj.id, owner_id):
+        return 403, ForbiddenError(message="Only the owner can change icon")
+
+    try:
+        await sync_to_async(_receive_icon)(request, campaign_obj)
+    except UploadRejectedError as e:
+        return e.status, ValidationError(message=str(e))
+
+    return 202, Message(message="processing")
+
+
+def _receive_icon(request: HttpRequest, campaign_obj: Campaign):
+    with receive_upload(
+        request, "icon", settings.CAMPAIGN_ICON_MAX_BYTES
+    ) as upload:
+        check_image(upload)
+        schedule_icon(campaign_obj, upload)
+
+
 @router.get(
     "get/",
     response={
-        200: CampaignModelSchema | list[CampaignModelSchema],
+        200: CampaignModelSchema | CampaignPage | list[CampaignModelSchema],
         404: NotFoundError,
     },
 )
-def get_campaign_info_api(
+async def get_campaign_info_api(
     request: HttpRequest,
+    response: HttpResponse,
     campaign_id: int | None = None,
     user_id: int | None = None,
+    cursor: int | None = None,
+    limit: int | None = Query(None, gt=0),
+    include_total: bool = False,
 ):
+    """
+    Returns one campaign by id, or every campaign visible to the user.
+    Passing limit or cursor returns a page ordered by id instead, with
+    next_cursor to pass for the following page; include_total adds an
+    estimated count of all visible campaigns.
+    """
     if campaign_id:
-        campaign_obj = get_object_or_404(Campaign, id=campaign_id)
-
-        if campaign_obj.private:
-            if (
-                not user_id
-                or not CampaignMembership.objects.filter(
-                    campaign=campaign_obj, user_id=user_id
-                ).exists()
-            ):
-                # disguise private campaigns as non-existent
-                raise HttpError(404, "requested campaign does not exist")
-
+        campaign_obj = await aget_visible_campaign_or_404(campaign_id, user_id)
+        # role is part of the representation
+        etag = aggregate_etag(campaign_obj.version, campaign_obj.role)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response["ETag"] = etag
         return campaign_obj
 
-    campaigns = Campaign.objects.filter(private=False)
+    # changes whenever a visible campaign is saved, added or hidden, or the
+    # user's memberships change; each part is answered from an index
+    public = Campaign.objects.filter(private=False)
+    memberships = CampaignMembership.objects.filter(user_id=user_id)
+    etag = aggregate_etag(
+        *(
+            await public.aaggregate(
+                count=Count("id"),
+                last_id=Max("id"),
+                ids=Sum("id"),
+                versions=Sum("version"),
+            )
+        ).values(),
+        *(
+            (
+                await memberships.aaggregate(
+                    count=Count("id"),
+                    ids=Sum("campaign_id"),
+                    roles=Sum("status"),
+                    versions=Sum("campaign__version"),
+                )
+            ).values()
+            if user_id
+            else ()
+        ),
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response["ETag"] = etag
+
+    campaigns = Campaign.objects.visible_to(user_id).order_by("id")
+    if limit is None and cursor is None:
+        return [campaign_obj async for campaign_obj in campaigns]
+
+    limit = min(
+        limit or settings.CAMPAIGN_PAGE_DEFAULT_LIMIT,
+        settings.CAMPAIGN_PAGE_MAX_LIMIT,
+    )
+    if cursor is not None:
+        campaigns = campaigns.filter(id__gt=cursor)
+    items = [campaign_obj async for campaign_obj in campaigns[: limit + 1]]
+
+    page = CampaignPage(
+        items=items[:limit],
+        next_cursor=items[limit - 1].id if len(items) > limit else None,
+    )
+    if include_total:
+        page.total = await sync_to_async(estimate_count)(
+            public, "dnd:campaigns:count:public"
+        )
+        if user_id:
+            page.total += await sync_to_async(estimate_count)(
+                memberships.filter(campaign__private=True),
+                f"dnd:campaigns:count:member:{user_id}",
+            )
+    return page
+
+
+@router.get(
+    "{campaign_id}/characters/",
+    response={
+        200: list[CharacterOut],
+        404: NotFoundError,
+    },
+)
+async def list_campaign_characters_api(
+    request: HttpRequest,
+    campaign_id: int,
+    user_id: int | None = None,
+    after: int | None = None,
+    limit: int | None = Query(None, gt=0),
+    output: Literal["json", "ndjson"] = Query("json", alias="format"),
+):
+    """
+    Streams characters of a campaign ordered by id, as a JSON array or as
+    NDJSON with format=ndjson. Rows are fetched in chunks while the body is
+    written, so memory use does not grow with the campaign. To resume an
+    interrupted stream pass the last received id as after.
+    """
+    campaign_obj = await aget_visible_campaign_or_404(campaign_id, user_id)
+
+    characters = (
+        Character.objects.filter(campaign=campaign_obj)
+        .select_related("owner")
+        .order_by("id")
+    )
+    if after is not None:
+        characters = characters.filter(id__gt=after)
+    if limit is not None:
+        characters = characters[:limit]
 
-    if user_id:
-        user_campaigns = Campaign.objects.filter(
-            id__in=CampaignMembership.objects.filter(
-                user_id=user_id
-            ).values_list("campaign_id", flat=True)
+    # ASGI servers need an async iterator to stream instead of buffering,
+    # WSGI ones a plain one
+    if isinstance(request, ASGIRequest):
+        items = _aroster_items(
+            characters.aiterator(chunk_size=settings.ROSTER_CHUNK_SIZE)
+        )
+        frame = _ajson_array if output == "json" else _andjson
+    else:
+        items = _roster_items(
+            characters.iterator(chunk_size=settings.ROSTER_CHUNK_SIZE)
         )
-        campaigns = campaigns.union(user_campaigns)
+        frame = _json_array if output == "json" else _ndjson
+    return StreamingHttpResponse(
+        frame(items),
+        content_type="application/json"
+        if output == "json"
+        else "application/x-ndjson",
+    )
+
+
+def _roster_item(char_obj: Character, data: dict) -> bytes:
+    item = {
+        "id": char_obj.id,
+        "owner_id": char_obj.owner_id,
+        "owner_telegram_id": char_obj.owner and char_obj.owner.telegram_id,
+        "campaign_id": char_obj.campaign_id,
+        "data": data,
+    }
+    return json.dumps(item, cls=DjangoJSONEncoder).encode()
+
 
-    return list(campaigns)
+def _roster_items(characters: Iterator[Character]) -> Iterator[bytes]:
+    for char_obj in characters:
+        yield _roster_item(char_obj, char_obj.load_data())
+
+
+async def _aroster_items(
+    characters: AsyncIterator[Character],
+) -> AsyncIterator[bytes]:
+    async for char_obj in characters:
+        data = await sync_to_async(char_obj.load_data)()
+        yield _roster_item(char_obj, data)
+
+
+def _json_array(items: Iterator[bytes]) -> Iterator[bytes]:
+    yield b"["
+    for n, item in enumerate(items):
+        yield item if n == 0 else b"," + item
+    yield b"]"
+
+
+async def _ajson_array(items: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    yield b"["
+    first = True
+    async for item in items:
+        yield item if first else b"," + item
+        first = False
+    yield b"]"
+
+
+def _ndjson(items: Iterator[bytes]) -> Iterator[bytes]:
+    for item in items:
+        yield item + b"\n"
+
+
+async def _andjson(items: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    async for item in items:
+        yield item + b"\n"
 
 
 @router.post(
@@ -115,28 +373,26 @@ def get_campaign_info_api(
         404: NotFoundError,
     },
 )
-def add_to_campaign_api(
+async def add_to_campaign_api(
     request: HttpRequest,
     body: AddToCampaignRequest,
     campaign_id: int,
 ):
-    campaign_obj = get_object_or_404(Campaign, id=campaign_id)
+    campaign_obj = await aget_object_or_404(Campaign, id=campaign_id)
 
     # Verify owner permissions
-    if not CampaignMembership.objects.filter(
-        campaign=campaign_obj, user_id=body.owner_id, status=2
-    ).exists():
+    if not await sync_to_async(is_owner)(campaign_obj.id, body.owner_id):
         return 403, ForbiddenError(message="Only the owner can add members")
 
-    user = get_object_or_404(Player, id=body.user_id)
+    user = await aget_object_or_404(Player, id=body.user_id)
 
-    membership, created = CampaignMembership.objects.get_or_create(
+    membership, created = await CampaignMembership.objects.aget_or_create(
         user=user, campaign=campaign_obj, defaults={"status": 0}
     )
 
-    if not created:
+    if not created and membership.status != 0:
         membership.status = 0
-        membership.save()
+        await membership.asave(update_fields=["status"])
 
     return Response(
         {"message": f"User {user.id} added to campaign {campaign_obj.id}"},
@@ -153,31 +409,117 @@ def add_to_campaign_api(
         404: ValidationError,
     },
 )
-def edit_permissions_api(
+async def edit_permissions_api(
     request: HttpRequest, body: CampaignEditPermissions, campaign_id: int
 ):
     if body.status not in [0, 1, 2]:
         return 400, ValidationError(message="Invalid status value")
 
-    campaign_obj = get_object_or_404(Campaign, id=campaign_id)
+    campaign_obj = await aget_object_or_404(Campaign, id=campaign_id)
 
     # Verify owner permissions
-    if not CampaignMembership.objects.filter(
-        campaign=campaign_obj, user_id=body.owner_id, status=2
-    ).exists():
+    if not await sync_to_async(is_owner)(campaign_obj.id, body.owner_id):
         return 403, ForbiddenError(
             message="Only the owner can edit permissions"
         )
 
-    membership = get_object_or_404(
-        CampaignMembership,
-        campaign=campaign_obj,
-        user_id=body.user_id,
-    )
-    membership.status = body.status
-    membership.save()
+    # one UPDATE instead of loading the membership and saving it back
+    updated = await CampaignMembership.objects.filter(
+        campaign=campaign_obj, user_id=body.user_id
+    ).aupdate(status=body.status)
+    if not updated:
+        raise Http404
+    # update() sends no post_save
+    await sync_to_async(invalidate_roles)(campaign_obj.id)
 
     return 200, Message(
         message=f"Updated user {body.user_id} role "
         f"to {body.status} in campaign {campaign_obj.id}"
     )
+
+
+@router.post(
+    "{campaign_id}/members/",
+    response={
+        200: BulkMembershipOut,
+        400: ValidationError,
+        403: ForbiddenError,
+        404: NotFoundError,
+    },
+)
+def bulk_members_api(
+    request: HttpRequest, body: BulkMembershipRequest, campaign_id: int
+):
+    """
+    Adds, re-roles and (with status null) removes many members in one
+    transaction. Users that do not exist are reported as not_found while
+    the other changes still apply. With DEBUG on the response also tells
+    how many queries it took.
+    """
+    changes = {change.user_id: change.status for change in body.changes}
+    if len(changes) != len(body.changes):
+        return 400, ValidationError(message="Each user may appear only once")
+    if len(changes) > settings.MEMBERSHIP_BATCH_MAX:
+        return 400, ValidationError(
+            message=f"At most {settings.MEMBERSHIP_BATCH_MAX} changes allowed"
+        )
+
+    # Django only logs queries with DEBUG on, the log is reset per request
+    logged = len(connection.queries_log)
+    result = _apply_membership_changes(campaign_id, body.owner_id, changes)
+    if settings.DEBUG and isinstance(result, BulkMembershipOut):
+        result.queries = len(connection.queries_log) - logged
+    return result
+
+
+def _apply_membership_changes(
+    campaign_id: int, owner_id: int, changes: dict[int, int | None]
+):
+    campaign_obj = get_object_or_404(Campaign, id=campaign_id)
+
+    if not is_owner(campaign_obj.id, owner_id):
+        return 403, ForbiddenError(message="Only the owner can edit members")
+
+    with transaction.atomic():
+        players = set(
+            Player.objects.filter(id__in=changes).values_list("id", flat=True)
+        )
+        current = dict(
+            CampaignMembership.objects.filter(
+                campaign=campaign_obj, user_id__in=players
+            ).values_list("user_id", "status")
+        )
+
+        results, upserts, removals = [], [], []
+        for user_id, status in changes.items():
+            if user_id not in players:
+                outcome = "not_found"
+            elif status is None:
+                outcome = "removed" if user_id in current else "not_member"
+                removals.append(user_id)
+            elif current.get(user_id) == status:
+                outcome = "unchanged"
+            else:
+                outcome = "updated" if user_id in current else "added"
+                upserts.append(
+                    CampaignMembership(
+                        user_id=user_id, campaign=campaign_obj, status=status
+                    )
+                )
+            results.append(MembershipOutcome(user_id=user_id, result=outcome))
+
+        # upsert also covers members added concurrently since the read
+        CampaignMembership.objects.bulk_create(
+            upserts,
+            update_conflicts=True,
+            unique_fields=["user", "campaign"],
+            update_fields=["status"],
+        )
+        if removals:
+            CampaignMembership.objects.filter(
+                campaign=campaign_obj, user_id__in=removals
+            ).delete()
+
+    # after commit, so no one caches the old roles under the new version
+    invalidate_roles(campaign_obj.id)
+    return BulkMembershipOut(results=results)
@@ -1,14 +1,72 @@
-from django.http import HttpRequest
-from django.shortcuts import get_object_or_404
-from ninja import Router
+import asyncio
+import contextvars
+import copy
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.http import parse_etags
+from ninja import Query, Router
 from ninja.responses import Response
 
 from dnd.models import Campaign, Character, Player
-from dnd.schemas.character import CharacterOut, UploadCharacter
-from dnd.schemas.error import NotFoundError, ValidationError
+from dnd.schemas.character import (
+    CharacterBatchError,
+    CharacterBatchOut,
+    CharacterOut,
+    UploadCharacter,
+)
+from dnd.schemas.error import (
+    ConflictError,
+    NotFoundError,
+    ValidationError,
+)
+from dnd.services.etag import etag_matches, not_modified
+from dnd.services.json_patch import (
+    JsonPatchError,
+    apply_json_patch,
+    merge_patch,
+)
+from my_app import errors as dnd_errors
+from my_app.renderers import splice_json
 
 router = Router()
 
+JSON_PATCH_CONTENT_TYPE = "application/json-patch+json"
+
+
+def character_fields(char_obj: Character) -> dict:
+    """CharacterOut fields other than data."""
+    return {
+        "id": char_obj.id,
+        "owner_id": char_obj.owner_id,
+        "owner_telegram_id": char_obj.owner.telegram_id,
+        "campaign_id": char_obj.campaign_id,
+    }
+
+
+def character_out(
+    char_obj: Character, data: dict | None = None
+) -> CharacterOut:
+    # pass data that was just saved instead of reading it back from storage
+    return CharacterOut(
+        **character_fields(char_obj),
+        data=char_obj.load_data() if data is None else data,
+    )
+
+
+@functools.cache
+def read_pool() -> ThreadPoolExecutor:
+    """Threads shared by requests that read many character sheets."""
+    return ThreadPoolExecutor(
+        max_workers=settings.CHARACTER_READ_WORKERS,
+        thread_name_prefix="character-read",
+    )
+
 
 @router.get(
     "/get/",
@@ -18,16 +76,76 @@ router = Router()
         404: NotFoundError,
     },
 )
-def get_character_api(request: HttpRequest, char_id: int) -> Response:
-    char_obj = get_object_or_404(Character, id=char_id)
+async def get_character_api(request: HttpRequest, char_id: int) -> Response:
+    # sheet is only loaded when the cache has no copy of this version
+    char_obj = await aget_object_or_404(
+        Character.objects.select_related("owner").defer("sheet"), id=char_id
+    )
 
-    return CharacterOut(
-        id=char_obj.id,
-        owner_id=char_obj.owner_id,
-        owner_telegram_id=char_obj.owner.telegram_id,
-        data=char_obj.load_data(),
-        campaign_id=char_obj.campaign_id,
+    if etag_matches(request, char_obj.etag):
+        return not_modified(char_obj.etag)
+    # file reads and deferred sheet loads block, keep them off the loop
+    data = await sync_to_async(char_obj.load_json)()
+    # the stored JSON goes out as is, a sheet is too big to parse and
+    # validate on every read
+    response = HttpResponse(
+        splice_json(character_fields(char_obj), "data", data),
+        content_type="application/json; charset=utf-8",
     )
+    response["ETag"] = char_obj.etag
+    return response
+
+
+@router.get(
+    "batch/",
+    response={
+        200: CharacterBatchOut,
+        400: ValidationError,
+    },
+)
+async def get_characters_batch_api(
+    request: HttpRequest, ids: list[int] = Query(...)
+):
+    """
+    Returns every requested character that could be read, ids that are
+    missing or failed to load are listed in errors instead.
+    """
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > settings.CHARACTER_BATCH_MAX_IDS:
+        return 400, ValidationError(
+            message=f"At most {settings.CHARACTER_BATCH_MAX_IDS} ids allowed"
+        )
+
+    # sheets come with the rows, so worker threads never touch the database
+    char_objs = await Character.objects.select_related("owner").ain_bulk(ids)
+
+    loop = asyncio.get_running_loop()
+    # executor threads do not get the request's context by themselves
+    futures = {
+        char_id: loop.run_in_executor(
+            read_pool(),
+            contextvars.copy_context().run,
+            character_out,
+            char_objs[char_id],
+        )
+        for char_id in ids
+        if char_id in char_objs
+    }
+    await asyncio.wait(futures.values())
+
+    characters, errors = [], []
+    for char_id in ids:
+        if char_id not in futures:
+            errors.append(
+                CharacterBatchError(id=char_id, message="Объект не найден")
+            )
+            continue
+        try:
+            characters.append(futures[char_id].result())
+        except (OSError, ValueError, AttributeError) as e:
+            errors.append(CharacterBatchError(id=char_id, message=str(e)))
+
+    return 200, CharacterBatchOut(characters=characters, errors=errors)
 
 
 @router.post(
@@ -38,18 +156,72 @@ def get_character_api(request: HttpRequest, char_id: int) -> Response:
         404: NotFoundError,
     },
 )
-def upload_character_api(request: HttpRequest, upload: UploadCharacter):
-    owner_obj = get_object_or_404(Player, id=upload.owner_id)
+async def upload_character_api(
+    request: HttpRequest, upload: UploadCharacter, response: HttpResponse
+):
+    owner_obj = await aget_object_or_404(Player, id=upload.owner_id)
 
-    campaign_obj = get_object_or_404(Campaign, id=upload.campaign_id)
+    campaign_obj = await aget_object_or_404(Campaign, id=upload.campaign_id)
+
+    char_obj = await Character.objects.acreate(
+        owner=owner_obj, campaign=campaign_obj
+    )
+    # a new character is at version 0, no need to read it back
+    await sync_to_async(char_obj.save_data)(
+        upload.data, expected_version=char_obj.version
+    )
+
+    response["ETag"] = char_obj.etag
+    return 201, character_out(char_obj, upload.data)
 
-    char_obj = Character.objects.create(owner=owner_obj, campaign=campaign_obj)
-    char_obj.save_data(upload.data)
 
-    return 201, CharacterOut(
-        id=char_obj.id,
-        owner_id=char_obj.owner_id,
-        owner_telegram_id=char_obj.owner.telegram_id,
-        data=char_obj.load_data(),
-        campaign_id=char_obj.campaign_id,
+@router.patch(
+    "{char_id}/",
+    response={
+        200: CharacterOut,
+        400: ValidationError,
+        404: NotFoundError,
+        409: ConflictError,
+    },
+)
+async def patch_character_api(
+    request: HttpRequest, char_id: int, response: HttpResponse
+):
+    """
+    Applies JSON Merge Patch (or JSON Patch, when sent as
+    application/json-patch+json) to character data. Pass the ETag of the
+    edited version in If-Match to get 409 instead of overwriting changes
+    made since then; concurrent patches of one version also get 409.
+    """
+    try:
+        patch = json.loads(request.body)
+    except ValueError:
+        return 400, ValidationError()
+
+    char_obj = await aget_object_or_404(
+        Character.objects.select_related("owner"), id=char_id
     )
+
+    if_match = request.headers.get("If-Match", "*").strip()
+    if if_match != "*" and char_obj.etag not in parse_etags(if_match):
+        raise dnd_errors.ConflictError
+
+    data = copy.deepcopy(await sync_to_async(char_obj.load_data)())
+    try:
+        if request.content_type == JSON_PATCH_CONTENT_TYPE:
+            data = apply_json_patch(data, patch)
+        else:
+            data = merge_patch(data, patch)
+    except JsonPatchError as e:
+        return 400, ValidationError(message=str(e))
+    if not isinstance(data, dict):
+        return 400, ValidationError(message="Character data must be object")
+
+    saved = await sync_to_async(char_obj.save_data)(
+        data, expected_version=char_obj.version
+    )
+    if not saved:
+        raise dnd_errors.ConflictError
+
+    response["ETag"] = char_obj.etag
+    return 200, character_out(char_obj, data)
@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class DndConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "dnd"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        # job handlers and signal receivers register themselves on import
+        from dnd.services import campaign_icons, roles  # noqa: F401
+        from my_app.database import apply_sqlite_pragmas
+        from my_app.metrics import count_queries
+
+        connection_created.connect(
+            apply_sqlite_pragmas, dispatch_uid="dnd_sqlite_pragmas"
+        )
+        connection_created.connect(
+            count_queries, dispatch_uid="dnd_count_queries"
+        )
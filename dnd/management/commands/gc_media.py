@@ -0,0 +1,92 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dnd.models import Campaign, MediaBlob, Player
+from dnd.services.media_storage import get_media_storage
+
+
+def count_references() -> Counter:
+    """Counts how many times each blob is referenced by the models."""
+    references = Counter()
+    campaigns = Campaign.objects.values_list("icon", "icon_thumbnails")
+    for icon, thumbnails in campaigns.iterator(chunk_size=2000):
+        references[icon] += 1
+        references.update(thumbnails.values())
+    pfps = Player.objects.values_list("pfp", flat=True)
+    references.update(pfps.iterator(chunk_size=2000))
+    references.pop("", None)
+    references.pop(None, None)
+    return references
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts references to media blobs and deletes the ones nothing "
+        "refers to."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-seconds",
+            type=int,
+            default=settings.MEDIA_GC_GRACE_SECONDS,
+            help="Keep unreferenced blobs touched more recently than this.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        storage = get_media_storage()
+        # blobs saved right now may not be referenced by their row yet
+        cutoff = timezone.now() - timedelta(seconds=options["grace_seconds"])
+        references = count_references()
+
+        drifted = []
+        deleted = 0
+        for blob in MediaBlob.objects.iterator(chunk_size=2000):
+            refcount = references.get(blob.name, 0)
+            if refcount == 0 and blob.updated_at < cutoff:
+                deleted += 1
+                if not options["dry_run"]:
+                    storage.purge(blob.name)
+                    blob.delete()
+            elif refcount != blob.refcount:
+                blob.refcount = refcount
+                drifted.append(blob)
+
+        if not options["dry_run"]:
+            MediaBlob.objects.bulk_update(drifted, ["refcount"])
+
+        orphans = self.delete_orphan_files(
+            storage, cutoff, dry_run=options["dry_run"]
+        )
+        self.stdout.write(
+            f"deleted {deleted} blob(s) and {orphans} orphan file(s), "
+            f"fixed {len(drifted)} refcount(s)"
+        )
+
+    def delete_orphan_files(self, storage, cutoff, *, dry_run: bool) -> int:
+        """Deletes files left by writers that died before counting them."""
+        known = set(MediaBlob.objects.values_list("name", flat=True))
+        orphans = 0
+        for root, _, files in os.walk(storage.location):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, storage.location).replace(
+                    os.sep, "/"
+                )
+                modified = storage.get_modified_time(name)
+                if name in known or modified >= cutoff:
+                    continue
+                orphans += 1
+                if not dry_run:
+                    os.remove(path)
+        return orphans
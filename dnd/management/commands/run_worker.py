@@ -0,0 +1,58 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from dnd.services import jobs
+
+
+class Command(BaseCommand):
+    help = "Runs background jobs queued in the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when there are no runnable jobs left.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling an empty queue again.",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            default=None,
+            help="Exit after running this many jobs.",
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        done = 0
+        while not self.stopping:
+            if options["max_jobs"] is not None and done >= options["max_jobs"]:
+                break
+            close_old_connections()
+            job = jobs.claim_next()
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+            ok = jobs.run_job(job)
+            done += 1
+            self.stdout.write(
+                f"job {job.id} ({job.kind}): {'done' if ok else 'failed'}"
+            )
+
+        self.stdout.write(f"worker stopped after {done} job(s)")
+
+    def stop(self, signum, frame):
+        # finish the current job, then exit
+        self.stopping = True
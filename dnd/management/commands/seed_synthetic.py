@@ -0,0 +1,260 @@
+import json
+import random
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+
+from dnd.models import Campaign, CampaignMembership, Character, Player
+
+TEMPLATE = (
+    Path(__file__).resolve().parents[2] / "tests" / "example-character.json"
+)
+TELEGRAM_ID_BASE = 7_000_000_000
+
+
+def campaign_sizes(
+    campaigns: int, memberships: int, players: int, skew: float, rng
+) -> list[int]:
+    """
+    Members per campaign, Zipf-distributed: the campaign of popularity rank
+    r gets a share proportional to 1 / r**skew, at least its owner and at
+    most every player.
+    """
+    weights = [1 / rank**skew for rank in range(1, campaigns + 1)]
+    total = sum(weights)
+    sizes = [
+        min(players, max(1, round(memberships * weight / total)))
+        for weight in weights
+    ]
+    rng.shuffle(sizes)  # popular campaigns are not all the oldest ones
+    return sizes
+
+
+def make_sheet(template: dict, number: int, rng) -> dict:
+    """
+    A character sheet shaped like the template, with its own stats and a
+    random part of the template's texts plus extra notes, so sizes range
+    from a few to tens of kilobytes like real sheets. Unchanged parts are
+    shared with the template, do not mutate them.
+    """
+    sheet = dict(template)
+    sheet["name"] = {"value": f"Hero {number}"}
+    level = rng.randint(1, 20)
+    sheet["info"] = {
+        **template["info"],
+        "level": {**template["info"]["level"], "value": level},
+        "experience": {
+            **template["info"]["experience"],
+            "value": level * 300,
+        },
+    }
+    scores = {stat: rng.randint(6, 18) for stat in template["stats"]}
+    sheet["stats"] = {
+        stat: {
+            **value,
+            "score": scores[stat],
+            "modifier": scores[stat] // 2 - 5,
+        }
+        for stat, value in template["stats"].items()
+    }
+    texts = list(template["text"].items())
+    text = {key: value for key, value in texts if rng.random() < 0.6}
+    for n in range(int(rng.lognormvariate(0, 1))):
+        text[f"notes-{n + 7}"] = rng.choice(texts)[1]
+    sheet["text"] = text
+    return sheet
+
+
+class BatchWriter:
+    """
+    Bulk-creates objects in batches of batch_size per model, on up to
+    `workers` threads with their own connections. wait() returns once
+    everything added so far is saved, and raises the first error.
+    """
+
+    def __init__(self, batch_size: int, workers: int):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(workers) if workers > 1 else None
+        self.batches: dict[type, list] = {}
+        self.pending: deque[Future] = deque()
+
+    def add(self, obj):
+        batch = self.batches.setdefault(type(obj), [])
+        batch.append(obj)
+        if len(batch) >= self.batch_size:
+            self.submit(type(obj))
+
+    def submit(self, model):
+        batch = self.batches.pop(model, None)
+        if not batch:
+            return
+        if self.executor is None:
+            model.objects.bulk_create(batch)
+            return
+        # bounded, so batches are not all generated before they are saved
+        while len(self.pending) >= self.workers * 2:
+            self.pending.popleft().result()
+        self.pending.append(self.executor.submit(_insert, batch))
+
+    def wait(self):
+        for model in list(self.batches):
+            self.submit(model)
+        while self.pending:
+            self.pending.popleft().result()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+def _insert(batch: list):
+    try:
+        type(batch[0]).objects.bulk_create(batch)
+    finally:
+        connection.close()  # of this worker thread
+
+
+def next_id(model) -> int:
+    return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Adds synthetic players, campaigns, memberships and characters for "
+        "load testing. The same options and seed give the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=100_000)
+        parser.add_argument("--campaigns", type=int, default=20_000)
+        parser.add_argument("--memberships", type=int, default=1_000_000)
+        parser.add_argument("--characters", type=int, default=200_000)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.0,
+            help="Zipf exponent of campaign popularity, 0 for uniform.",
+        )
+        parser.add_argument(
+            "--private",
+            type=float,
+            default=0.2,
+            help="Share of private campaigns.",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Threads saving batches. SQLite has a single writer, so "
+            "it always uses one.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        workers = options["workers"]
+        if connection.vendor == "sqlite":
+            workers = 1
+        writer = BatchWriter(options["batch_size"], workers)
+        try:
+            self.seed(writer, rng, options)
+        finally:
+            writer.close()
+
+        # rows were created with explicit ids, move sequences past them
+        sql = connection.ops.sequence_reset_sql(
+            no_style(), [Player, Campaign, CampaignMembership, Character]
+        )
+        with connection.cursor() as cursor:
+            for statement in sql:
+                cursor.execute(statement)
+
+    def seed(self, writer: BatchWriter, rng, options):
+        with open(TEMPLATE, encoding="utf-8") as f:
+            template = json.load(f)
+        first_player = next_id(Player)
+        first_campaign = next_id(Campaign)
+        players = options["players"]
+        campaigns = options["campaigns"]
+        if not players and campaigns:
+            raise CommandError("campaigns need at least one player")
+
+        started = time.perf_counter()
+        for n in range(players):
+            player_id = first_player + n
+            writer.add(
+                Player(
+                    id=player_id,
+                    telegram_id=TELEGRAM_ID_BASE + player_id,
+                    bio=f"Player {player_id}" if rng.random() < 0.3 else "",
+                )
+            )
+        writer.wait()
+        self.report("players", players, started)
+
+        started = time.perf_counter()
+        for n in range(campaigns):
+            writer.add(
+                Campaign(
+                    id=first_campaign + n,
+                    title=f"Campaign {first_campaign + n}",
+                    description="Lorem ipsum. " * rng.randint(0, 70),
+                    private=rng.random() < options["private"],
+                    verified=rng.random() < 0.05,
+                )
+            )
+        writer.wait()
+        self.report("campaigns", campaigns, started)
+
+        sizes = campaign_sizes(
+            campaigns, options["memberships"], players, options["skew"], rng
+        )
+        total = sum(sizes)
+        wanted = min(options["characters"], total)
+        characters = 0
+
+        started = time.perf_counter()
+        seen = 0
+        for n, size in enumerate(sizes):
+            campaign_id = first_campaign + n
+            members = rng.sample(range(players), size)
+            for position, member in enumerate(members):
+                user_id = first_player + member
+                # the first member owns the campaign
+                status = 2 if position == 0 else int(rng.random() < 0.1)
+                writer.add(
+                    CampaignMembership(
+                        user_id=user_id, campaign_id=campaign_id, status=status
+                    )
+                )
+                # selection sampling: exactly `wanted` of `total` members
+                # get a character, each membership equally likely
+                if rng.random() * (total - seen) < wanted - characters:
+                    characters += 1
+                    writer.add(
+                        Character(
+                            owner_id=user_id,
+                            campaign_id=campaign_id,
+                            sheet=make_sheet(template, characters, rng),
+                            version=1,
+                        )
+                    )
+                seen += 1
+        writer.wait()
+        self.report("memberships and characters", total + characters, started)
+        self.stdout.write(
+            f"created {players} player(s), {campaigns} campaign(s), "
+            f"{total} membership(s) and {characters} character(s)"
+        )
+
+    def report(self, what: str, count: int, started: float):
+        seconds = time.perf_counter() - started
+        self.stdout.write(f"{what}: {count} row(s) in {seconds:.1f}s")
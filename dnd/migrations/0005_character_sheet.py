@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnd', '0004_campaign_private'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='character',
+            name='sheet',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='character',
+            name='data',
+            field=models.FileField(blank=True, upload_to='chardata'),
+        ),
+    ]
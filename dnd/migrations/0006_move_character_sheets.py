@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:14
+
+import json
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def move_sheets_to_database(apps, schema_editor):
+    """
+    Copies legacy chardata/*.json files into Character.sheet.
+    Rows are walked in keyset batches, so neither the rows nor the parsed
+    sheets of the whole table are ever held in memory at once.
+    """
+    Character = apps.get_model('dnd', 'Character')
+    storage = Character._meta.get_field('data').storage
+    db_alias = schema_editor.connection.alias
+    pending = Character.objects.using(db_alias).filter(sheet__isnull=True)
+
+    last_id = 0
+    while True:
+        batch = list(
+            pending.filter(id__gt=last_id)
+            .only('id', 'data')
+            .order_by('id')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        moved = []
+        for char in batch:
+            # save_data() used to write the file without saving the row,
+            # so older rows may have an empty name pointing nowhere.
+            name = char.data.name or f'chardata/{char.id}.json'
+            if not storage.exists(name):
+                continue
+            with storage.open(name, 'rb') as f:
+                char.sheet = json.load(f)
+            moved.append(char)
+
+        Character.objects.using(db_alias).bulk_update(moved, ['sheet'])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('dnd', '0005_character_sheet'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            move_sheets_to_database, migrations.RunPython.noop
+        ),
+    ]
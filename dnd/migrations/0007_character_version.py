@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnd', '0006_move_character_sheets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='character',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
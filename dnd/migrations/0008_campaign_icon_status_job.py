@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnd', '0007_character_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='icon_source',
+            field=models.FileField(blank=True, upload_to='campaign_icons/incoming'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='icon_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'None'), (1, 'Processing'), (2, 'Ready'), (3, 'Failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='icon_thumbnails',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=64)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'Queued'), (1, 'Running'), (2, 'Done'), (3, 'Failed')], default=0)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='dnd_job_status_7eb594_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:40
+
+import dnd.services.media_storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnd', '0008_campaign_icon_status_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='campaign',
+            name='icon',
+            field=models.ImageField(storage=dnd.services.media_storage.get_media_storage, upload_to='campaign_icons'),
+        ),
+        migrations.AlterField(
+            model_name='player',
+            name='pfp',
+            field=models.ImageField(null=True, storage=dnd.services.media_storage.get_media_storage, upload_to='pfps/'),
+        ),
+    ]
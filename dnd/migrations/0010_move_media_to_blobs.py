@@ -0,0 +1,83 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:42
+
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.db import migrations
+
+from dnd.services.media_storage import get_media_storage
+
+BATCH_SIZE = 500
+
+
+def move_to_blobs(apps, schema_editor):
+    """
+    Copies icons, thumbnails and avatars saved under MEDIA_ROOT into the
+    content-addressed storage and points the rows at their blobs.
+    The old files are left in place.
+    """
+    db_alias = schema_editor.connection.alias
+    blobs = get_media_storage()
+    sizes = {}
+    references = Counter()
+
+    def move(name):
+        if not name or not default_storage.exists(name):
+            return name
+        with default_storage.open(name, 'rb') as f:
+            blob_name, sizes[blob_name] = blobs.store(name, f)
+        references[blob_name] += 1
+        return blob_name
+
+    Campaign = apps.get_model('dnd', 'Campaign')
+    for batch in _batches(Campaign.objects.using(db_alias)):
+        for campaign in batch:
+            campaign.icon = move(campaign.icon.name)
+            campaign.icon_thumbnails = {
+                size: move(name)
+                for size, name in campaign.icon_thumbnails.items()
+            }
+        Campaign.objects.using(db_alias).bulk_update(
+            batch, ['icon', 'icon_thumbnails']
+        )
+
+    Player = apps.get_model('dnd', 'Player')
+    for batch in _batches(Player.objects.using(db_alias).exclude(pfp='')):
+        for player in batch:
+            player.pfp = move(player.pfp.name)
+        Player.objects.using(db_alias).bulk_update(batch, ['pfp'])
+
+    MediaBlob = apps.get_model('dnd', 'MediaBlob')
+    MediaBlob.objects.using(db_alias).bulk_create(
+        [
+            MediaBlob(name=name, size=sizes[name], refcount=refcount)
+            for name, refcount in references.items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def _batches(queryset):
+    last_pk = None
+    while True:
+        page = queryset.order_by('pk')
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+        batch = list(page[:BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1].pk
+        yield batch
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('dnd', '0009_mediablob_media_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_to_blobs, migrations.RunPython.noop),
+    ]
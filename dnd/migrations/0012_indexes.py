@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+def dedupe_memberships(apps, schema_editor):
+    """
+    Keeps one membership per (user, campaign) before the unique constraint
+    goes in: the one with the highest role, the oldest among equals.
+    """
+    CampaignMembership = apps.get_model("dnd", "CampaignMembership")
+    duplicated = (
+        CampaignMembership.objects.values("user_id", "campaign_id")
+        .annotate(rows=models.Count("id"))
+        .filter(rows__gt=1)
+    )
+    for pair in duplicated:
+        ids = list(
+            CampaignMembership.objects.filter(
+                user_id=pair["user_id"], campaign_id=pair["campaign_id"]
+            )
+            .order_by("-status", "id")
+            .values_list("id", flat=True)
+        )
+        CampaignMembership.objects.filter(id__in=ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnd', '0011_campaign_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='player',
+            name='telegram_id',
+            field=models.BigIntegerField(db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(condition=models.Q(('private', False)), fields=['id'], name='dnd_campaign_public_idx'),
+        ),
+        migrations.RunPython(dedupe_memberships, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='campaignmembership',
+            constraint=models.UniqueConstraint(fields=('user', 'campaign'), name='dnd_membership_user_campaign_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='campaignmembership',
+            index=models.Index(fields=['campaign', 'user', 'status'], name='dnd_membership_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaignmembership',
+            index=models.Index(condition=models.Q(('status', 2)), fields=['campaign', 'user'], name='dnd_membership_owner_idx'),
+        ),
+    ]
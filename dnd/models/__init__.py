@@ -1,5 +1,7 @@
 from .campaign import Campaign
 from .character import Character
+from .job import Job
+from .media import MediaBlob
 from .participation import CampaignMembership
 from .participation import RoomParticipation
 from .player import Player
@@ -1,12 +1,88 @@
+from django.apps import apps
 from django.db import models
 
+from dnd.services.media_storage import get_media_storage
+
+
+class CampaignQuerySet(models.QuerySet):
+    def visible_to(self, user_id: int | None) -> "CampaignQuerySet":
+        """
+        Public campaigns and private ones the user is a member of, in one
+        query, annotated with the user's role (None for non-members).
+        """
+        if not user_id:
+            return self.filter(private=False).annotate(
+                role=models.Value(
+                    None, output_field=models.PositiveSmallIntegerField()
+                )
+            )
+
+        membership = apps.get_model(
+            "dnd", "CampaignMembership"
+        ).objects.filter(campaign=models.OuterRef("pk"), user_id=user_id)
+        return self.annotate(
+            role=models.Subquery(membership.values("status")[:1])
+        ).filter(models.Q(private=False) | models.Exists(membership))
+
 
 class Campaign(models.Model):
+    ICON_NONE = 0
+    ICON_PROCESSING = 1
+    ICON_READY = 2
+    ICON_FAILED = 3
+    ICON_STATUSES = (
+        (ICON_NONE, "None"),
+        (ICON_PROCESSING, "Processing"),
+        (ICON_READY, "Ready"),
+        (ICON_FAILED, "Failed"),
+    )
+
     title = models.CharField(max_length=255)
     description = models.CharField(max_length=1023, default="")
-    icon = models.ImageField(upload_to="campaign_icons")
+    icon = models.ImageField(
+        upload_to="campaign_icons", storage=get_media_storage
+    )
+    # Uploaded icon waiting for the worker to normalize it
+    icon_source = models.FileField(
+        upload_to="campaign_icons/incoming", blank=True
+    )
+    icon_status = models.PositiveSmallIntegerField(
+        default=ICON_NONE, choices=ICON_STATUSES
+    )
+    # size: name in media storage
+    icon_thumbnails = models.JSONField(default=dict, blank=True)
     verified = models.BooleanField(default=0)
     private = models.BooleanField(default=0)
+    # Bumped on every save, changes the ETag of the campaign
+    version = models.PositiveIntegerField(default=0)
+
+    objects = CampaignQuerySet.as_manager()
 
     class Config:
         orm_mode = True
+
+    class Meta:
+        indexes = [
+            # public listing walks this in id order instead of the table
+            models.Index(
+                fields=["id"],
+                condition=models.Q(private=False),
+                name="dnd_campaign_public_idx",
+            ),
+        ]
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "version"}
+        self.version = models.F("version") + 1
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=["version"])
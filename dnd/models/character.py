@@ -1,10 +1,18 @@
+import copy
 import json
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.db import models
+from django.db.models.functions import Cast
 
 from dnd.models.campaign import Campaign
 from dnd.models.player import Player
+from dnd.services.metrics import time_storage
+from dnd.services.sheet_cache import get_sheet_cache
+
+STORAGE_DATABASE = "database"
+STORAGE_FILE = "file"
 
 
 class Character(models.Model):
@@ -17,18 +25,122 @@ class Character(models.Model):
     )
     campaign = models.ForeignKey(Campaign, models.CASCADE, null=True)
 
-    data = models.FileField(upload_to="chardata")
+    # Legacy storage: one JSON file per character under MEDIA_ROOT.
+    data = models.FileField(upload_to="chardata", blank=True)
+    # Database storage: takes precedence over `data` whenever it is set.
+    sheet = models.JSONField(null=True, blank=True)
+    # Bumped on every save_data(), keys cached copies of the sheet.
+    version = models.PositiveIntegerField(default=0)
+
+    @staticmethod
+    def storage_mode() -> str:
+        """Returns configured storage for character sheets."""
+        return getattr(settings, "CHARACTER_STORAGE", STORAGE_DATABASE)
 
     def load_data(self):
-        """Internal function that loads data from file stored in database."""
+        """
+        Internal function that loads character data from its storage.
+        Parsed data is cached per version and shared, do not mutate it.
+        """
+        with time_storage("load"):
+            return self._load_data()
+
+    def _load_data(self):
+        if self.pk is None:
+            return self._read_data()[0]
+        cache = get_sheet_cache()
+        data = cache.get(self.pk, self.version)
+        if isinstance(data, str):  # cached by load_json()
+            data, size = json.loads(data), len(data)
+            cache.set(self.pk, self.version, data, size)
+        elif data is None:
+            data, size = self._read_data()
+            cache.set(self.pk, self.version, data, size)
+        return data
+
+    def _read_data(self) -> tuple[dict, int | None]:
+        if self.sheet is not None:
+            return self.sheet, None
+        with self.data.open("r") as f:
+            raw = f.read()
+        return json.loads(raw), len(raw)
+
+    def load_json(self) -> str:
+        """
+        Character data as JSON text, for responses that pass it through.
+        Stored text is returned as is instead of being parsed and dumped.
+        """
+        with time_storage("load"):
+            return self._load_json()
+
+    def _load_json(self) -> str:
+        if self.pk is None:
+            return self._read_json()
+        # the cache has the parsed data or the JSON text, whichever was
+        # read last
+        cache = get_sheet_cache()
+        data = cache.get(self.pk, self.version)
+        if data is None:
+            data = self._read_json()
+            cache.set(self.pk, self.version, data, len(data))
+        if isinstance(data, str):
+            return data
+        return json.dumps(data)
+
+    def _read_json(self) -> str:
+        if "sheet" not in self.get_deferred_fields():
+            raw = None if self.sheet is None else json.dumps(self.sheet)
+        else:
+            raw = (
+                Character.objects.using(self._state.db)
+                .filter(pk=self.pk)
+                .values_list(Cast("sheet", models.TextField()), flat=True)
+                .first()
+            )
+        if raw is not None:
+            return raw
         with self.data.open("r") as f:
-            return json.load(f)
+            return f.read()
+
+    @property
+    def etag(self) -> str:
+        """Strong ETag of the current character data version."""
+        return f'"{self.version}"'
+
+    def save_data(self, data: dict, expected_version: int | None = None):
+        """
+        Internal function that saves character data to its storage.
+        With expected_version the data is only saved if it is still the
+        current version. Returns False if someone saved it in between.
+        """
+        with time_storage("save"):
+            return self._save_data(data, expected_version)
+
+    def _save_data(self, data: dict, expected_version: int | None) -> bool:
+        if self.storage_mode() == STORAGE_FILE:
+            self.sheet = None
+            self.data.save(
+                f"{self.id}.json", ContentFile(json.dumps(data)), save=False
+            )
+        else:
+            self.sheet = data
 
-    def save_data(self, data: dict):
-        """Internal function that saves data to a file stored in database."""
-        self.data.save(
-            f"{self.id}.json", ContentFile(json.dumps(data)), save=False
-        )
+        rows = Character.objects.filter(pk=self.pk)
+        if expected_version is not None:
+            rows = rows.filter(version=expected_version)
+        if not rows.update(
+            data=self.data,
+            sheet=self.sheet,
+            version=models.F("version") + 1,
+        ):
+            return False
+
+        if expected_version is not None:
+            self.version = expected_version + 1
+        else:
+            self.refresh_from_db(fields=["version"])
+        get_sheet_cache().invalidate(self.pk, self.version)
+        return True
 
     def get(self, *args):
         """
@@ -51,14 +163,14 @@ class Character(models.Model):
         Example usage:
         char_obj.set("info", "charClass", value="Колдун")
         """
-        data = self.load_data()
+        data = copy.deepcopy(self.load_data())
         cur = data
         for arg in args:
             try:
                 cur = cur[arg]
             except (KeyError, IndexError, TypeError):
                 return False
-        for n, v in kwargs:
-            cur[n] = v
-        self.save_data(data)
-        return True
+        if not isinstance(cur, dict):
+            return False
+        cur.update(kwargs)
+        return self.save_data(data)
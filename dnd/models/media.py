@@ -0,0 +1,28 @@
+from django.db import models
+from django.utils import timezone
+
+
+class MediaBlob(models.Model):
+    """Reference count of a file in the content-addressed media storage."""
+
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def acquire(cls, name: str, size: int):
+        _, created = cls.objects.get_or_create(
+            name=name, defaults={"size": size, "refcount": 1}
+        )
+        if not created:
+            cls.objects.filter(name=name).update(
+                refcount=models.F("refcount") + 1, updated_at=timezone.now()
+            )
+
+    @classmethod
+    def release(cls, name: str):
+        cls.objects.filter(name=name, refcount__gt=0).update(
+            refcount=models.F("refcount") - 1, updated_at=timezone.now()
+        )
@@ -25,3 +25,24 @@ class CampaignMembership(models.Model):
         default=0,
         choices=ROLES,
     )  # Role. 0 - player, 1 - master, 2 - owner
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "campaign"],
+                name="dnd_membership_user_campaign_uniq",
+            ),
+        ]
+        indexes = [
+            # role checks: filter(campaign=..., user_id=..., status=...)
+            models.Index(
+                fields=["campaign", "user", "status"],
+                name="dnd_membership_role_idx",
+            ),
+            # owner checks only ever look at a handful of rows
+            models.Index(
+                fields=["campaign", "user"],
+                condition=models.Q(status=2),
+                name="dnd_membership_owner_idx",
+            ),
+        ]
@@ -1,10 +1,14 @@
 from django.db import models
 
+from dnd.services.media_storage import get_media_storage
+
 
 class Player(models.Model):
     id = models.AutoField(primary_key=True, auto_created=True)
-    telegram_id = models.BigIntegerField()
-    pfp = models.ImageField(upload_to="pfps/", null=True)
+    telegram_id = models.BigIntegerField(db_index=True)
+    pfp = models.ImageField(
+        upload_to="pfps/", null=True, storage=get_media_storage
+    )
     bio = models.TextField(blank=True)
     admin = models.BooleanField(default=False)
     verified = models.BooleanField(default=False)
@@ -1,8 +1,19 @@
 from .campaign import (
     CampaignModelSchema,
+    CampaignPage,
     CreateCampaignRequest,
     AddToCampaignRequest,
     CampaignEditPermissions,
+    BulkMembershipRequest,
+    BulkMembershipOut,
+    MembershipOutcome,
 )
+from .character import CharacterOut
 from .default import Message
-from .error import BaseError, ValidationError, ForbiddenError, NotFoundError
+from .error import (
+    BaseError,
+    ValidationError,
+    ForbiddenError,
+    NotFoundError,
+    ConflictError,
+)
@@ -1,8 +1,10 @@
 import enum
+from typing import Literal
 
 from ninja import ModelSchema, Schema
 
 from dnd.models.campaign import Campaign
+from dnd.services.media_storage import get_media_storage
 
 
 class CreateCampaignRequest(Schema):
@@ -12,25 +14,74 @@ class CreateCampaignRequest(Schema):
     description: str | None = None
 
 
+class CampaignPermissions(int, enum.Enum):
+    PLAYER = 0
+    MASTER = 1
+    OWNER = 2
+
+
 class CampaignModelSchema(ModelSchema):
+    icon_thumbnails: dict[str, str]
+    # role of the requesting user, see Campaign.objects.visible_to()
+    role: CampaignPermissions | None = None
+
     class Meta:
         model = Campaign
-        fields = ["id", "title", "description", "icon", "verified", "private"]
+        fields = [
+            "id",
+            "title",
+            "description",
+            "icon",
+            "icon_status",
+            "verified",
+            "private",
+        ]
         fields_optional = ["icon", "description"]
 
+    @staticmethod
+    def resolve_icon_thumbnails(obj: Campaign) -> dict[str, str]:
+        return {
+            size: get_media_storage().url(name)
+            for size, name in obj.icon_thumbnails.items()
+        }
+
+
+class CampaignPage(Schema):
+    items: list[CampaignModelSchema]
+    next_cursor: int | None = None
+    total: int | None = None
+
 
 class AddToCampaignRequest(Schema):
     owner_id: int
     user_id: int
 
 
-class CampaignPermissions(int, enum.Enum):
-    PLAYER = 0
-    MASTER = 1
-    OWNER = 2
-
-
 class CampaignEditPermissions(Schema):
     owner_id: int
     user_id: int
     status: CampaignPermissions
+
+
+class MembershipChange(Schema):
+    user_id: int
+    # new role, null removes the user from the campaign
+    status: CampaignPermissions | None
+
+
+class BulkMembershipRequest(Schema):
+    owner_id: int
+    changes: list[MembershipChange]
+
+
+class MembershipOutcome(Schema):
+    user_id: int
+    result: Literal[
+        "added", "updated", "unchanged", "removed", "not_member", "not_found"
+    ]
+
+
+class BulkMembershipOut(Schema):
+    results: list[MembershipOutcome]
+    # queries made by the request, only reported with DEBUG on
+    queries: int | None = None
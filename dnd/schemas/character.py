@@ -13,3 +13,13 @@ class CharacterOut(Schema):
     owner_telegram_id: int
     campaign_id: int
     data: dict
+
+
+class CharacterBatchError(Schema):
+    id: int
+    message: str
+
+
+class CharacterBatchOut(Schema):
+    characters: list[CharacterOut]
+    errors: list[CharacterBatchError]
@@ -15,3 +15,7 @@ class ForbiddenError(BaseError):
 
 class NotFoundError(BaseError):
     message: str = "Объект не найден"
+
+
+class ConflictError(BaseError):
+    message: str = "Данные были изменены другим запросом"
@@ -1 +1,2 @@
 from .validate_json import validate_json, try_load_json
+from .sheet_cache import get_sheet_cache
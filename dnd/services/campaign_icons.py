@@ -0,0 +1,111 @@
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+
+from dnd.models import Campaign
+from dnd.services.jobs import enqueue, job_handler
+from dnd.services.media_storage import get_media_storage
+from dnd.services.uploads import check_image
+
+if TYPE_CHECKING:
+    from PIL import Image as PILImage
+
+JOB_KIND = "campaign_icon"
+
+
+def schedule_icon(campaign_obj: Campaign, icon: File):
+    """
+    Stores uploaded icon as is and leaves normalizing it to a worker.
+    Icon must already have passed check_image().
+    """
+    # an upload still waiting for the worker is replaced, its job skips
+    pending = campaign_obj.icon_source.name
+    campaign_obj.icon_source.save(f"{campaign_obj.id}", icon, save=False)
+    campaign_obj.icon_status = Campaign.ICON_PROCESSING
+    campaign_obj.save(update_fields=["icon_source", "icon_status"])
+    enqueue(
+        JOB_KIND,
+        {
+            "campaign_id": campaign_obj.id,
+            "source": campaign_obj.icon_source.name,
+        },
+    )
+    if pending:
+        campaign_obj.icon_source.storage.delete(pending)
+
+
+def _pending(payload: dict):
+    """Campaign rows still waiting for the upload the job was queued for."""
+    rows = Campaign.objects.filter(id=payload["campaign_id"])
+    if "source" in payload:  # jobs queued before sources were recorded
+        rows = rows.filter(icon_source=payload["source"])
+    return rows
+
+
+def mark_icon_failed(payload: dict):
+    _pending(payload).update(
+        icon_status=Campaign.ICON_FAILED, version=F("version") + 1
+    )
+
+
+@job_handler(JOB_KIND, on_failure=mark_icon_failed)
+def process_icon(payload: dict):
+    """Re-encodes the uploaded icon to PNG and renders its thumbnails."""
+    from PIL import Image as PILImage
+
+    campaign_obj = _pending(payload).first()
+    if campaign_obj is None or not campaign_obj.icon_source:
+        return
+    source = campaign_obj.icon_source.name
+
+    with campaign_obj.icon_source.open("rb") as f:
+        check_image(f)
+        image = PILImage.open(f)
+        image.load()
+
+    storage = get_media_storage()
+    campaign_obj.icon.save("icon.png", ContentFile(_to_png(image)), save=False)
+
+    thumbnails = {}
+    for size in settings.CAMPAIGN_ICON_THUMBNAIL_SIZES:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size))
+        thumbnails[str(size)] = storage.save(
+            f"thumbnail_{size}.png", ContentFile(_to_png(thumbnail))
+        )
+    stored = [campaign_obj.icon.name, *thumbnails.values()]
+
+    # another upload may have come in meanwhile, it wins
+    with transaction.atomic():
+        current = (
+            Campaign.objects.select_for_update()
+            .filter(id=campaign_obj.id, icon_source=source)
+            .first()
+        )
+        if current is not None:
+            Campaign.objects.filter(id=campaign_obj.id).update(
+                icon=campaign_obj.icon.name,
+                icon_source="",
+                icon_thumbnails=thumbnails,
+                icon_status=Campaign.ICON_READY,
+                version=F("version") + 1,
+            )
+
+    if current is None:
+        replaced = stored
+    else:
+        replaced = [current.icon.name, *current.icon_thumbnails.values()]
+        campaign_obj.icon_source.storage.delete(source)
+    for name in replaced:
+        storage.delete(name)
+
+
+def _to_png(image: "PILImage.Image") -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
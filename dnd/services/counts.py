@@ -0,0 +1,28 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import QuerySet
+
+
+def estimate_count(queryset: QuerySet, cache_key: str) -> int:
+    """
+    Approximate number of rows in queryset, cached for a short while.
+    PostgreSQL answers from planner statistics without scanning anything;
+    other databases count once per COUNT_ESTIMATE_CACHE_SECONDS.
+    """
+    count = cache.get(cache_key)
+    if count is None:
+        count = _planner_estimate(queryset)
+        if count is None:
+            count = queryset.count()
+        cache.set(cache_key, count, settings.COUNT_ESTIMATE_CACHE_SECONDS)
+    return count
+
+
+def _planner_estimate(queryset: QuerySet) -> int | None:
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    plan = json.loads(queryset.explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,28 @@
+import hashlib
+
+from django.http import HttpRequest, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+
+def aggregate_etag(*parts) -> str:
+    """Strong ETag for a response built from several versioned rows."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: HttpRequest, etag: str) -> bool:
+    """Checks If-None-Match, which uses the weak comparison function."""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in {
+        tag.removeprefix("W/") for tag in parse_etags(header)
+    }
+
+
+def not_modified(etag: str) -> HttpResponseNotModified:
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
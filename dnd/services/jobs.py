@@ -0,0 +1,168 @@
+import logging
+import traceback
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from dnd.models import Job
+
+logger = logging.getLogger("django")
+
+HANDLERS: dict[str, tuple[Callable, Callable | None]] = {}
+
+
+def job_handler(kind: str, on_failure: Callable | None = None):
+    """
+    Registers a function that runs jobs of given kind with their payload.
+    on_failure is called with the payload once all attempts are used up.
+    """
+
+    def register(func: Callable) -> Callable:
+        HANDLERS[kind] = (func, on_failure)
+        return func
+
+    return register
+
+
+def enqueue(kind: str, payload: dict, max_attempts: int | None = None) -> Job:
+    return Job.objects.create(
+        kind=kind,
+        payload=payload,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def claim_next() -> Job | None:
+    """
+    Takes the oldest runnable job, or a running one whose worker lost it.
+    Claiming is a compare-and-swap on (status, attempts), so two workers
+    never claim the same attempt and no row locks are needed. Leases are
+    not renewed: a job running longer than JOB_LEASE_SECONDS is claimed
+    again, and only the last claim may record the result.
+    """
+    now = timezone.now()
+    _fail_expired(now)
+    runnable = Job.objects.filter(
+        Q(status=Job.QUEUED, run_after__lte=now)
+        | Q(
+            status=Job.RUNNING,
+            locked_until__lt=now,
+            attempts__lt=F("max_attempts"),
+        )
+    ).order_by("run_after", "id")
+
+    for job in runnable[: settings.JOB_CLAIM_BATCH]:
+        claimed = Job.objects.filter(
+            id=job.id, status=job.status, attempts=job.attempts
+        ).update(
+            status=Job.RUNNING,
+            attempts=F("attempts") + 1,
+            locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            updated_at=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def _fail_expired(now: datetime) -> int:
+    """
+    Fails running jobs whose lease expired on their last attempt, such as
+    a job that kills its worker. Returns how many were failed.
+    """
+    expired = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_until__lt=now,
+        attempts__gte=F("max_attempts"),
+    )
+    count = 0
+    for job in expired[: settings.JOB_CLAIM_BATCH]:
+        job.status = Job.FAILED
+        job.locked_until = None
+        job.last_error = "Lease expired, the worker was lost"
+        if _finish(job, "last_error"):
+            _give_up(job)
+            count += 1
+    return count
+
+
+def run_job(job: Job) -> bool:
+    """Runs a claimed job, schedules a retry if it fails. True on success."""
+    handler, _ = HANDLERS.get(job.kind, (None, None))
+    try:
+        if handler is None:
+            raise LookupError(f"No handler for job kind {job.kind!r}")
+        handler(job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        else:
+            job.status = Job.FAILED
+        job.locked_until = None
+        if not _finish(job, "run_after", "last_error"):
+            return False
+        if job.status == Job.FAILED:
+            _give_up(job)
+        else:
+            logger.warning(
+                "Job %s (%s) failed, retry in %ss", job.id, job.kind, delay
+            )
+        return False
+
+    job.status = Job.DONE
+    job.locked_until = None
+    _finish(job)
+    return True
+
+
+def _finish(job: Job, *fields: str) -> bool:
+    """
+    Saves the outcome of a claimed attempt, unless the lease expired and
+    the job was claimed again since. False if the job was taken over.
+    """
+    saved = Job.objects.filter(
+        id=job.id, status=Job.RUNNING, attempts=job.attempts
+    ).update(
+        status=job.status,
+        locked_until=job.locked_until,
+        updated_at=timezone.now(),
+        **{field: getattr(job, field) for field in fields},
+    )
+    if not saved:
+        logger.warning(
+            "Job %s (%s) attempt %s was taken over after its lease expired",
+            job.id,
+            job.kind,
+            job.attempts,
+        )
+    return bool(saved)
+
+
+def _give_up(job: Job):
+    logger.error("Job %s (%s) failed permanently", job.id, job.kind)
+    _, on_failure = HANDLERS.get(job.kind, (None, None))
+    if on_failure is None:
+        return
+    try:
+        on_failure(job.payload)
+    except Exception:
+        logger.exception("on_failure of job %s (%s) failed", job.id, job.kind)
+
+
+def run_pending(limit: int | None = None) -> int:
+    """Runs jobs until none are runnable. Returns how many were run."""
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
@@ -0,0 +1,128 @@
+import copy
+
+
+class JsonPatchError(ValueError): ...
+
+
+def merge_patch(target, patch):
+    """
+    Applies JSON Merge Patch (RFC 7396) to target and returns the result.
+    Objects are merged recursively, null removes a key, anything else
+    replaces the value. Target is modified in place when it is an object.
+    """
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    if not isinstance(target, dict):
+        target = {}
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        else:
+            target[key] = merge_patch(target.get(key), value)
+    return target
+
+
+def apply_json_patch(doc, operations: list):
+    """
+    Applies JSON Patch (RFC 6902) operations to doc and returns the result.
+    Doc is modified in place, so pass a copy if the original must survive.
+    Raises JsonPatchError if any operation fails, including "test".
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("JSON Patch must be a list of operations")
+    for operation in operations:
+        if not isinstance(operation, dict) or "path" not in operation:
+            raise JsonPatchError(f"Malformed operation: {operation!r}")
+        op = operation.get("op")
+        path = _parse_pointer(operation["path"])
+
+        if op == "add":
+            doc = _add(doc, path, _value_of(operation))
+        elif op == "remove":
+            doc = _remove(doc, path)
+        elif op == "replace":
+            _resolve(doc, path)
+            doc = _add(_remove(doc, path), path, _value_of(operation))
+        elif op in {"move", "copy"}:
+            from_path = _parse_pointer(operation.get("from"))
+            value = _resolve(doc, from_path)
+            if op == "move":
+                if path[: len(from_path)] == from_path and path != from_path:
+                    raise JsonPatchError("Cannot move a value into itself")
+                doc = _remove(doc, from_path)
+            else:
+                value = copy.deepcopy(value)
+            doc = _add(doc, path, value)
+        elif op == "test":
+            if _resolve(doc, path) != _value_of(operation):
+                raise JsonPatchError(f"Test failed at {operation['path']}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {op!r}")
+    return doc
+
+
+def _value_of(operation: dict):
+    if "value" not in operation:
+        raise JsonPatchError(f"Operation has no value: {operation!r}")
+    return copy.deepcopy(operation["value"])
+
+
+def _parse_pointer(pointer) -> list[str]:
+    if not isinstance(pointer, str) or (pointer and pointer[0] != "/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    if not pointer:
+        return []
+    return [
+        token.replace("~1", "/").replace("~0", "~")
+        for token in pointer[1:].split("/")
+    ]
+
+
+def _index(container: list, token: str, *, insert: bool = False) -> int:
+    if insert and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token[0] == "0"):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (not insert and index == len(container)):
+        raise JsonPatchError(f"Array index out of range: {token}")
+    return index
+
+
+def _resolve(doc, path: list[str]):
+    cur = doc
+    for token in path:
+        if isinstance(cur, dict):
+            if token not in cur:
+                raise JsonPatchError(f"Path not found: {token!r}")
+            cur = cur[token]
+        elif isinstance(cur, list):
+            cur = cur[_index(cur, token)]
+        else:
+            raise JsonPatchError(f"Path not found: {token!r}")
+    return cur
+
+
+def _add(doc, path: list[str], value):
+    if not path:
+        return value
+    parent = _resolve(doc, path[:-1])
+    if isinstance(parent, dict):
+        parent[path[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, path[-1], insert=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to {type(parent).__name__}")
+    return doc
+
+
+def _remove(doc, path: list[str]):
+    if not path:
+        return None
+    parent = _resolve(doc, path[:-1])
+    _resolve(parent, path[-1:])
+    if isinstance(parent, dict):
+        del parent[path[-1]]
+    else:
+        del parent[_index(parent, path[-1])]
+    return doc
@@ -0,0 +1,105 @@
+import functools
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every distinct file once, named by the SHA-256 of its content.
+    A name always refers to the same bytes, so URLs can be cached forever.
+    Saving counts a reference in MediaBlob, deleting only drops one; files
+    nobody refers to are removed by `python manage.py gc_media`.
+    Location and URL default to MEDIA_BLOB_ROOT and MEDIA_BLOB_URL.
+    """
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.MEDIA_BLOB_ROOT)
+
+    @cached_property
+    def base_url(self):
+        if self._base_url is not None and not self._base_url.endswith("/"):
+            self._base_url += "/"
+        return self._value_or_setting(self._base_url, settings.MEDIA_BLOB_URL)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        # fields keep the instance they were given, follow the settings
+        if setting == "MEDIA_BLOB_ROOT":
+            self.__dict__.pop("base_location", None)
+            self.__dict__.pop("location", None)
+        elif setting == "MEDIA_BLOB_URL":
+            self.__dict__.pop("base_url", None)
+        elif setting not in {"MEDIA_ROOT", "MEDIA_URL"}:
+            super()._clear_cached_properties(setting, **kwargs)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        blob_name, size = self.store(name, content)
+        apps.get_model("dnd", "MediaBlob").acquire(blob_name, size)
+        return blob_name
+
+    def store(self, name: str, content: File) -> tuple[str, int]:
+        """Writes content unless it is already stored, without counting."""
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        blob_name = f"{digest[:2]}/{digest}{extension}"
+
+        if not self.exists(blob_name):
+            self._write(blob_name, content)
+        return blob_name, size
+
+    def delete(self, name):
+        """Drops one reference to the file, it stays until collected."""
+        if name:
+            apps.get_model("dnd", "MediaBlob").release(name)
+
+    def purge(self, name):
+        """Removes the file itself."""
+        super().delete(name)
+
+    def _write(self, name: str, content: File):
+        # Concurrent writers of one blob write identical bytes, so the
+        # last atomic rename wins without anyone seeing a partial file.
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+@functools.cache
+def get_media_storage() -> ContentAddressedStorage:
+    return ContentAddressedStorage()
+
+
+@receiver(setting_changed)
+def _reset_media_storage(setting, **kwargs):
+    if setting in {"MEDIA_BLOB_ROOT", "MEDIA_BLOB_URL"}:
+        get_media_storage.cache_clear()
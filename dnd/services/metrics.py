@@ -0,0 +1,341 @@
+"""
+Request metrics shared by all worker processes of a server.
+
+Every process collects its metrics in memory and writes them to its own
+file in METRICS["DIR"] at most every METRICS["FLUSH_SECONDS"] (atomically,
+so readers never see half a file). render_metrics() adds up the files of
+all processes, including ones that have exited so counters never go
+back, and returns them in the Prometheus text format. Without a directory
+only the current process is reported.
+
+Clear the directory when the server starts and call mark_process_dead()
+when a worker exits, as gunicorn.conf.py does: counters and histograms of
+exited processes keep counting, their gauges would be stale.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from dnd.services.sheet_cache import get_sheet_cache
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = tuple(256 * 4**n for n in range(8))  # 256 B .. 4 MiB
+
+# name -> (type, help, buckets)
+METRICS = {
+    "dnd_http_request_duration_seconds": (
+        "histogram",
+        "Time to handle a request by API operation and status",
+        LATENCY_BUCKETS,
+    ),
+    "dnd_http_response_bytes": (
+        "histogram",
+        "Size of non-streaming response bodies",
+        BYTES_BUCKETS,
+    ),
+    "dnd_db_queries_total": (
+        "counter",
+        "Database queries made by requests",
+        None,
+    ),
+    "dnd_db_query_duration_seconds_total": (
+        "counter",
+        "Time requests spent in database queries",
+        None,
+    ),
+    "dnd_storage_duration_seconds": (
+        "histogram",
+        "Time to load or save character sheets",
+        LATENCY_BUCKETS,
+    ),
+    "dnd_sheet_cache_requests_total": (
+        "counter",
+        "Sheet cache lookups by tier and result",
+        None,
+    ),
+    "dnd_sheet_cache_evictions_total": (
+        "counter",
+        "Sheets evicted from the local cache tier",
+        None,
+    ),
+    "dnd_sheet_cache_entries": (
+        "gauge",
+        "Sheets held in the local cache tiers of all processes",
+        None,
+    ),
+    "dnd_sheet_cache_bytes": (
+        "gauge",
+        "Size of sheets held in the local cache tiers of all processes",
+        None,
+    ),
+}
+
+
+@dataclass
+class RequestStats:
+    operation: str = "unmatched"
+    queries: int = 0
+    query_seconds: float = 0.0
+
+
+# shared with sync_to_async threads, which run in a copy of the context
+_current: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar(
+    "dnd_request_stats", default=None
+)
+
+
+class Collector:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # (name, labels) -> value, or [bucket counts..., count, sum]
+        self._values: dict[tuple[str, tuple], float | list] = {}
+        self._flushed_at = 0.0
+
+    def inc(self, name: str, labels: dict, value: float = 1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name: str, labels: dict, value: float):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(buckets) + 2)
+            for n, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[n] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def snapshot(self) -> list:
+        with self._lock:
+            values = [
+                [name, list(labels), list(v) if isinstance(v, list) else v]
+                for (name, labels), v in self._values.items()
+            ]
+        return values + sheet_cache_values()
+
+    def due(self) -> bool:
+        """Whether FLUSH_SECONDS have passed since this process's last write."""
+        return bool(settings.METRICS["DIR"]) and (
+            time.monotonic() - self._flushed_at
+            >= settings.METRICS["FLUSH_SECONDS"]
+        )
+
+    def flush(self, force: bool = False):
+        """
+        Writes this process's file when FLUSH_SECONDS have passed. Blocks on
+        file I/O: async code runs it in a thread when due() says so.
+        """
+        directory = settings.METRICS["DIR"]
+        if not directory:
+            return
+        with self._lock:
+            if not force and not self.due():
+                return
+            self._flushed_at = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        with self._write_lock:
+            _write(
+                os.path.join(directory, f"{os.getpid()}.json"), self.snapshot()
+            )
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._flushed_at = 0.0
+
+
+collector = Collector()
+
+
+def sheet_cache_values() -> list:
+    stats = get_sheet_cache().stats()
+    values = []
+    for tier, tier_stats in stats.items():
+        for result in ("hits", "misses"):
+            values.append(
+                [
+                    "dnd_sheet_cache_requests_total",
+                    [["result", result], ["tier", tier]],
+                    tier_stats[result],
+                ]
+            )
+    local = stats["local"]
+    values += [
+        ["dnd_sheet_cache_evictions_total", [], local["evictions"]],
+        ["dnd_sheet_cache_entries", [], local["entries"]],
+        ["dnd_sheet_cache_bytes", [], local["bytes"]],
+    ]
+    return values
+
+
+@contextmanager
+def track_request() -> Iterator[RequestStats]:
+    """Makes queries and storage calls count towards a new request."""
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def current_request() -> RequestStats | None:
+    return _current.get()
+
+
+def record_request(
+    stats: RequestStats, status: int, seconds: float, size: int | None
+):
+    operation = {"operation": stats.operation}
+    collector.observe(
+        "dnd_http_request_duration_seconds",
+        {**operation, "status": str(status)},
+        seconds,
+    )
+    if size is not None:
+        collector.observe("dnd_http_response_bytes", operation, size)
+    collector.inc("dnd_db_queries_total", operation, stats.queries)
+    collector.inc(
+        "dnd_db_query_duration_seconds_total", operation, stats.query_seconds
+    )
+
+
+def count_query(execute, sql, params, many, context):
+    """Database execute wrapper adding queries to the current request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - started
+
+
+@contextmanager
+def time_storage(action: str):
+    """Times a character sheet load or save of the current request."""
+    stats = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        collector.observe(
+            "dnd_storage_duration_seconds",
+            {
+                "action": action,
+                "operation": stats.operation if stats else "none",
+            },
+            time.perf_counter() - started,
+        )
+
+
+def render_metrics() -> str:
+    """All processes' metrics in the Prometheus text format."""
+    collector.flush(force=True)
+    merged: dict[tuple[str, tuple], float | list] = {}
+    for values in _process_values():
+        for name, labels, value in values:
+            if name not in METRICS:
+                continue
+            key = (name, tuple(tuple(label) for label in labels))
+            if isinstance(value, list):
+                total = merged.setdefault(key, [0] * len(value))
+                for n, v in enumerate(value):
+                    total[n] += v
+            else:
+                merged[key] = merged.get(key, 0) + value
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted(
+            (labels, value)
+            for (metric, labels), value in merged.items()
+            if metric == name
+        )
+        if not series:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in series:
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            # the +Inf bucket is the count
+            for bound, count in zip((*buckets, "+Inf"), value[:-1]):
+                le = (*labels, ("le", _number(bound)))
+                lines.append(f"{name}_bucket{_labels(le)} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {value[-2]}")
+    return "\n".join(lines) + "\n"
+
+
+def mark_process_dead(pid: int, directory: str):
+    """Drops the gauges of an exited process from its file in directory."""
+    path = os.path.join(directory, f"{pid}.json")
+    try:
+        with open(path) as f:
+            values = json.load(f)
+    except (OSError, ValueError):
+        return
+    _write(
+        path,
+        [
+            value
+            for value in values
+            if METRICS.get(value[0], ("",))[0] != "gauge"
+        ],
+    )
+
+
+def _write(path: str, values: list):
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(values, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _process_values() -> Iterator[list]:
+    directory = settings.METRICS["DIR"]
+    if not directory:
+        yield collector.snapshot()
+        return
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            continue  # removed while listing
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels)
+    return f"{{{pairs}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _number(value) -> str:
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,118 @@
+import contextvars
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from dnd.models import CampaignMembership
+
+PLAYER, MASTER, OWNER = 0, 1, 2
+# cached in place of None, which caches use for "missing"
+NOT_MEMBER = -1
+
+# (campaign_id, user_id) -> role, only set while a request is handled
+_memo: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "dnd_roles", default=None
+)
+
+
+def get_role(campaign_id: int, user_id: int | None) -> int | None:
+    """
+    Role of the user in the campaign, None if they are not a member.
+    Answered from the request memo, then from ROLE_CACHE, then the database.
+    """
+    if not user_id:
+        return None
+
+    memo = _memo.get()
+    if memo is not None and (campaign_id, user_id) in memo:
+        return memo[campaign_id, user_id]
+
+    cache = _shared_cache()
+    key = None
+    role = None
+    if cache is not None:
+        key = (
+            f"dnd:role:{campaign_id}:{_version(cache, campaign_id)}:{user_id}"
+        )
+        role = cache.get(key)
+    if role is None:
+        # a lagging replica would put an outdated role under a fresh version
+        role = (
+            CampaignMembership.objects.using(DEFAULT_DB_ALIAS)
+            .filter(campaign_id=campaign_id, user_id=user_id)
+            .values_list("status", flat=True)
+            .first()
+        )
+        role = NOT_MEMBER if role is None else role
+        if cache is not None:
+            cache.set(key, role, settings.ROLE_CACHE["TIMEOUT"])
+
+    role = None if role == NOT_MEMBER else role
+    if memo is not None:
+        memo[campaign_id, user_id] = role
+    return role
+
+
+def is_owner(campaign_id: int, user_id: int | None) -> bool:
+    return get_role(campaign_id, user_id) == OWNER
+
+
+def invalidate_roles(campaign_id: int):
+    """
+    Forgets every cached role in the campaign. Called on each membership
+    save and delete; call it after bulk writes, which send no signals.
+    The shared cache is only bumped once the transaction commits, before
+    that other requests would cache the old role under the new version.
+    """
+    memo = _memo.get()
+    if memo:
+        for key in [key for key in memo if key[0] == campaign_id]:
+            del memo[key]
+
+    cache = _shared_cache()
+    if cache is not None:
+        transaction.on_commit(lambda: _bump_version(cache, campaign_id))
+
+
+def _shared_cache():
+    alias = settings.ROLE_CACHE["CACHE"]
+    return caches[alias] if alias else None
+
+
+def _version_key(campaign_id: int) -> str:
+    return f"dnd:role-version:{campaign_id}"
+
+
+def _bump_version(cache, campaign_id: int):
+    # a fresh version orphans old entries, they expire on their own
+    cache.set(_version_key(campaign_id), time.time_ns(), None)
+
+
+def _version(cache, campaign_id: int) -> int:
+    key = _version_key(campaign_id)
+    version = cache.get(key)
+    if version is None:
+        # never reuse an old version, its entries may still be cached
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+@receiver(request_started)
+def _start_memo(**kwargs):
+    _memo.set({})
+
+
+@receiver(request_finished)
+def _drop_memo(**kwargs):
+    _memo.set(None)
+
+
+@receiver([post_save, post_delete], sender=CampaignMembership)
+def _membership_changed(instance: CampaignMembership, **kwargs):
+    invalidate_roles(instance.campaign_id)
@@ -0,0 +1,190 @@
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULTS = {
+    "MAX_ENTRIES": 1024,
+    "MAX_BYTES": 64 * 1024 * 1024,
+    "SHARED_CACHE": None,
+    "SHARED_TIMEOUT": 300,
+}
+
+
+class LocalTier:
+    """In-process LRU of sheets bounded by entries and bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # char_id -> (version, data, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, char_id: int, version: int):
+        with self._lock:
+            entry = self._entries.get(char_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(char_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, char_id: int, version: int, data, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(char_id)
+            self._entries[char_id] = (version, data, size)
+            self._bytes += size
+            while (
+                len(self._entries) > self.max_entries
+                or self._bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, char_id: int):
+        with self._lock:
+            self._discard(char_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _discard(self, char_id: int):
+        entry = self._entries.pop(char_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+
+class SharedTier:
+    """Optional tier on top of a Django cache shared between workers."""
+
+    def __init__(self, alias: str, timeout: int):
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(char_id: int, version: int) -> str:
+        return f"dnd:sheet:{char_id}:{version}"
+
+    def get(self, char_id: int, version: int):
+        data = self.cache.get(self.key(char_id, version))
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def set(self, char_id: int, version: int, data):
+        self.cache.set(self.key(char_id, version), data, self.timeout)
+
+    def delete(self, char_id: int, version: int):
+        self.cache.delete(self.key(char_id, version))
+
+    def clear(self):
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class SheetCache:
+    """
+    Cache of character sheets keyed by character id and version, either
+    parsed or as JSON text (see Character.load_json). Returned sheets are
+    shared between callers and must not be mutated.
+    """
+
+    def __init__(self, local: LocalTier, shared: SharedTier | None = None):
+        self.local = local
+        self.shared = shared
+
+    @classmethod
+    def from_settings(cls) -> "SheetCache":
+        conf = DEFAULTS | getattr(settings, "CHARACTER_SHEET_CACHE", {})
+        shared = None
+        if conf["SHARED_CACHE"]:
+            shared = SharedTier(conf["SHARED_CACHE"], conf["SHARED_TIMEOUT"])
+        return cls(LocalTier(conf["MAX_ENTRIES"], conf["MAX_BYTES"]), shared)
+
+    def get(self, char_id: int, version: int):
+        data = self.local.get(char_id, version)
+        if data is None and self.shared is not None:
+            data = self.shared.get(char_id, version)
+            if data is not None:
+                self.local.set(char_id, version, data, _size_of(data))
+        return data
+
+    def set(self, char_id: int, version: int, data, size: int | None = None):
+        self.local.set(char_id, version, data, size or _size_of(data))
+        if self.shared is not None:
+            self.shared.set(char_id, version, data)
+
+    def invalidate(self, char_id: int, version: int):
+        """
+        Drops cached sheets of a character that was saved as `version`.
+        Older versions are never requested again and expire on their own,
+        the new one is cleared in case the id was reused after a delete.
+        """
+        self.local.delete(char_id)
+        if self.shared is not None:
+            self.shared.delete(char_id, version)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> dict:
+        stats = {"local": self.local.stats()}
+        if self.shared is not None:
+            stats["shared"] = self.shared.stats()
+        return stats
+
+
+def _size_of(data) -> int:
+    if isinstance(data, str):
+        return len(data)
+    return len(json.dumps(data, ensure_ascii=False))
+
+
+_sheet_cache = None
+
+
+def get_sheet_cache() -> SheetCache:
+    global _sheet_cache  # noqa: PLW0603
+    if _sheet_cache is None:
+        _sheet_cache = SheetCache.from_settings()
+    return _sheet_cache
+
+
+@receiver(setting_changed)
+def _reset_sheet_cache(setting, **kwargs):
+    global _sheet_cache  # noqa: PLW0603
+    if setting in {"CHARACTER_SHEET_CACHE", "CACHES"}:
+        _sheet_cache = None
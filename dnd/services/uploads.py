@@ -0,0 +1,110 @@
+import warnings
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.http import HttpRequest
+
+CHUNK_SIZE = 64 * 1024
+# room for multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class UploadRejectedError(ValueError):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Spools multipart files to disk and stops once they get too big."""
+
+    def __init__(self, request: HttpRequest, max_bytes: int):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            self.exceeded = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def receive_upload(
+    request: HttpRequest, field: str, max_bytes: int
+) -> TemporaryUploadedFile:
+    """
+    Returns uploaded file from a multipart form field or from the raw body,
+    spooled to a temporary file without holding it in memory.
+    Raises UploadRejectedError with status 413 once max_bytes is exceeded.
+    """
+    content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    if content_length > max_bytes + MULTIPART_OVERHEAD:
+        raise UploadRejectedError("Upload is too large", 413)
+
+    if request.content_type == "multipart/form-data":
+        handler = LimitedUploadHandler(request, max_bytes)
+        request.upload_handlers = [handler]
+        upload = request.FILES.get(field)
+        if handler.exceeded:
+            raise UploadRejectedError("Upload is too large", 413)
+        if upload is None:
+            raise UploadRejectedError(f"No file in field {field!r}")
+        return upload
+
+    upload = TemporaryUploadedFile(
+        field, request.content_type, 0, None, request.content_params
+    )
+    size = 0
+    while chunk := request.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            upload.close()
+            raise UploadRejectedError("Upload is too large", 413)
+        upload.write(chunk)
+    if not size:
+        upload.close()
+        raise UploadRejectedError("Upload is empty")
+    upload.size = size
+    upload.seek(0)
+    return upload
+
+
+def check_image(file, max_pixels: int | None = None) -> str:
+    """
+    Reads only the image header and rejects unsupported formats and images
+    with more than max_pixels pixels before anything gets decoded.
+    Returns the image format, file position is left where it was.
+    """
+    # Pillow is heavy to import and only needed once an image arrives
+    from PIL import Image as PILImage
+
+    max_pixels = max_pixels or settings.CAMPAIGN_ICON_MAX_PIXELS
+    position = file.tell()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", PILImage.DecompressionBombWarning)
+            image = PILImage.open(file)
+            width, height = image.size
+            image_format = image.format
+    except (
+        OSError,  # includes UnidentifiedImageError
+        SyntaxError,  # some plugins report broken headers this way
+        PILImage.DecompressionBombError,
+        PILImage.DecompressionBombWarning,
+    ) as e:
+        raise UploadRejectedError("File is not a supported image") from e
+    finally:
+        file.seek(position)
+
+    if image_format not in settings.CAMPAIGN_ICON_FORMATS:
+        raise UploadRejectedError(f"Image format {image_format} not allowed")
+    if width * height > max_pixels:
+        raise UploadRejectedError(
+            f"Image is too large: {width}x{height} pixels"
+        )
+    return image_format
@@ -0,0 +1,101 @@
+"""
+Query and storage budgets for API tests.
+
+    with query_budget(queries=2, storage_reads=1):
+        client.get(...)
+
+fails the test when the block runs more SQL queries or reads more character
+sheets from storage than allowed, listing what it ran. As a decorator,
+endpoint_budget() also names the operation a test covers, see
+TestQueryBudgets.test_every_route_has_budget.
+"""
+
+import functools
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from unittest import mock
+
+from django.db import connections
+
+from dnd.models import Character
+
+
+@dataclass
+class Usage:
+    queries: list[str] = field(default_factory=list)
+    storage_reads: list[int] = field(default_factory=list)
+
+
+@contextmanager
+def query_budget(queries: int, storage_reads: int = 0):
+    usage = Usage()
+
+    def count_query(execute, sql, params, many, context):
+        usage.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def counted(read):
+        def count_read(char_obj):
+            usage.storage_reads.append(char_obj.pk)
+            return read(char_obj)
+
+        return count_read
+
+    with ExitStack() as stack:
+        # async views query from other threads, each with its own wrapper
+        for conn in connections.all(initialized_only=False):
+            stack.enter_context(conn.execute_wrapper(count_query))
+        for read in ("_read_data", "_read_json"):
+            stack.enter_context(
+                mock.patch.object(
+                    Character, read, counted(getattr(Character, read))
+                )
+            )
+        yield usage
+
+    problems = []
+    if len(usage.queries) > queries:
+        problems.append(
+            f"{len(usage.queries)} queries, budget is {queries}:\n"
+            + "\n".join(usage.queries)
+        )
+    if len(usage.storage_reads) > storage_reads:
+        problems.append(
+            f"{len(usage.storage_reads)} storage reads, budget is "
+            f"{storage_reads}: characters {usage.storage_reads}"
+        )
+    if problems:
+        raise AssertionError("\n".join(problems))
+
+
+def endpoint_budget(
+    method: str, route: str, queries: int, storage_reads: int = 0
+):
+    """Runs the test under query_budget and records the route it covers."""
+
+    def decorator(test):
+        @functools.wraps(test)
+        def wrapper(self, *args, **kwargs):
+            with query_budget(queries, storage_reads):
+                return test(self, *args, **kwargs)
+
+        wrapper.budget_route = (method, route)
+        return wrapper
+
+    return decorator
+
+
+def api_routes(router, prefix: str = "") -> set[tuple[str, str]]:
+    """(method, path) of every operation of a ninja router and its children."""
+    routes = set()
+    for path, path_view in router.path_operations.items():
+        for operation in path_view.operations:
+            for method in operation.methods:
+                routes.add((method, _join(prefix, path)))
+    for child_prefix, child in router._routers:
+        routes |= api_routes(child, _join(prefix, child_prefix))
+    return routes
+
+
+def _join(prefix: str, path: str) -> str:
+    return "/".join(filter(None, f"{prefix}/{path}".split("/"))) + "/"
@@ -0,0 +1,28 @@
+from django.test import SimpleTestCase
+
+from benchmarks.endpoints import regressions
+
+
+def run(**scenarios):
+    return {"results": {"100": scenarios}}
+
+
+class TestEndpointRegressions(SimpleTestCase):
+    def test_within_threshold(self):
+        # Noise below the threshold is not a regression
+        baseline = run(ping={"rps": 1000, "p95_ms": 1.0})
+        current = run(ping={"rps": 850, "p95_ms": 1.2})
+        self.assertEqual(regressions(current, baseline, 0.25), [])
+
+    def test_slower(self):
+        # Higher p95 and lower throughput are both reported
+        baseline = run(ping={"rps": 1000, "p95_ms": 1.0})
+        current = run(ping={"rps": 500, "p95_ms": 2.0})
+        found = regressions(current, baseline, 0.25)
+        self.assertEqual(len(found), 2)
+        self.assertIn("100 ping: p95 1.0 ms -> 2.0 ms", found)
+
+    def test_new_scenario(self):
+        # Scenarios missing from the baseline are skipped
+        current = run(ping={"rps": 1, "p95_ms": 100})
+        self.assertEqual(regressions(current, run(), 0.25), [])
@@ -0,0 +1,19 @@
+from django.test import SimpleTestCase
+
+from benchmarks.boot_time import boot
+
+
+class TestApiBoot(SimpleTestCase):
+    def test_lean_profile_boot(self):
+        # API-only worker answers without loading Pillow or the admin
+        modules = set(boot("my_app.settings_api").stdout.split())
+        self.assertIn("dnd.api.campaign", modules)
+        self.assertNotIn("PIL", modules)
+        self.assertNotIn("django.contrib.admin", modules)
+        self.assertNotIn("django.contrib.sessions", modules)
+
+    def test_default_profile_boot(self):
+        # Full settings still serve the admin, but not Pillow at boot
+        modules = set(boot("my_app.settings").stdout.split())
+        self.assertIn("django.contrib.admin", modules)
+        self.assertNotIn("PIL", modules)
@@ -1,12 +1,28 @@
 import base64
 import json
 from io import BytesIO
+from unittest import mock
 
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from PIL import Image
 
-from dnd.models import Campaign, CampaignMembership, Player
+from dnd.models import Campaign, CampaignMembership, Character, Job, Player
 from dnd.schemas.campaign import CampaignPermissions
+from dnd.services import campaign_icons, jobs
+
+
+def make_icon(size=(100, 100), image_format="PNG", encode=True, color="red"):
+    image = Image.new("RGB", size, color=color)
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+    if encode:
+        return base64.b64encode(buffer.getvalue()).decode("utf-8")
+    return buffer.getvalue()
 
 
 class TestCampaignAPI(TestCase):
@@ -47,7 +63,18 @@ class TestCampaignAPI(TestCase):
         # Verify campaign and membership creation
         campaign = Campaign.objects.get(title="New Campaign")
         self.assertEqual(campaign.description, "A test campaign")
+        self.assertEqual(campaign.icon_status, Campaign.ICON_PROCESSING)
+        self.assertFalse(campaign.icon)
+
+        # Icon is normalized by the background worker
+        self.assertEqual(jobs.run_pending(), 1)
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.icon_status, Campaign.ICON_READY)
         self.assertTrue(campaign.icon.name.endswith(".png"))
+        self.assertFalse(campaign.icon_source)
+        self.assertEqual(set(campaign.icon_thumbnails), {"64", "128", "256"})
+        with campaign.icon.open("rb") as f:
+            self.assertEqual(Image.open(f).format, "PNG")
         self.assertTrue(
             CampaignMembership.objects.filter(
                 user=self.player1,
@@ -56,6 +83,58 @@ class TestCampaignAPI(TestCase):
             ).exists()
         )
 
+    def test_create_campaign_not_an_image(self):
+        # Icons that are not images are rejected before reaching the worker
+        payload = {
+            "telegram_id": self.player1.telegram_id,
+            "title": "Broken Icon",
+            "icon": base64.b64encode(b"not an image").decode(),
+        }
+        response = self.client.post(
+            "/api/campaign/create/",
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Campaign.objects.filter(title="Broken Icon").exists())
+
+    def test_create_campaign_icon_processing_fails(self):
+        # Icon that can't be processed ends up failed after all retries
+        payload = {
+            "telegram_id": self.player1.telegram_id,
+            "title": "Broken Icon",
+            "icon": make_icon(),
+        }
+        self.client.post(
+            "/api/campaign/create/",
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+        campaign = Campaign.objects.get(title="Broken Icon")
+        with campaign.icon_source.open("wb") as f:
+            f.write(b"corrupted")
+        with self.settings(JOB_RETRY_DELAY=0):
+            jobs.run_pending()
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.icon_status, Campaign.ICON_FAILED)
+
+    def test_create_campaign_invalid_base64(self):
+        # Test 400 when icon is not base64
+        payload = {
+            "telegram_id": self.player1.telegram_id,
+            "title": "Invalid Icon",
+            "icon": "%%%",
+        }
+        response = self.client.post(
+            "/api/campaign/create/",
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(
+            Campaign.objects.filter(title="Invalid Icon").exists()
+        )
+
     def test_create_campaign_missing_player(self):
         # Test 404 when player does not exist
         payload = {
@@ -84,8 +163,11 @@ class TestCampaignAPI(TestCase):
                 "title": "Test Campaign",
                 "description": "",
                 "icon": None,
+                "icon_status": Campaign.ICON_NONE,
+                "icon_thumbnails": {},
                 "verified": True,
                 "private": False,
+                "role": None,
             },
         )
 
@@ -306,3 +388,641 @@ class TestCampaignAPI(TestCase):
         # self.assertFalse(
         #     any(c["id"] == self.campaign.id for c in campaigns)
         # )  # player2 has no access to the campaign
+
+
+class TestCampaignRosterAPI(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Test Campaign")
+        self.other_campaign = Campaign.objects.create(title="Other")
+        self.characters = []
+        for n in range(5):
+            character = Character.objects.create(
+                owner=self.player, campaign=self.campaign
+            )
+            character.save_data({"n": n})
+            self.characters.append(character)
+        Character.objects.create(
+            owner=self.player, campaign=self.other_campaign
+        )
+
+    def get_roster(self, query=""):
+        response = self.client.get(
+            f"/api/campaign/{self.campaign.id}/characters/?{query}"
+        )
+        body = b"".join(response.streaming_content).decode()
+        return response, body
+
+    def test_roster_json_array(self):
+        # Streams all campaign characters as a JSON array
+        response, body = self.get_roster()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        characters = json.loads(body)
+        self.assertEqual(
+            [c["id"] for c in characters], [c.id for c in self.characters]
+        )
+        self.assertEqual(characters[2]["data"], {"n": 2})
+        self.assertEqual(
+            characters[0]["owner_telegram_id"], self.player.telegram_id
+        )
+
+    def test_roster_ndjson(self):
+        # One JSON document per line
+        response, body = self.get_roster("format=ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = body.splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[4])["data"], {"n": 4})
+
+    def test_roster_resume_after_cursor(self):
+        # Keyset cursor resumes after the last received id
+        _, body = self.get_roster(f"after={self.characters[1].id}&limit=2")
+        self.assertEqual(
+            [c["id"] for c in json.loads(body)],
+            [c.id for c in self.characters[2:4]],
+        )
+
+    def test_roster_empty(self):
+        # Campaign without characters is an empty array
+        response = self.client.get(
+            f"/api/campaign/{self.other_campaign.id}/characters/?after=9999"
+        )
+        self.assertEqual(b"".join(response.streaming_content), b"[]")
+
+    def test_roster_private_campaign(self):
+        # Private rosters are hidden from non-members
+        self.campaign.private = True
+        self.campaign.save()
+        response = self.client.get(
+            f"/api/campaign/{self.campaign.id}/characters/"
+        )
+        self.assertEqual(response.status_code, 404)
+        CampaignMembership.objects.create(
+            user=self.player, campaign=self.campaign
+        )
+        response, body = self.get_roster(f"user_id={self.player.id}")
+        self.assertEqual(len(json.loads(body)), 5)
+
+
+class TestCampaignIconUploadAPI(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = Player.objects.create(telegram_id=1001)
+        self.player = Player.objects.create(telegram_id=1002)
+        self.campaign = Campaign.objects.create(title="Test Campaign")
+        CampaignMembership.objects.create(
+            user=self.owner,
+            campaign=self.campaign,
+            status=CampaignPermissions.OWNER,
+        )
+        self.url = (
+            f"/api/campaign/{self.campaign.id}/icon/?owner_id={self.owner.id}"
+        )
+
+    def assert_processed(self):
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.icon_status, Campaign.ICON_PROCESSING)
+        jobs.run_pending()
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.icon_status, Campaign.ICON_READY)
+        self.assertTrue(self.campaign.icon.name.endswith(".png"))
+
+    def test_upload_multipart(self):
+        # Icon sent as a multipart form field
+        icon = SimpleUploadedFile(
+            "icon.jpg", make_icon(image_format="JPEG", encode=False)
+        )
+        response = self.client.post(self.url, data={"icon": icon})
+        self.assertEqual(response.status_code, 202)
+        self.assert_processed()
+
+    def test_upload_raw_body(self):
+        # Icon sent as the raw request body
+        response = self.client.post(
+            self.url, data=make_icon(encode=False), content_type="image/png"
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assert_processed()
+
+    def test_reupload_while_processing(self):
+        # Newer upload wins over the one the worker is busy with
+        def post(color):
+            response = self.client.post(
+                self.url,
+                data=make_icon(encode=False, color=color),
+                content_type="image/png",
+            )
+            self.assertEqual(response.status_code, 202)
+
+        post("red")
+        check_image = campaign_icons.check_image
+        with mock.patch.object(
+            campaign_icons,
+            "check_image",
+            side_effect=lambda f: (post("blue"), check_image(f)),
+        ):
+            jobs.run_pending(limit=1)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.icon_status, Campaign.ICON_PROCESSING)
+        self.assertFalse(self.campaign.icon)
+
+        jobs.run_pending()
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.icon_status, Campaign.ICON_READY)
+        self.assertFalse(self.campaign.icon_source)
+        with self.campaign.icon.open("rb") as f:
+            self.assertEqual(Image.open(f).getpixel((0, 0)), (0, 0, 255))
+        for job in Job.objects.all():
+            self.assertFalse(default_storage.exists(job.payload["source"]))
+
+    def test_reupload_replaces_pending(self):
+        # Upload still waiting for the worker is deleted and its job skips
+        for color in ("red", "blue"):
+            self.client.post(
+                self.url,
+                data=make_icon(encode=False, color=color),
+                content_type="image/png",
+            )
+        first = Job.objects.order_by("id").first().payload["source"]
+        self.assertFalse(default_storage.exists(first))
+        jobs.run_pending()
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.icon_status, Campaign.ICON_READY)
+        with self.campaign.icon.open("rb") as f:
+            self.assertEqual(Image.open(f).getpixel((0, 0)), (0, 0, 255))
+
+    @override_settings(CAMPAIGN_ICON_MAX_BYTES=100)
+    def test_upload_too_many_bytes(self):
+        # Byte limit applies to both upload kinds
+        data = make_icon(size=(300, 300), encode=False)
+        response = self.client.post(
+            self.url, data=data, content_type="image/png"
+        )
+        self.assertEqual(response.status_code, 413)
+        response = self.client.post(
+            self.url, data={"icon": SimpleUploadedFile("icon.png", data)}
+        )
+        self.assertEqual(response.status_code, 413)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.icon_status, Campaign.ICON_NONE)
+
+    @override_settings(CAMPAIGN_ICON_MAX_PIXELS=100 * 100)
+    def test_upload_too_many_pixels(self):
+        # Dimensions from the header are checked before decoding
+        response = self.client.post(
+            self.url,
+            data=make_icon(size=(101, 100), encode=False),
+            content_type="image/png",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("101x100", response.json()["message"])
+
+    def test_upload_not_an_image(self):
+        # Test 400 for files PIL can't identify
+        response = self.client.post(
+            self.url, data=b"GIF89a-nope", content_type="image/gif"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_upload_missing_field(self):
+        # Test 400 when multipart form has no icon
+        response = self.client.post(self.url, data={"other": "value"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_upload_not_owner(self):
+        # Test 403 when non-owner uploads an icon
+        response = self.client.post(
+            f"/api/campaign/{self.campaign.id}/icon/"
+            f"?owner_id={self.player.id}",
+            data=make_icon(encode=False),
+            content_type="image/png",
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class TestCampaignAsyncAPI(TestCase):
+    def setUp(self):
+        self.player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Test Campaign")
+        CampaignMembership.objects.create(
+            user=self.player, campaign=self.campaign, status=2
+        )
+        for n in range(3):
+            Character.objects.create(
+                owner=self.player, campaign=self.campaign
+            ).save_data({"n": n})
+
+    async def test_roster_streams_async(self):
+        # Under ASGI the roster is an async stream, not a buffered list
+        url = f"/api/campaign/{self.campaign.id}/characters/"
+        response = await self.async_client.get(url)
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response])
+        self.assertEqual(
+            [c["data"] for c in json.loads(body)],
+            [{"n": 0}, {"n": 1}, {"n": 2}],
+        )
+
+        response = await self.async_client.get(f"{url}?format=ndjson")
+        body = b"".join([chunk async for chunk in response])
+        self.assertEqual(len(body.splitlines()), 3)
+
+    async def test_get_and_add(self):
+        # Reads and membership writes work through the ASGI handler
+        response = await self.async_client.get(
+            f"/api/campaign/get/?campaign_id={self.campaign.id}"
+            f"&user_id={self.player.id}"
+        )
+        self.assertEqual(response.json()["role"], 2)
+
+        other = await Player.objects.acreate(telegram_id=1002)
+        response = await self.async_client.post(
+            f"/api/campaign/{self.campaign.id}/add/",
+            {"owner_id": self.player.id, "user_id": other.id},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(
+            await CampaignMembership.objects.filter(user=other).aexists()
+        )
+
+
+class TestCampaignConditionalGet(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Public")
+        self.private = Campaign.objects.create(title="Private", private=True)
+
+    def test_save_bumps_version(self):
+        # Every save changes the campaign ETag
+        etag = self.campaign.etag
+        self.campaign.title = "Renamed"
+        self.campaign.save(update_fields=["title"])
+        self.assertNotEqual(self.campaign.etag, etag)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.title, "Renamed")
+
+    def test_get_by_id_not_modified(self):
+        # Matching If-None-Match is answered with 304 and no body
+        url = f"/api/campaign/get/?campaign_id={self.campaign.id}"
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        self.campaign.description = "changed"
+        self.campaign.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_private_campaign_not_revealed(self):
+        # ETag check does not bypass the visibility check
+        response = self.client.get(
+            f"/api/campaign/get/?campaign_id={self.private.id}",
+            HTTP_IF_NONE_MATCH="*",
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_aggregate_etag(self):
+        # List ETag changes when any visible campaign changes
+        url = f"/api/campaign/get/?user_id={self.player.id}"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        # invisible campaign changing does not matter
+        self.private.title = "Still hidden"
+        self.private.save()
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        # becoming a member makes the private campaign visible
+        CampaignMembership.objects.create(
+            user=self.player, campaign=self.private
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        self.campaign.title = "Renamed"
+        self.campaign.save()
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+
+class TestCampaignListPagination(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.player = Player.objects.create(telegram_id=1001)
+        self.public = [
+            Campaign.objects.create(title=f"Public {i}") for i in range(5)
+        ]
+        self.private = Campaign.objects.create(title="Private", private=True)
+        self.hidden = Campaign.objects.create(title="Hidden", private=True)
+        CampaignMembership.objects.create(
+            user=self.player, campaign=self.private, status=0
+        )
+
+    def fetch_all(self, **params) -> list[int]:
+        ids, cursor = [], None
+        while True:
+            query = {**params, **({"cursor": cursor} if cursor else {})}
+            response = self.client.get("/api/campaign/get/", query)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            ids += [item["id"] for item in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return ids
+
+    def test_pages_cover_list_once(self):
+        # Following next_cursor visits every public campaign once, in order
+        ids = self.fetch_all(limit=2)
+        self.assertEqual(ids, [c.id for c in self.public])
+
+    def test_pages_include_member_campaigns(self):
+        # Member's private campaigns are paged together with public ones
+        ids = self.fetch_all(limit=3, user_id=self.player.id)
+        self.assertEqual(ids, [c.id for c in self.public] + [self.private.id])
+
+    def test_last_page_has_no_cursor(self):
+        # Exactly filled last page does not point to an empty one
+        response = self.client.get("/api/campaign/get/", {"limit": 5})
+        self.assertEqual(len(response.json()["items"]), 5)
+        self.assertIsNone(response.json()["next_cursor"])
+
+    def test_cursor_is_stable_under_inserts(self):
+        # Campaigns created mid-listing neither repeat nor shift the pages
+        first = self.client.get("/api/campaign/get/", {"limit": 2}).json()
+        Campaign.objects.create(title="Late")
+        second = self.client.get(
+            "/api/campaign/get/",
+            {"limit": 2, "cursor": first["next_cursor"]},
+        ).json()
+        self.assertEqual(
+            [item["id"] for item in second["items"]],
+            [c.id for c in self.public[2:4]],
+        )
+
+    @override_settings(CAMPAIGN_PAGE_MAX_LIMIT=3)
+    def test_limit_is_capped(self):
+        # Requested limit above the maximum is clamped
+        response = self.client.get("/api/campaign/get/", {"limit": 100})
+        self.assertEqual(len(response.json()["items"]), 3)
+
+    def test_total_is_cached_estimate(self):
+        # Total is counted once and then served from cache
+        cache.clear()
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                "/api/campaign/get/", {"limit": 2, "include_total": True}
+            )
+        self.assertEqual(response.json()["total"], 5)
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                "/api/campaign/get/", {"limit": 2, "include_total": True}
+            )
+        self.assertEqual(response.json()["total"], 5)
+
+    def test_total_omitted_by_default(self):
+        # Total is not computed unless asked for
+        response = self.client.get("/api/campaign/get/", {"limit": 2})
+        self.assertIsNone(response.json()["total"])
+
+    def test_plain_list_without_pagination(self):
+        # Without limit or cursor the list keeps its original shape
+        response = self.client.get("/api/campaign/get/")
+        self.assertEqual(
+            [item["id"] for item in response.json()],
+            [c.id for c in self.public],
+        )
+
+
+class TestCampaignVisibleTo(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.player = Player.objects.create(telegram_id=1001)
+        self.public = Campaign.objects.create(title="Public")
+        self.joined = Campaign.objects.create(title="Joined")
+        self.private = Campaign.objects.create(title="Private", private=True)
+        self.hidden = Campaign.objects.create(title="Hidden", private=True)
+        CampaignMembership.objects.create(
+            user=self.player, campaign=self.joined, status=1
+        )
+        CampaignMembership.objects.create(
+            user=self.player, campaign=self.private, status=2
+        )
+
+    def test_anonymous_sees_public(self):
+        # Without a user only public campaigns are visible, with no role
+        campaigns = Campaign.objects.visible_to(None).order_by("id")
+        self.assertEqual(
+            [(c.id, c.role) for c in campaigns],
+            [(self.public.id, None), (self.joined.id, None)],
+        )
+
+    def test_member_roles_in_one_query(self):
+        # Member's private campaigns and roles come from a single query
+        with self.assertNumQueries(1):
+            campaigns = list(
+                Campaign.objects.visible_to(self.player.id).order_by("id")
+            )
+        self.assertEqual(
+            [(c.id, c.role) for c in campaigns],
+            [
+                (self.public.id, None),
+                (self.joined.id, 1),
+                (self.private.id, 2),
+            ],
+        )
+
+    def test_can_be_filtered_further(self):
+        # Unlike the former union, the result is an ordinary queryset
+        campaigns = Campaign.objects.visible_to(self.player.id).filter(
+            id__gt=self.joined.id, title__startswith="P"
+        )
+        self.assertEqual([c.id for c in campaigns], [self.private.id])
+
+    def test_api_returns_role(self):
+        # Campaign responses include the requesting user's role
+        response = self.client.get(
+            f"/api/campaign/get/?user_id={self.player.id}"
+        )
+        self.assertEqual(
+            {c["id"]: c["role"] for c in response.json()},
+            {self.public.id: None, self.joined.id: 1, self.private.id: 2},
+        )
+
+        response = self.client.get(
+            f"/api/campaign/get/?campaign_id={self.private.id}"
+            f"&user_id={self.player.id}"
+        )
+        self.assertEqual(response.json()["role"], 2)
+
+    def test_role_change_changes_etag(self):
+        # Conditional reads notice a changed role of the user
+        for url in (
+            f"/api/campaign/get/?user_id={self.player.id}",
+            f"/api/campaign/get/?campaign_id={self.joined.id}"
+            f"&user_id={self.player.id}",
+        ):
+            etag = self.client.get(url)["ETag"]
+            CampaignMembership.objects.filter(
+                user=self.player, campaign=self.joined
+            ).update(status=0)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            CampaignMembership.objects.filter(
+                user=self.player, campaign=self.joined
+            ).update(status=1)
+
+
+class TestCampaignBulkMembersAPI(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = Player.objects.create(telegram_id=1001)
+        self.players = [
+            Player.objects.create(telegram_id=2000 + i) for i in range(4)
+        ]
+        self.campaign = Campaign.objects.create(title="Campaign")
+        self.url = f"/api/campaign/{self.campaign.id}/members/"
+        CampaignMembership.objects.create(
+            user=self.owner, campaign=self.campaign, status=2
+        )
+        CampaignMembership.objects.create(
+            user=self.players[0], campaign=self.campaign, status=0
+        )
+        CampaignMembership.objects.create(
+            user=self.players[1], campaign=self.campaign, status=0
+        )
+
+    def post(self, changes, owner_id=None):
+        return self.client.post(
+            self.url,
+            data=json.dumps(
+                {"owner_id": owner_id or self.owner.id, "changes": changes}
+            ),
+            content_type="application/json",
+        )
+
+    def roles(self):
+        return dict(
+            CampaignMembership.objects.filter(
+                campaign=self.campaign
+            ).values_list("user_id", "status")
+        )
+
+    def test_bulk_changes(self):
+        # Adds, re-roles and removes members in one request
+        p0, p1, p2, p3 = self.players
+        response = self.post(
+            [
+                {"user_id": p0.id, "status": 1},
+                {"user_id": p1.id, "status": None},
+                {"user_id": p2.id, "status": 0},
+                {"user_id": p3.id, "status": None},
+                {"user_id": 9999, "status": 0},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"user_id": p0.id, "result": "updated"},
+                {"user_id": p1.id, "result": "removed"},
+                {"user_id": p2.id, "result": "added"},
+                {"user_id": p3.id, "result": "not_member"},
+                {"user_id": 9999, "result": "not_found"},
+            ],
+        )
+        self.assertEqual(self.roles(), {self.owner.id: 2, p0.id: 1, p2.id: 0})
+
+    def test_unchanged(self):
+        # Setting the role a member already has writes nothing
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post(
+                [{"user_id": self.players[0].id, "status": 0}]
+            )
+        self.assertEqual(response.json()["results"][0]["result"], "unchanged")
+        self.assertFalse(
+            [q for q in ctx if q["sql"].startswith(("INSERT", "UPDATE"))]
+        )
+
+    def test_query_count_does_not_grow(self):
+        # Many changes cost as many queries as a single one
+        with CaptureQueriesContext(connection) as one:
+            self.post([{"user_id": self.players[0].id, "status": 1}])
+        with CaptureQueriesContext(connection) as many:
+            self.post(
+                [
+                    {"user_id": player.id, "status": 1 if n % 2 else 2}
+                    for n, player in enumerate(self.players)
+                ]
+            )
+        self.assertEqual(len(many), len(one))
+        self.assertEqual(
+            self.roles(),
+            {
+                self.owner.id: 2,
+                **{
+                    player.id: 1 if n % 2 else 2
+                    for n, player in enumerate(self.players)
+                },
+            },
+        )
+
+    def test_role_cache_invalidated(self):
+        # Owner removed in bulk loses owner rights right away
+        self.post([{"user_id": self.players[0].id, "status": 2}])
+        self.post([{"user_id": self.owner.id, "status": None}])
+        response = self.post(
+            [{"user_id": self.players[1].id, "status": 1}],
+            owner_id=self.owner.id,
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_not_owner(self):
+        # Only the owner can change members
+        response = self.post(
+            [{"user_id": self.players[2].id, "status": 0}],
+            owner_id=self.players[0].id,
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn(self.players[2].id, self.roles())
+
+    def test_duplicate_users(self):
+        # Same user twice is rejected as ambiguous
+        response = self.post(
+            [
+                {"user_id": self.players[2].id, "status": 0},
+                {"user_id": self.players[2].id, "status": None},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(MEMBERSHIP_BATCH_MAX=2)
+    def test_too_many_changes(self):
+        # Batch size is limited
+        response = self.post(
+            [{"user_id": p.id, "status": 0} for p in self.players]
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(DEBUG=True)
+    def test_debug_reports_queries(self):
+        # With DEBUG on the response tells its query count
+        response = self.post([{"user_id": self.players[2].id, "status": 0}])
+        self.assertGreater(response.json()["queries"], 0)
+
+    def test_queries_hidden_without_debug(self):
+        # Query count is not reported in production
+        response = self.post([{"user_id": self.players[2].id, "status": 0}])
+        self.assertIsNone(response.json()["queries"])
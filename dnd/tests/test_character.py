@@ -1,9 +1,21 @@
+import importlib
 import json
+from types import SimpleNamespace
+from unittest import mock
 
-from django.test import Client, TestCase
+from django.apps import apps
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, TestCase, override_settings
 
 from dnd.models import Campaign, CampaignMembership, Character, Player
 from dnd.schemas.campaign import CampaignPermissions
+from dnd.services.json_patch import (
+    JsonPatchError,
+    apply_json_patch,
+    merge_patch,
+)
+from dnd.services.sheet_cache import LocalTier, get_sheet_cache
 
 
 class TestCharacterAPI(TestCase):
@@ -27,23 +39,23 @@ class TestCharacterAPI(TestCase):
         )
         self.character.save_data(self.character_data)
 
-    # def test_get_character_success(self):
-    #     # Test successful retrieval of a character by ID
-    #     response = self.client.get(
-    #         f"/api/character/get/?char_id={self.character.id}",
-    #         content_type="application/json",
-    #     )
-    #     self.assertEqual(response.status_code, 200)
-    #     self.assertEqual(
-    #         response.json(),
-    #         {
-    #             "id": self.character.id,
-    #             "owner_id": self.player1.id,
-    #             "owner_telegram_id": self.player1.telegram_id,
-    #             "campaign_id": self.campaign.id,
-    #             "data": self.character_data,
-    #         },
-    #     )
+    def test_get_character_success(self):
+        # Test successful retrieval of a character by ID
+        response = self.client.get(
+            f"/api/character/get/?char_id={self.character.id}",
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "id": self.character.id,
+                "owner_id": self.player1.id,
+                "owner_telegram_id": self.player1.telegram_id,
+                "campaign_id": self.campaign.id,
+                "data": self.character_data,
+            },
+        )
 
     def test_get_character_not_found(self):
         # Test 404 for non-existent character
@@ -135,3 +147,463 @@ class TestCharacterAPI(TestCase):
             content_type="application/json",
         )
         self.assertEqual(response.status_code, 400)
+
+
+class TestCharacterAsyncAPI(TestCase):
+    def setUp(self):
+        self.player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Test Campaign")
+        self.character = Character.objects.create(
+            owner=self.player, campaign=self.campaign
+        )
+        self.character.save_data({"name": "Hero"})
+
+    async def test_get_and_patch(self):
+        # Character reads and writes work through the ASGI handler
+        url = f"/api/character/get/?char_id={self.character.id}"
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json()["data"], {"name": "Hero"})
+
+        response = await self.async_client.patch(
+            f"/api/character/{self.character.id}/",
+            {"level": 2},
+            content_type="application/json",
+            headers={"If-Match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"], {"name": "Hero", "level": 2})
+
+    async def test_batch(self):
+        # Batch reads gather sheets from the read pool
+        response = await self.async_client.get(
+            f"/api/character/batch/?ids={self.character.id}&ids=9999"
+        )
+        self.assertEqual(len(response.json()["characters"]), 1)
+        self.assertEqual(response.json()["errors"][0]["id"], 9999)
+
+
+class TestCharacterStorage(TestCase):
+    def setUp(self):
+        self.player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Test Campaign")
+        self.character_data = json.load(
+            open("dnd/tests/example-character.json", encoding="utf-8")
+        )
+
+    def test_database_storage_round_trip(self):
+        # Sheet is stored in the JSON column and survives a reload
+        character = Character.objects.create(
+            owner=self.player, campaign=self.campaign
+        )
+        character.save_data(self.character_data)
+
+        character = Character.objects.get(id=character.id)
+        self.assertEqual(character.sheet, self.character_data)
+        self.assertFalse(character.data)
+        self.assertEqual(character.load_data(), self.character_data)
+        self.assertEqual(character.get("info", "level", "value"), 6)
+
+    @override_settings(CHARACTER_STORAGE="file")
+    def test_file_storage_round_trip(self):
+        # Legacy mode writes a file and persists its name on the row
+        character = Character.objects.create(
+            owner=self.player, campaign=self.campaign
+        )
+        character.save_data(self.character_data)
+
+        character = Character.objects.get(id=character.id)
+        self.assertIsNone(character.sheet)
+        self.assertTrue(character.data.name.startswith("chardata/"))
+        self.assertEqual(character.load_data(), self.character_data)
+
+    def test_database_sheet_takes_precedence_over_file(self):
+        # Sheets moved to the database shadow their legacy files
+        character = Character.objects.create(
+            owner=self.player, campaign=self.campaign
+        )
+        with self.settings(CHARACTER_STORAGE="file"):
+            character.save_data({"name": "old"})
+        character.save_data({"name": "new"})
+
+        character = Character.objects.get(id=character.id)
+        self.assertEqual(character.load_data(), {"name": "new"})
+
+    def test_move_sheets_migration(self):
+        # Data migration copies file blobs into the JSON column
+        migration = importlib.import_module(
+            "dnd.migrations.0006_move_character_sheets"
+        )
+        with self.settings(CHARACTER_STORAGE="file"):
+            characters = [
+                Character.objects.create(
+                    owner=self.player, campaign=self.campaign
+                )
+                for _ in range(3)
+            ]
+            for n, character in enumerate(characters):
+                character.save_data({"n": n})
+
+        schema_editor = SimpleNamespace(connection=connection)
+        migration.move_sheets_to_database(apps, schema_editor)
+
+        for n, character in enumerate(characters):
+            character.refresh_from_db()
+            self.assertEqual(character.sheet, {"n": n})
+
+
+class TestCharacterSheetCache(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Test Campaign")
+        self.character = Character.objects.create(
+            owner=self.player, campaign=self.campaign
+        )
+        self.character.save_data({"hp": 10})
+        self.cache = get_sheet_cache()
+        self.cache.clear()
+
+    def test_repeated_reads_hit_cache(self):
+        # Second read of the same version is served from memory
+        url = f"/api/character/get/?char_id={self.character.id}"
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.json()["data"], {"hp": 10})
+        stats = self.cache.stats()["local"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_conditional_get(self):
+        # 304 is answered from the row version without loading the sheet
+        url = f"/api/character/get/?char_id={self.character.id}"
+        etag = self.client.get(url)["ETag"]
+        self.cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.cache.stats()["local"]["misses"], 0)
+
+        self.character.save_data({"hp": 3})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], self.character.etag)
+
+    def test_save_data_invalidates(self):
+        # New version is never served from the stale cache entry
+        self.assertEqual(self.character.load_data(), {"hp": 10})
+        self.character.save_data({"hp": 3})
+        character = Character.objects.get(id=self.character.id)
+        self.assertEqual(character.load_data(), {"hp": 3})
+        self.assertEqual(self.cache.stats()["local"]["entries"], 1)
+
+    def test_set_does_not_mutate_cached_sheet(self):
+        # set() works on a copy, readers of the old version are unaffected
+        self.character.save_data({"stats": {"hp": 10}})
+        cached = self.character.load_data()
+        self.assertTrue(self.character.set("stats", hp=5))
+        self.assertEqual(cached, {"stats": {"hp": 10}})
+        self.assertEqual(self.character.get("stats", "hp"), 5)
+
+    def test_lru_eviction(self):
+        # Least recently used entries go first, by count and by size
+        local = LocalTier(max_entries=2, max_bytes=100)
+        local.set(1, 0, "a", 10)
+        local.set(2, 0, "b", 10)
+        local.get(1, 0)
+        local.set(3, 0, "c", 10)
+        self.assertIsNone(local.get(2, 0))
+        self.assertEqual(local.get(1, 0), "a")
+        local.set(4, 0, "d", 95)
+        self.assertEqual(local.stats()["entries"], 1)
+        self.assertEqual(local.stats()["evictions"], 3)
+        local.set(5, 0, "e", 101)
+        self.assertIsNone(local.get(5, 0))
+
+    @override_settings(
+        CHARACTER_SHEET_CACHE={"SHARED_CACHE": "default", "MAX_ENTRIES": 0}
+    )
+    def test_shared_tier(self):
+        # Workers with a cold local tier read from the shared one
+        cache = get_sheet_cache()
+        self.assertEqual(self.character.load_data(), {"hp": 10})
+        self.assertEqual(self.character.load_data(), {"hp": 10})
+        self.assertEqual(cache.stats()["shared"], {"hits": 1, "misses": 1})
+        caches["default"].clear()
+
+
+class TestCharacterPassthrough(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Test Campaign")
+        self.character = Character.objects.create(
+            owner=self.player, campaign=self.campaign
+        )
+        self.url = f"/api/character/get/?char_id={self.character.id}"
+        get_sheet_cache().clear()
+
+    def test_stored_json_is_not_parsed(self):
+        # Response carries the stored text, the sheet is never parsed
+        self.character.save_data({"name": "Тест", "hp": [1, 2]})
+        stored = Character.objects.get(id=self.character.id)._read_json()
+        with mock.patch.object(Character, "_read_data") as read_data:
+            response = self.client.get(self.url)
+        read_data.assert_not_called()
+        self.assertIn(b'"data":' + stored.encode(), response.content)
+        self.assertEqual(
+            response.json(),
+            {
+                "id": self.character.id,
+                "owner_id": self.player.id,
+                "owner_telegram_id": 1001,
+                "campaign_id": self.campaign.id,
+                "data": {"name": "Тест", "hp": [1, 2]},
+            },
+        )
+        self.assertEqual(response["ETag"], '"1"')
+
+    @override_settings(CHARACTER_STORAGE="file")
+    def test_file_storage(self):
+        # Legacy files are passed through the same way
+        self.character.save_data({"file": True})
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()["data"], {"file": True})
+
+    def test_cache_shared_with_load_data(self):
+        # Text cached by a read is parsed once for load_data, and back
+        self.character.save_data({"hp": 10})
+        self.client.get(self.url)
+        character = Character.objects.get(id=self.character.id)
+        self.assertEqual(character.load_data(), {"hp": 10})
+        self.assertEqual(character.load_data(), {"hp": 10})
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()["data"], {"hp": 10})
+        self.assertEqual(get_sheet_cache().stats()["local"]["misses"], 1)
+
+
+class TestCharacterPatchAPI(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Test Campaign")
+        self.character = Character.objects.create(
+            owner=self.player, campaign=self.campaign
+        )
+        self.character.save_data(
+            {"name": "Веле", "stats": {"hp": 10, "ac": 12}, "items": ["rope"]}
+        )
+
+    def patch(self, body, content_type="application/merge-patch+json", **kw):
+        return self.client.patch(
+            f"/api/character/{self.character.id}/",
+            data=json.dumps(body),
+            content_type=content_type,
+            **kw,
+        )
+
+    def test_merge_patch(self):
+        # Merge patch changes one field and removes another
+        response = self.patch({"stats": {"hp": 4, "ac": None}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["stats"], {"hp": 4})
+        self.assertEqual(response["ETag"], '"2"')
+        self.character.refresh_from_db()
+        self.assertEqual(self.character.get("stats"), {"hp": 4})
+
+    def test_json_patch(self):
+        # JSON Patch operations are applied in order
+        response = self.patch(
+            [
+                {"op": "test", "path": "/stats/hp", "value": 10},
+                {"op": "replace", "path": "/stats/hp", "value": 7},
+                {"op": "add", "path": "/items/-", "value": "torch"},
+            ],
+            content_type="application/json-patch+json",
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()["data"]
+        self.assertEqual(data["stats"]["hp"], 7)
+        self.assertEqual(data["items"], ["rope", "torch"])
+
+    def test_json_patch_failed_test_op(self):
+        # Failing "test" operation rejects the whole patch
+        response = self.patch(
+            [
+                {"op": "replace", "path": "/stats/hp", "value": 7},
+                {"op": "test", "path": "/name", "value": "Other"},
+            ],
+            content_type="application/json-patch+json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.character.refresh_from_db()
+        self.assertEqual(self.character.get("stats", "hp"), 10)
+
+    def test_if_match_current_version(self):
+        # Matching ETag allows the write
+        etag = self.client.get(
+            f"/api/character/get/?char_id={self.character.id}"
+        )["ETag"]
+        response = self.patch({"stats": {"hp": 1}}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_match_stale_version(self):
+        # Editor holding an old version gets 409 and nothing is lost
+        stale = self.character.etag
+        self.patch({"stats": {"hp": 9}})
+        response = self.patch({"stats": {"hp": 1}}, HTTP_IF_MATCH=stale)
+        self.assertEqual(response.status_code, 409)
+        self.character.refresh_from_db()
+        self.assertEqual(self.character.get("stats", "hp"), 9)
+
+    def test_concurrent_save_conflicts(self):
+        # Version checked on write loses to a save made after the read
+        other = Character.objects.get(id=self.character.id)
+        self.character.save_data({"name": "first"})
+        self.assertFalse(
+            other.save_data({"name": "second"}, expected_version=other.version)
+        )
+        self.character.refresh_from_db()
+        self.assertEqual(self.character.load_data(), {"name": "first"})
+
+    def test_patch_invalid_json(self):
+        # Body that is not JSON is rejected
+        response = self.client.patch(
+            f"/api/character/{self.character.id}/",
+            data="{",
+            content_type="application/merge-patch+json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_patch_not_found(self):
+        # Test 404 for non-existent character
+        response = self.client.patch(
+            "/api/character/9999/",
+            data="{}",
+            content_type="application/merge-patch+json",
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TestJsonPatch(TestCase):
+    def test_merge_patch_rfc_example(self):
+        # Example from RFC 7396 section 3
+        target = {
+            "title": "Goodbye!",
+            "author": {"givenName": "John", "familyName": "Doe"},
+            "tags": ["example", "sample"],
+            "content": "This will be unchanged",
+        }
+        patch = {
+            "title": "Hello!",
+            "phoneNumber": "+01-234-567-8901",
+            "author": {"familyName": None},
+            "tags": ["example"],
+        }
+        self.assertEqual(
+            merge_patch(target, patch),
+            {
+                "title": "Hello!",
+                "author": {"givenName": "John"},
+                "tags": ["example"],
+                "content": "This will be unchanged",
+                "phoneNumber": "+01-234-567-8901",
+            },
+        )
+
+    def test_json_patch_operations(self):
+        # Move, copy and remove, including escaped pointer tokens
+        doc = {"a/b": 1, "list": [1, 2, 3], "nested": {"x": 1}}
+        result = apply_json_patch(
+            doc,
+            [
+                {"op": "move", "from": "/a~1b", "path": "/moved"},
+                {"op": "copy", "from": "/nested", "path": "/copy"},
+                {"op": "remove", "path": "/list/0"},
+                {"op": "add", "path": "/list/0", "value": 0},
+            ],
+        )
+        self.assertEqual(
+            result,
+            {
+                "moved": 1,
+                "list": [0, 2, 3],
+                "nested": {"x": 1},
+                "copy": {"x": 1},
+            },
+        )
+
+    def test_json_patch_errors(self):
+        # Invalid paths and operations raise JsonPatchError
+        for operations in (
+            [{"op": "remove", "path": "/missing"}],
+            [{"op": "replace", "path": "/list/5", "value": 1}],
+            [{"op": "add", "path": "no-slash", "value": 1}],
+            [{"op": "frobnicate", "path": "/list"}],
+            [{"op": "move", "from": "/list", "path": "/list/0"}],
+            {"op": "add"},
+        ):
+            with self.assertRaises(JsonPatchError):
+                apply_json_patch({"list": [1]}, operations)
+
+
+class TestCharacterBatchAPI(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Test Campaign")
+        self.characters = []
+        for n in range(5):
+            character = Character.objects.create(
+                owner=self.player, campaign=self.campaign
+            )
+            character.save_data({"n": n})
+            self.characters.append(character)
+        get_sheet_cache().clear()
+
+    def test_batch_success(self):
+        # All characters come back in requested order with one query
+        ids = [c.id for c in reversed(self.characters)]
+        query = "&".join(f"ids={i}" for i in ids)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/character/batch/?{query}")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([c["id"] for c in body["characters"]], ids)
+        self.assertEqual(body["characters"][0]["data"], {"n": 4})
+        self.assertEqual(
+            body["characters"][0]["owner_telegram_id"], self.player.telegram_id
+        )
+        self.assertEqual(body["errors"], [])
+
+    @override_settings(CHARACTER_STORAGE="file")
+    def test_batch_file_storage(self):
+        # Sheets stored as files are read by the thread pool
+        for n, character in enumerate(self.characters):
+            character.save_data({"file": n})
+        get_sheet_cache().clear()
+        query = "&".join(f"ids={c.id}" for c in self.characters)
+        response = self.client.get(f"/api/character/batch/?{query}")
+        self.assertEqual(
+            [c["data"] for c in response.json()["characters"]],
+            [{"file": n} for n in range(5)],
+        )
+
+    def test_batch_partial(self):
+        # Missing ids are reported without failing the whole batch
+        response = self.client.get(
+            f"/api/character/batch/?ids={self.characters[0].id}&ids=9999"
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(len(body["characters"]), 1)
+        self.assertEqual(
+            body["errors"], [{"id": 9999, "message": "Объект не найден"}]
+        )
+
+    @override_settings(CHARACTER_BATCH_MAX_IDS=2)
+    def test_batch_too_many_ids(self):
+        # Batch size is bounded
+        query = "&".join(f"ids={c.id}" for c in self.characters)
+        response = self.client.get(f"/api/character/batch/?{query}")
+        self.assertEqual(response.status_code, 400)
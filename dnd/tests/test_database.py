@@ -0,0 +1,148 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from my_app.database import database_config, replica_configs, sqlite_pragmas
+
+BASE_DIR = Path("/srv/dnd")
+
+
+class TestDatabaseConfig(SimpleTestCase):
+    def test_sqlite_default(self):
+        # Without DATABASE the local SQLite file is used
+        config = database_config({}, BASE_DIR)
+        self.assertEqual(config["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(config["NAME"], BASE_DIR / "db.sqlite3")
+        self.assertEqual(config["CONN_MAX_AGE"], 60)
+        self.assertTrue(config["CONN_HEALTH_CHECKS"])
+
+    def test_postgresql(self):
+        # PostgreSQL connection comes from DB_* variables
+        config = database_config(
+            {
+                "DATABASE": "postgresql",
+                "DB_NAME": "campaigns",
+                "DB_USER": "bot",
+                "DB_PASSWORD": "secret",
+                "DB_HOST": "db",
+                "DB_PORT": "6432",
+                "DB_CONN_MAX_AGE": "300",
+                "DB_CONN_HEALTH_CHECKS": "false",
+                # shell variables of the old scheme are ignored
+                "USER": "root",
+            },
+            BASE_DIR,
+        )
+        self.assertEqual(
+            config,
+            {
+                "ENGINE": "django.db.backends.postgresql",
+                "NAME": "campaigns",
+                "USER": "bot",
+                "PASSWORD": "secret",
+                "HOST": "db",
+                "PORT": "6432",
+                "OPTIONS": {},
+                "CONN_MAX_AGE": 300,
+                "CONN_HEALTH_CHECKS": False,
+            },
+        )
+
+    def test_legacy_spelling(self):
+        # "POSTRESQL" from old deployment files still selects PostgreSQL
+        config = database_config({"DATABASE": "POSTRESQL"}, BASE_DIR)
+        self.assertEqual(config["ENGINE"], "django.db.backends.postgresql")
+
+    def test_pool(self):
+        # Pooling replaces persistent connections
+        config = database_config(
+            {
+                "DATABASE": "POSTGRESQL",
+                "DB_POOL": "true",
+                "DB_POOL_MAX_SIZE": "20",
+            },
+            BASE_DIR,
+        )
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertEqual(
+            config["OPTIONS"]["pool"],
+            {"min_size": 2, "max_size": 20, "timeout": 10.0},
+        )
+
+    def test_unknown_engine(self):
+        # Typos fail loudly instead of silently falling back to SQLite
+        with self.assertRaises(ImproperlyConfigured):
+            database_config({"DATABASE": "MYSQL"}, BASE_DIR)
+
+    def test_replicas(self):
+        # Replicas copy the primary settings with their own host or file
+        config = replica_configs(
+            {"DATABASE": "POSTGRESQL", "DB_REPLICAS": "r1, r2:6432"},
+            BASE_DIR,
+        )
+        self.assertEqual(list(config), ["replica_1", "replica_2"])
+        self.assertEqual(config["replica_1"]["HOST"], "r1")
+        self.assertEqual(config["replica_1"]["PORT"], "5432")
+        self.assertEqual(config["replica_2"]["PORT"], "6432")
+        self.assertEqual(config["replica_2"]["NAME"], "dnd")
+
+        config = replica_configs({"DB_REPLICAS": "replica.sqlite3"}, BASE_DIR)
+        self.assertEqual(
+            config["replica_1"]["NAME"], BASE_DIR / "replica.sqlite3"
+        )
+        self.assertEqual(replica_configs({}, BASE_DIR), {})
+
+    def test_replicas_mirror_default_in_tests(self):
+        # Replicas use the primary's test database unless told otherwise
+        env = {"DB_REPLICAS": "replica.sqlite3"}
+        config = replica_configs(env, BASE_DIR)["replica_1"]
+        self.assertEqual(config["TEST"], {"MIRROR": "default"})
+        env["DB_REPLICAS_TEST_MIRROR"] = "false"
+        config = replica_configs(env, BASE_DIR)["replica_1"]
+        self.assertNotIn("TEST", config)
+
+    def test_sqlite_tuned(self):
+        # Tuned mode begins transactions IMMEDIATE and lists its PRAGMAs
+        env = {"DB_SQLITE_TUNED": "true", "DB_SQLITE_BUSY_TIMEOUT": "2000"}
+        config = database_config(env, BASE_DIR)
+        self.assertEqual(config["OPTIONS"], {"transaction_mode": "IMMEDIATE"})
+        self.assertEqual(sqlite_pragmas(env)["journal_mode"], "WAL")
+        self.assertEqual(sqlite_pragmas(env)["busy_timeout"], "2000")
+
+        self.assertEqual(database_config({}, BASE_DIR)["OPTIONS"], {})
+        self.assertEqual(sqlite_pragmas({}), {})
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "SQLite only")
+class TestSQLitePragmas(SimpleTestCase):
+    def open(self, name: str) -> DatabaseWrapper:
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, "NAME": name}, alias="tuned"
+        )
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper: DatabaseWrapper, name: str):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS=sqlite_pragmas({"DB_SQLITE_TUNED": "1"}))
+    def test_new_connections_are_tuned(self):
+        # Every new connection gets the PRAGMAs of the tuned mode
+        wrapper = self.open(f"{tempfile.mkdtemp()}/tuned.sqlite3")
+        self.assertEqual(self.pragma(wrapper, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(wrapper, "synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma(wrapper, "busy_timeout"), 5000)
+        self.assertEqual(self.pragma(wrapper, "cache_size"), -65536)
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_default_connections(self):
+        # Without tuning SQLite keeps its rollback journal
+        wrapper = self.open(f"{tempfile.mkdtemp()}/plain.sqlite3")
+        self.assertEqual(self.pragma(wrapper, "journal_mode"), "delete")
@@ -0,0 +1,138 @@
+import time
+
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+
+from my_app import error_logging
+from my_app.error_logging import ErrorLogPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestErrorLogPolicy(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.rolls = []
+        self.policy = ErrorLogPolicy(
+            rate=1,
+            burst=3,
+            sample=0.1,
+            flush_seconds=60,
+            clock=self.clock,
+            rng=lambda: self.rolls.pop(0) if self.rolls else 1.0,
+        )
+        self.addCleanup(self.policy.close)
+        self.request = RequestFactory().post("/api/campaign/create/")
+
+    def report(self, exc: Exception, times: int = 1, status: int = 400):
+        with self.assertLogs("django", "WARNING") as logs:
+            error_logging.logger.warning("marker")
+            for _ in range(times):
+                self.policy.report(self.request, exc, status)
+        return logs.output[1:]
+
+    def test_burst_then_suppressed(self):
+        # Only BURST summaries are logged, one line each
+        lines = self.report(ValueError("bad\npayload"), times=100)
+        self.assertEqual(len(lines), 3)
+        self.assertIn(
+            "status=400 error=ValueError method=POST "
+            'path=/api/campaign/create/ detail="bad payload"',
+            lines[0],
+        )
+
+    def test_refill(self):
+        # Tokens come back at RATE per second
+        self.report(ValueError(), times=3)
+        self.clock.now = 2
+        self.assertEqual(len(self.report(ValueError(), times=10)), 2)
+
+    def test_buckets_per_type(self):
+        # A flood of one error type does not hide others
+        self.report(ValueError(), times=10)
+        self.assertEqual(len(self.report(KeyError(), times=10)), 3)
+
+    def test_sampling(self):
+        # Past the burst a SAMPLE share of errors is still logged
+        self.report(ValueError(), times=3)
+        self.rolls = [0.5, 0.05, 0.5]
+        lines = self.report(ValueError(), times=3)
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith("sampled=true"))
+
+    def test_flush(self):
+        # Counts of all errors, logged or not, are flushed periodically
+        self.report(ValueError(), times=5)
+        self.report(KeyError(), status=404)
+        self.clock.now = 61
+        lines = self.report(ValueError())
+        self.assertIn(
+            "client errors in 61s: "
+            "KeyError/404=1(suppressed=0) ValueError/400=6(suppressed=2)",
+            lines[0],
+        )
+        self.clock.now = 200
+        with self.assertNoLogs("django"):
+            self.policy.flush()
+
+    def test_flush_without_new_errors(self):
+        # The last counts are flushed even when no more errors come
+        policy = ErrorLogPolicy(
+            rate=0, burst=0, sample=0, flush_seconds=0.05, rng=lambda: 1.0
+        )
+        self.addCleanup(policy.close)
+        with self.assertLogs("django", "WARNING") as logs:
+            for _ in range(3):
+                policy.report(self.request, ValueError(), 400)
+            deadline = time.monotonic() + 5
+            while not logs.records and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertIn("ValueError/400=3(suppressed=3)", logs.output[0])
+
+    def test_server_errors(self):
+        # 5xx are never limited and keep their traceback
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError as e:
+            exc = e
+        with self.assertLogs("django", "ERROR") as logs:
+            for _ in range(5):
+                self.policy.report(self.request, exc, 500)
+        self.assertEqual(len(logs.records), 5)
+        self.assertIs(logs.records[0].exc_info[1], exc)
+
+
+@override_settings(
+    ERROR_LOG={"RATE": 0, "BURST": 10, "SAMPLE": 0, "FLUSH_SECONDS": 60}
+)
+class TestErrorHandlersLogging(TestCase):
+    def setUp(self):
+        error_logging.get_policy.cache_clear()
+        self.addCleanup(error_logging.get_policy.cache_clear)
+        self.addCleanup(lambda: error_logging.get_policy().close())
+
+    def test_malformed_payload_flood(self):
+        # Repeated validation errors log a few summaries without tracebacks
+        client = Client()
+        with self.assertLogs("django", "WARNING") as logs:
+            for _ in range(50):
+                response = client.post(
+                    "/api/campaign/create/",
+                    "{}",
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(logs.records), 10)
+        self.assertTrue(all(r.exc_info is None for r in logs.records))
+        self.assertIn("status=400 error=ValidationError", logs.output[0])
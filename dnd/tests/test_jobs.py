@@ -0,0 +1,133 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from dnd.models import Job
+from dnd.services import jobs
+
+calls = []
+
+
+@jobs.job_handler("test_ok")
+def ok_handler(payload):
+    calls.append(payload)
+
+
+@jobs.job_handler(
+    "test_fail", on_failure=lambda p: calls.append(("gave up", p))
+)
+def failing_handler(payload):
+    raise RuntimeError("boom")
+
+
+def broken_on_failure(payload):
+    raise RuntimeError("cleanup failed")
+
+
+@jobs.job_handler("test_fail_cleanup", on_failure=broken_on_failure)
+def failing_cleanup_handler(payload):
+    raise RuntimeError("boom")
+
+
+class TestJobQueue(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_run_pending(self):
+        # Jobs run once, in order, and are marked done
+        jobs.enqueue("test_ok", {"n": 1})
+        jobs.enqueue("test_ok", {"n": 2})
+        self.assertEqual(jobs.run_pending(), 2)
+        self.assertEqual(calls, [{"n": 1}, {"n": 2}])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 2)
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_retry_with_backoff(self):
+        # Failed job is rescheduled later instead of retried at once
+        job = jobs.enqueue("test_fail", {})
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("RuntimeError: boom", job.last_error)
+        self.assertGreater(job.run_after, job.updated_at)
+
+    @override_settings(JOB_RETRY_DELAY=0)
+    def test_permanent_failure(self):
+        # After max attempts the job fails and on_failure is called
+        job = jobs.enqueue("test_fail", {"id": 7}, max_attempts=3)
+        self.assertEqual(jobs.run_pending(), 3)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(calls, [("gave up", {"id": 7})])
+
+    def test_unknown_kind(self):
+        # Jobs nobody can handle fail instead of blocking the queue
+        job = jobs.enqueue("missing", {}, max_attempts=1)
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_claim_is_exclusive(self):
+        # Claimed job is not handed to another worker
+        jobs.enqueue("test_ok", {})
+        self.assertIsNotNone(jobs.claim_next())
+        self.assertIsNone(jobs.claim_next())
+
+    def test_expired_lease_is_reclaimed(self):
+        # Job of a crashed worker is picked up again after its lease
+        job = jobs.enqueue("test_ok", {})
+        jobs.claim_next()
+        self.expire_leases()
+        reclaimed = jobs.claim_next()
+        self.assertEqual(reclaimed.id, job.id)
+        self.assertEqual(reclaimed.attempts, 2)
+
+    def expire_leases(self):
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+
+    def test_expired_last_attempt_fails(self):
+        # Job that keeps losing its worker is failed instead of retried
+        job = jobs.enqueue("test_fail", {"id": 7}, max_attempts=1)
+        jobs.claim_next()
+        self.expire_leases()
+        with self.assertLogs("django", "ERROR"):
+            self.assertIsNone(jobs.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNone(job.locked_until)
+        self.assertEqual(calls, [("gave up", {"id": 7})])
+
+    def test_failing_on_failure(self):
+        # Job is saved as failed even if its on_failure raises
+        job = jobs.enqueue("test_fail_cleanup", {}, max_attempts=1)
+        with self.assertLogs("django", "ERROR") as logs:
+            self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("cleanup failed", "\n".join(logs.output))
+
+    def test_taken_over_attempt(self):
+        # Worker whose lease expired does not overwrite the new claim
+        jobs.enqueue("test_ok", {})
+        first = jobs.claim_next()
+        self.expire_leases()
+        second = jobs.claim_next()
+        with self.assertLogs("django", "WARNING"):
+            jobs.run_job(first)
+        second.refresh_from_db()
+        self.assertEqual(second.status, Job.RUNNING)
+        self.assertTrue(jobs.run_job(second))
+        second.refresh_from_db()
+        self.assertEqual(second.status, Job.DONE)
+
+    def test_worker_command(self):
+        # manage.py run_worker --once drains the queue and exits
+        jobs.enqueue("test_ok", {"n": 1})
+        out = StringIO()
+        call_command("run_worker", "--once", stdout=out)
+        self.assertEqual(calls, [{"n": 1}])
+        self.assertIn("worker stopped after 1 job(s)", out.getvalue())
@@ -0,0 +1,209 @@
+import base64
+import importlib
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from dnd.models import Campaign, CampaignMembership, MediaBlob, Player
+from dnd.services import jobs
+from dnd.services.media_storage import get_media_storage
+from dnd.tests.test_campaign import make_icon
+
+
+class TemporaryBlobRoot:
+    """Keeps blobs of the tests, and gc_media, out of MEDIA_BLOB_ROOT."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(MEDIA_BLOB_ROOT=directory))
+
+
+class TestMediaStorage(TemporaryBlobRoot, TestCase):
+    def setUp(self):
+        self.storage = get_media_storage()
+
+    def test_identical_content_stored_once(self):
+        # Same bytes under different names share one blob
+        first = self.storage.save("a.png", ContentFile(b"same bytes"))
+        second = self.storage.save("dir/b.PNG", ContentFile(b"same bytes"))
+        other = self.storage.save("a.png", ContentFile(b"other bytes"))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.endswith(".png"))
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 2)
+        with self.storage.open(first) as f:
+            self.assertEqual(f.read(), b"same bytes")
+
+    def test_delete_releases_reference(self):
+        # Deleting drops a reference but keeps the file for other users
+        name = self.storage.save("a.png", ContentFile(b"shared"))
+        self.storage.save("b.png", ContentFile(b"shared"))
+        self.storage.delete(name)
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+        self.assertTrue(self.storage.exists(name))
+
+    def test_campaign_icons_deduplicated(self):
+        # Two campaigns with the same icon point at one blob
+        Player.objects.create(telegram_id=1001)
+        icon = make_icon(size=(300, 300))
+        for title in ("First", "Second"):
+            self.client.post(
+                "/api/campaign/create/",
+                data=json.dumps(
+                    {"telegram_id": 1001, "title": title, "icon": icon}
+                ),
+                content_type="application/json",
+            )
+        jobs.run_pending()
+        first, second = Campaign.objects.order_by("id")
+        self.assertEqual(first.icon.name, second.icon.name)
+        self.assertEqual(first.icon_thumbnails, second.icon_thumbnails)
+        self.assertEqual(
+            MediaBlob.objects.get(name=first.icon.name).refcount, 2
+        )
+
+    def test_move_media_migration(self):
+        # Files saved before the blob store are moved into it
+        migration = importlib.import_module(
+            "dnd.migrations.0010_move_media_to_blobs"
+        )
+        legacy = default_storage.save(
+            "campaign_icons/legacy.png", ContentFile(b"legacy icon")
+        )
+        self.addCleanup(default_storage.delete, legacy)
+        campaign = Campaign.objects.create(title="Legacy", icon=legacy)
+
+        schema_editor = SimpleNamespace(connection=connection)
+        migration.move_to_blobs(apps, schema_editor)
+
+        campaign.refresh_from_db()
+        self.assertNotEqual(campaign.icon.name, legacy)
+        self.assertEqual(campaign.icon.read(), b"legacy icon")
+        self.assertEqual(
+            MediaBlob.objects.get(name=campaign.icon.name).refcount, 1
+        )
+
+
+class TestMediaGarbageCollection(TemporaryBlobRoot, TestCase):
+    def setUp(self):
+        self.storage = get_media_storage()
+        self.player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Test Campaign")
+        CampaignMembership.objects.create(
+            user=self.player, campaign=self.campaign, status=2
+        )
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command("gc_media", *args, stdout=out)
+        return out.getvalue()
+
+    def test_collects_only_test_blob_root(self):
+        # Storages follow the overridden root, the real one is never walked
+        root = os.path.abspath(settings.MEDIA_BLOB_ROOT)
+        self.assertTrue(root.startswith(tempfile.gettempdir()))
+        self.assertEqual(self.storage.location, root)
+        self.assertEqual(
+            Campaign._meta.get_field("icon").storage.location, root
+        )
+
+    def test_unreferenced_blob_collected(self):
+        # Blob nothing refers to is deleted once the grace period passes
+        name = self.storage.save("a.png", ContentFile(b"garbage"))
+        self.storage.delete(name)
+        self.gc()
+        self.assertTrue(self.storage.exists(name))
+
+        MediaBlob.objects.filter(name=name).update(
+            updated_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertIn("deleted 1 blob(s)", self.gc())
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_referenced_blob_kept_and_recounted(self):
+        # Refcounts are corrected from the rows that use the blob
+        self.campaign.icon.save("icon.png", ContentFile(b"icon"))
+        MediaBlob.objects.update(
+            refcount=5, updated_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertIn("fixed 1 refcount(s)", self.gc())
+        blob = MediaBlob.objects.get(name=self.campaign.icon.name)
+        self.assertEqual(blob.refcount, 1)
+        self.assertTrue(self.storage.exists(blob.name))
+
+    def test_dry_run(self):
+        # Dry run reports without deleting
+        name = self.storage.save("a.png", ContentFile(b"dry run"))
+        MediaBlob.objects.filter(name=name).update(
+            refcount=0, updated_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertIn("deleted 1 blob(s)", self.gc("--dry-run"))
+        self.assertTrue(self.storage.exists(name))
+
+
+class TestServeMedia(TemporaryBlobRoot, TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.name = get_media_storage().save(
+            "a.png", ContentFile(base64.b64decode(make_icon()))
+        )
+        self.url = f"/media/blobs/{self.name}"
+
+    def test_immutable_cache_headers(self):
+        # Blobs are served with headers that let clients cache forever
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn(response["ETag"].strip('"'), self.name)
+        self.assertEqual(
+            b"".join(response.streaming_content),
+            get_media_storage().open(self.name).read(),
+        )
+
+    def test_if_none_match(self):
+        # Revalidation is answered without opening the file
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_and_traversal(self):
+        # Unknown names and paths outside the store are 404
+        self.assertEqual(
+            self.client.get("/media/blobs/ff/missing.png").status_code, 404
+        )
+        self.assertEqual(
+            self.client.get("/media/blobs/../../manage.py").status_code, 404
+        )
+
+    def test_campaign_icon_url(self):
+        # Campaign API links icons into the blob store
+        campaign = Campaign.objects.create(title="Icon", icon=self.name)
+        response = self.client.get(
+            f"/api/campaign/get/?campaign_id={campaign.id}"
+        )
+        self.assertEqual(response.json()["icon"], self.url)
+
+
+class TestMediaRootsInTests(SimpleTestCase):
+    def test_outside_project(self):
+        # The test runner keeps every upload out of the real media roots
+        for root in (settings.MEDIA_ROOT, settings.MEDIA_BLOB_ROOT):
+            self.assertTrue(str(root).startswith(tempfile.gettempdir()))
+        self.assertEqual(
+            default_storage.location, os.path.abspath(settings.MEDIA_ROOT)
+        )
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+import tempfile
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from dnd.models import Campaign, Character, Player
+from dnd.services import metrics
+from dnd.services.sheet_cache import get_sheet_cache
+
+
+@override_settings(METRICS={"TOKEN": "secret", "DIR": "", "FLUSH_SECONDS": 5})
+class TestMetrics(TestCase):
+    def setUp(self):
+        metrics.collector.clear()
+        get_sheet_cache().clear()
+        self.addCleanup(metrics.collector.clear)
+        self.client = Client()
+        player = Player.objects.create(telegram_id=1001)
+        self.campaign = Campaign.objects.create(title="Campaign")
+        self.character = Character.objects.create(
+            owner=player, campaign=self.campaign
+        )
+        self.character.save_data({"name": "Hero"})
+
+    def scrape(self) -> dict[str, float]:
+        response = self.client.get(
+            "/api/metrics", headers={"Authorization": "Bearer secret"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_request_metrics(self):
+        # Latency, queries and response size are recorded per operation
+        owner = Player.objects.create(telegram_id=1002)
+        self.campaign.campaignmembership_set.create(user=owner, status=2)
+        url = f"/api/campaign/{self.campaign.id}/members/"
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                url,
+                json.dumps({"owner_id": owner.id, "changes": []}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        queries = len(ctx.captured_queries)
+        operation = 'operation="POST /api/campaign/<campaign_id>/members/"'
+
+        samples = self.scrape()
+        self.assertEqual(
+            samples[
+                "dnd_http_request_duration_seconds_count"
+                f'{{{operation},status="200"}}'
+            ],
+            1,
+        )
+        self.assertEqual(
+            samples[f"dnd_db_queries_total{{{operation}}}"], queries
+        )
+        self.assertEqual(
+            samples[f"dnd_http_response_bytes_sum{{{operation}}}"],
+            len(response.content),
+        )
+
+    def test_token_required(self):
+        # Metrics are only served to scrapers with the token
+        for headers in ({}, {"Authorization": "Bearer wrong"}):
+            response = self.client.get("/api/metrics", headers=headers)
+            self.assertEqual(response.status_code, 401)
+        with override_settings(
+            METRICS={"TOKEN": "", "DIR": "", "FLUSH_SECONDS": 5}
+        ):
+            response = self.client.get(
+                "/api/metrics", headers={"Authorization": "Bearer "}
+            )
+        self.assertEqual(response.status_code, 404)
+
+    def test_async_flush_off_event_loop(self):
+        # Under ASGI the metrics file is written outside the event loop
+        in_loop = []
+        write = metrics._write
+
+        def recording_write(path, values):
+            try:
+                asyncio.get_running_loop()
+                in_loop.append(True)
+            except RuntimeError:
+                in_loop.append(False)
+            write(path, values)
+
+        settings = {"TOKEN": "", "DIR": tempfile.mkdtemp(), "FLUSH_SECONDS": 0}
+        with (
+            override_settings(METRICS=settings),
+            mock.patch.object(metrics, "_write", recording_write),
+        ):
+            response = async_to_sync(AsyncClient().get)("/api/ping/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(in_loop, [False])
+
+    def test_histogram_buckets(self):
+        # Buckets are cumulative and end with +Inf equal to the count
+        metrics.collector.observe(
+            "dnd_storage_duration_seconds",
+            {"action": "load", "operation": "test"},
+            0.03,
+        )
+        samples = self.scrape()
+        labels = 'action="load",operation="test"'
+        bucket = f"dnd_storage_duration_seconds_bucket{{{labels},le="
+        self.assertEqual(samples[f'{bucket}"0.025"}}'], 0)
+        self.assertEqual(samples[f'{bucket}"0.05"}}'], 1)
+        self.assertEqual(samples[f'{bucket}"+Inf"}}'], 1)
+        self.assertEqual(
+            samples[f"dnd_storage_duration_seconds_sum{{{labels}}}"], 0.03
+        )
+
+    def test_storage_and_sheet_cache(self):
+        # Sheet loads are timed under the operation and cache use counted
+        client = AsyncClient()
+        for _ in range(2):
+            response = async_to_sync(client.get)(
+                f"/api/character/get/?char_id={self.character.id}"
+            )
+            self.assertEqual(response.status_code, 200)
+
+        samples = self.scrape()
+        self.assertEqual(
+            samples[
+                "dnd_storage_duration_seconds_count"
+                '{action="load",operation="GET /api/character/get/"}'
+            ],
+            2,
+        )
+        self.assertEqual(
+            samples[
+                'dnd_sheet_cache_requests_total{result="hits",tier="local"}'
+            ],
+            1,
+        )
+
+    def test_processes_are_added_up(self):
+        # Files written by other worker processes are merged in
+        directory = tempfile.mkdtemp()
+        with open(os.path.join(directory, "1.json"), "w") as f:
+            json.dump(
+                [
+                    ["dnd_db_queries_total", [["operation", "GET /x"]], 3],
+                    ["dnd_sheet_cache_entries", [], 5],
+                ],
+                f,
+            )
+        with override_settings(
+            METRICS={"TOKEN": "secret", "DIR": directory, "FLUSH_SECONDS": 5}
+        ):
+            metrics.collector.inc(
+                "dnd_db_queries_total", {"operation": "GET /x"}, 2
+            )
+            samples = self.scrape()
+            self.assertIn(f"{os.getpid()}.json", os.listdir(directory))
+
+        self.assertEqual(
+            samples['dnd_db_queries_total{operation="GET /x"}'], 5
+        )
+        self.assertEqual(samples["dnd_sheet_cache_entries"], 5)
+
+    def test_exited_process_gauges_dropped(self):
+        # Counters of an exited worker keep counting, its gauges do not
+        directory = tempfile.mkdtemp()
+        with open(os.path.join(directory, "1.json"), "w") as f:
+            json.dump(
+                [
+                    ["dnd_db_queries_total", [["operation", "GET /x"]], 3],
+                    ["dnd_sheet_cache_entries", [], 5],
+                ],
+                f,
+            )
+        metrics.mark_process_dead(1, directory)
+        with override_settings(
+            METRICS={"TOKEN": "secret", "DIR": directory, "FLUSH_SECONDS": 5}
+        ):
+            samples = self.scrape()
+        self.assertEqual(
+            samples['dnd_db_queries_total{operation="GET /x"}'], 3
+        )
+        self.assertEqual(samples["dnd_sheet_cache_entries"], 0)
+
+    def test_batch_storage_operation(self):
+        # Sheets read by the batch thread pool count towards the request
+        get_sheet_cache().clear()
+        response = async_to_sync(AsyncClient().get)(
+            f"/api/character/batch/?ids={self.character.id}"
+        )
+        self.assertEqual(response.status_code, 200)
+        samples = self.scrape()
+        self.assertEqual(
+            samples[
+                "dnd_storage_duration_seconds_count"
+                '{action="load",operation="GET /api/character/batch/"}'
+            ],
+            1,
+        )
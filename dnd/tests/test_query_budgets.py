@@ -0,0 +1,208 @@
+import json
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+
+from dnd.models import Campaign, CampaignMembership, Character, Player
+from dnd.services.sheet_cache import get_sheet_cache
+from dnd.tests.budget import api_routes, endpoint_budget, query_budget
+from dnd.tests.test_campaign import make_icon
+from dnd.urls import dnd_api
+
+
+@override_settings(CHARACTER_STORAGE="file", MEDIA_ROOT=tempfile.mkdtemp())
+class TestQueryBudgets(TestCase):
+    """
+    Every API operation with cold caches and a few rows more than needed,
+    so per-row queries or reads exceed the budget.
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.owner = Player.objects.create(telegram_id=1001)
+        self.players = [
+            Player.objects.create(telegram_id=1002 + n) for n in range(3)
+        ]
+        self.newcomer = Player.objects.create(telegram_id=2001)
+        self.campaign = Campaign.objects.create(title="Public")
+        self.private = Campaign.objects.create(title="Private", private=True)
+        for campaign in (self.campaign, self.private):
+            CampaignMembership.objects.create(
+                user=self.owner, campaign=campaign, status=2
+            )
+        for player in self.players:
+            CampaignMembership.objects.create(
+                user=player, campaign=self.campaign, status=0
+            )
+        self.characters = []
+        for player in self.players:
+            character = Character.objects.create(
+                owner=player, campaign=self.campaign
+            )
+            character.save_data({"name": f"Hero {player.telegram_id}"})
+            self.characters.append(character)
+        cache.clear()
+        get_sheet_cache().clear()
+
+    def post(self, url, data):
+        return self.client.post(
+            url, json.dumps(data), content_type="application/json"
+        )
+
+    def test_every_route_has_budget(self):
+        # Each operation of the API is covered by a budget test below
+        covered = {
+            test.budget_route
+            for test in vars(type(self)).values()
+            if hasattr(test, "budget_route")
+        }
+        self.assertEqual(api_routes(dnd_api) - covered, set())
+
+    @endpoint_budget("GET", "ping/", queries=0)
+    def test_ping(self):
+        # No database work at all
+        self.assertEqual(self.client.get("/api/ping/").status_code, 200)
+
+    # the sheet is deferred, a cold cache costs a second query
+    @endpoint_budget("GET", "character/get/", queries=2, storage_reads=1)
+    def test_get_character(self):
+        # Owner comes with the row, no lazy fetch
+        response = self.client.get(
+            f"/api/character/get/?char_id={self.characters[0].id}"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @endpoint_budget("GET", "character/batch/", queries=1, storage_reads=3)
+    def test_get_characters_batch(self):
+        # One query for all rows, one read per sheet
+        ids = "&".join(f"ids={c.id}" for c in self.characters)
+        response = self.client.get(f"/api/character/batch/?{ids}")
+        self.assertEqual(len(response.json()["characters"]), 3)
+
+    @endpoint_budget("POST", "character/post/", queries=4)
+    def test_upload_character(self):
+        # Response is built from the uploaded data, not read back
+        response = self.post(
+            "/api/character/post/",
+            {
+                "owner_id": self.owner.id,
+                "campaign_id": self.campaign.id,
+                "data": {"name": "New"},
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+
+    @endpoint_budget(
+        "PATCH", "character/{char_id}/", queries=2, storage_reads=1
+    )
+    def test_patch_character(self):
+        # Sheet is read once to apply the patch, not again to respond
+        response = self.client.patch(
+            f"/api/character/{self.characters[0].id}/",
+            json.dumps({"level": 2}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @endpoint_budget("POST", "campaign/create/", queries=5)
+    def test_create_campaign(self):
+        # Owner lookup, campaign and owner membership
+        response = self.post(
+            "/api/campaign/create/",
+            {"telegram_id": self.owner.telegram_id, "title": "New"},
+        )
+        self.assertEqual(response.status_code, 201)
+
+    @endpoint_budget("POST", "campaign/{campaign_id}/icon/", queries=5)
+    def test_upload_icon(self):
+        # Owner check and scheduling, processing happens in a job
+        icon = SimpleUploadedFile("icon.png", make_icon(encode=False))
+        response = self.client.post(
+            f"/api/campaign/{self.campaign.id}/icon/?owner_id={self.owner.id}",
+            data={"icon": icon},
+        )
+        self.assertEqual(response.status_code, 202)
+
+    @endpoint_budget("GET", "campaign/get/", queries=9)
+    def test_get_campaign(self):
+        # Campaign by id, the full list and a page with its total
+        response = self.client.get(
+            f"/api/campaign/get/?campaign_id={self.private.id}"
+            f"&user_id={self.owner.id}"
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            f"/api/campaign/get/?user_id={self.owner.id}"
+        )
+        self.assertEqual(len(response.json()), 2)
+        response = self.client.get(
+            f"/api/campaign/get/?user_id={self.owner.id}"
+            "&limit=1&include_total=true"
+        )
+        self.assertEqual(response.json()["total"], 2)
+
+    @endpoint_budget(
+        "GET",
+        "campaign/{campaign_id}/characters/",
+        queries=2,
+        storage_reads=3,
+    )
+    def test_roster(self):
+        # Constant queries however many characters the campaign has
+        response = self.client.get(
+            f"/api/campaign/{self.campaign.id}/characters/"
+        )
+        self.assertEqual(len(json.loads(b"".join(response))), 3)
+
+    @endpoint_budget("POST", "campaign/{campaign_id}/add/", queries=7)
+    def test_add_member(self):
+        # One owner check, player lookup and membership upsert
+        response = self.post(
+            f"/api/campaign/{self.campaign.id}/add/",
+            {"owner_id": self.owner.id, "user_id": self.newcomer.id},
+        )
+        self.assertEqual(response.status_code, 201)
+
+    @endpoint_budget(
+        "POST", "campaign/{campaign_id}/edit-permissions/", queries=3
+    )
+    def test_edit_permissions(self):
+        # One owner check and a single UPDATE of the membership
+        response = self.post(
+            f"/api/campaign/{self.campaign.id}/edit-permissions/",
+            {
+                "owner_id": self.owner.id,
+                "user_id": self.players[0].id,
+                "status": 1,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @endpoint_budget("POST", "campaign/{campaign_id}/members/", queries=7)
+    def test_bulk_members(self):
+        # Constant queries however many changes the batch has
+        response = self.post(
+            f"/api/campaign/{self.campaign.id}/members/",
+            {
+                "owner_id": self.owner.id,
+                "changes": [
+                    {"user_id": player.id, "status": 1}
+                    for player in self.players
+                ],
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_budget_is_enforced(self):
+        # Exceeding a budget fails with the queries that ran
+        with self.assertRaisesMessage(
+            AssertionError, "2 queries, budget is 1"
+        ):
+            with query_budget(queries=1):
+                list(Player.objects.all())
+                list(Campaign.objects.all())
+        with self.assertRaisesMessage(AssertionError, "1 storage reads"):
+            with query_budget(queries=1):
+                Character.objects.get(id=self.characters[0].id).load_data()
@@ -0,0 +1,202 @@
+import json
+import re
+import unittest
+
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from dnd.models import Campaign, CampaignMembership, Character, Player
+
+# SQLite before 3.36 says "SCAN TABLE t"
+SQLITE_TABLE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+POSTGRESQL_TABLE_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+class QueryPlanMixin:
+    """
+    Runs campaign endpoints, EXPLAINs every SELECT they made and fails when
+    a plan reads a whole table instead of going through an index. Classes
+    using it define explain(sql), returning the plan lines, and
+    scanned_table(line), the table a plan line reads in full if any.
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.owner = Player.objects.create(telegram_id=1001)
+        self.player = Player.objects.create(telegram_id=1002)
+        self.campaign = Campaign.objects.create(title="Public")
+        self.private = Campaign.objects.create(title="Private", private=True)
+        CampaignMembership.objects.create(
+            user=self.owner, campaign=self.campaign, status=2
+        )
+        CampaignMembership.objects.create(
+            user=self.owner, campaign=self.private, status=2
+        )
+        CampaignMembership.objects.create(
+            user=self.player, campaign=self.campaign, status=0
+        )
+        Character.objects.create(
+            owner=self.player, campaign=self.campaign
+        ).save_data({"name": "Hero"})
+
+    def assertIndexed(
+        self, method: str, url: str, data=None, walks: tuple[str, ...] = ()
+    ):
+        """
+        walks lists tables that listings may read in primary key order:
+        returning every visible row, they cannot do better than that.
+        """
+        with CaptureQueriesContext(connection) as ctx:
+            if method == "get":
+                response = self.client.get(url)
+            else:
+                response = self.client.post(
+                    url, json.dumps(data), content_type="application/json"
+                )
+            content = (
+                b"".join(response.streaming_content)
+                if response.streaming
+                else response.content
+            )
+        self.assertLess(response.status_code, 400, content)
+
+        selects = [
+            q["sql"]
+            for q in ctx.captured_queries
+            if q["sql"].startswith("SELECT")
+        ]
+        self.assertTrue(selects)
+        for sql in selects:
+            plan = self.explain(sql)
+            scans = [
+                line
+                for line in plan
+                if (table := self.scanned_table(line))
+                and not (table in walks and f'ORDER BY "{table}"."id"' in sql)
+            ]
+            self.assertFalse(scans, f"{sql}\n" + "\n".join(plan))
+
+    def test_get_campaign(self):
+        # Campaign by id and the membership check of a private one
+        self.assertIndexed(
+            "get",
+            f"/api/campaign/get/?campaign_id={self.private.id}"
+            f"&user_id={self.owner.id}",
+        )
+
+    def test_list_campaigns(self):
+        # Public list and list with member's private campaigns
+        self.assertIndexed("get", "/api/campaign/get/")
+        self.assertIndexed(
+            "get",
+            f"/api/campaign/get/?user_id={self.owner.id}",
+            walks=("dnd_campaign",),
+        )
+
+    def test_list_campaigns_page(self):
+        # Keyset page and its estimated total
+        self.assertIndexed(
+            "get",
+            f"/api/campaign/get/?user_id={self.owner.id}"
+            f"&limit=1&cursor={self.campaign.id}&include_total=true",
+        )
+
+    def test_roster(self):
+        # Characters of a campaign with their owners
+        self.assertIndexed(
+            "get", f"/api/campaign/{self.campaign.id}/characters/"
+        )
+
+    def test_create_campaign(self):
+        # Owner lookup by telegram id
+        self.assertIndexed(
+            "post",
+            "/api/campaign/create/",
+            {"telegram_id": 1001, "title": "New"},
+        )
+
+    def test_add_member(self):
+        # Owner check and membership lookup
+        self.assertIndexed(
+            "post",
+            f"/api/campaign/{self.campaign.id}/add/",
+            {"owner_id": self.owner.id, "user_id": self.player.id},
+        )
+
+    def test_edit_permissions(self):
+        # Owner check and membership lookup
+        self.assertIndexed(
+            "post",
+            f"/api/campaign/{self.campaign.id}/edit-permissions/",
+            {
+                "owner_id": self.owner.id,
+                "user_id": self.player.id,
+                "status": 1,
+            },
+        )
+
+    def test_bulk_members(self):
+        # Owner check, player and membership lookups of a batch
+        self.assertIndexed(
+            "post",
+            f"/api/campaign/{self.campaign.id}/members/",
+            {
+                "owner_id": self.owner.id,
+                "changes": [
+                    {"user_id": self.player.id, "status": 1},
+                    {"user_id": self.owner.id, "status": 2},
+                ],
+            },
+        )
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "SQLite only")
+class TestSQLiteQueryPlans(QueryPlanMixin, TestCase):
+    def explain(self, sql: str) -> list[str]:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def scanned_table(self, line: str) -> str | None:
+        # "SCAN t USING INDEX i" only walks a (partial) index
+        match = SQLITE_TABLE_SCAN.match(line)
+        return match and match[1]
+
+    def test_scan_wordings(self):
+        # Full scans are caught in the wording of old and new SQLite
+        self.assertEqual(
+            self.scanned_table("SCAN dnd_campaign"), "dnd_campaign"
+        )
+        self.assertEqual(
+            self.scanned_table("SCAN TABLE dnd_campaign"), "dnd_campaign"
+        )
+        self.assertFalse(
+            self.scanned_table("SCAN TABLE dnd_campaign USING INDEX idx")
+        )
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "PostgreSQL only")
+class TestPostgreSQLQueryPlans(QueryPlanMixin, TestCase):
+    def explain(self, sql: str) -> list[str]:
+        with connection.cursor() as cursor:
+            # test tables are tiny, make the planner prefer any usable index
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}")
+            return [row[0] for row in cursor.fetchall()]
+
+    def scanned_table(self, line: str) -> str | None:
+        match = POSTGRESQL_TABLE_SCAN.search(line)
+        return match and match[1]
+
+
+class TestMembershipConstraints(TestCase):
+    def test_membership_is_unique(self):
+        # One user can be a member of a campaign only once
+        player = Player.objects.create(telegram_id=1001)
+        campaign = Campaign.objects.create(title="Campaign")
+        CampaignMembership.objects.create(user=player, campaign=campaign)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CampaignMembership.objects.create(
+                user=player, campaign=campaign, status=2
+            )
@@ -0,0 +1,35 @@
+import json
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from dnd.schemas.error import NotFoundError
+from my_app import renderers
+
+
+class TestRenderers(SimpleTestCase):
+    data = {
+        "when": datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+        "error": NotFoundError(),
+        1: "Тест",
+    }
+
+    def test_same_as_json_module(self):
+        # orjson renders what ninja's json encoder would
+        fast = json.loads(renderers.dumps(self.data))
+        with mock.patch.object(renderers, "orjson", None):
+            slow = json.loads(renderers.dumps(self.data))
+        self.assertEqual(fast, slow)
+        self.assertEqual(fast["when"], "2024-05-01T12:30:15.123Z")
+        self.assertEqual(fast["1"], "Тест")
+
+    def test_splice(self):
+        # Raw JSON is added to the envelope as is
+        raw = '{"b": [1,  2]}'
+        body = renderers.splice_json({"a": 1}, "data", raw)
+        self.assertEqual(body, b'{"a":1,"data":{"b": [1,  2]}}')
+        self.assertEqual(
+            json.loads(renderers.splice_json({}, "data", raw)),
+            {"data": {"b": [1, 2]}},
+        )
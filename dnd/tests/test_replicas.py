@@ -0,0 +1,191 @@
+import json
+import unittest
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+
+from dnd.models import Campaign, Player
+from my_app.db_router import PIN_COOKIE, ReplicaMiddleware
+
+
+def record_aliases(aliases: list, write: bool = False):
+    def view(request):
+        aliases.append(router.db_for_read(Campaign))
+        if write:
+            router.db_for_write(Campaign)
+            aliases.append(router.db_for_read(Campaign))
+        return HttpResponse()
+
+    return view
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"], REPLICA_PIN_SECONDS=7)
+class TestReplicaRouting(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_get_reads_from_replica(self):
+        # Safe requests read from a replica and do not pin the client
+        aliases = []
+        response = ReplicaMiddleware(record_aliases(aliases))(
+            self.factory.get("/api/campaign/get/")
+        )
+        self.assertEqual(aliases, ["replica_1"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_post_uses_primary(self):
+        # Unsafe requests read from the primary and pin the client after
+        # writing
+        aliases = []
+        response = ReplicaMiddleware(record_aliases(aliases, write=True))(
+            self.factory.post("/api/campaign/create/")
+        )
+        self.assertEqual(aliases, ["default", "default"])
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 7)
+
+    def test_pinned_client_reads_from_primary(self):
+        # Pin cookie keeps reads of a client on the primary
+        aliases = []
+        request = self.factory.get("/api/campaign/get/")
+        request.COOKIES[PIN_COOKIE] = "1"
+        ReplicaMiddleware(record_aliases(aliases))(request)
+        self.assertEqual(aliases, ["default"])
+
+    def test_write_during_get(self):
+        # Reads after a write in the same request see the primary
+        aliases = []
+        response = ReplicaMiddleware(record_aliases(aliases, write=True))(
+            self.factory.get("/api/campaign/get/")
+        )
+        self.assertEqual(aliases, ["replica_1", "default"])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_async_get_reads_from_replica(self):
+        # Async middleware chain routes the same way
+        aliases = []
+        view = record_aliases(aliases)
+
+        async def async_view(request):
+            return view(request)
+
+        async def call():
+            return await ReplicaMiddleware(async_view)(
+                self.factory.get("/api/campaign/get/")
+            )
+
+        async_to_sync(call)()
+        self.assertEqual(aliases, ["replica_1"])
+
+    def test_outside_requests(self):
+        # Commands and jobs always use the primary
+        self.assertEqual(router.db_for_read(Campaign), "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        # Nothing changes when no replica is configured
+        aliases = []
+        response = ReplicaMiddleware(record_aliases(aliases, write=True))(
+            self.factory.post("/api/campaign/create/")
+        )
+        self.assertEqual(aliases, ["default", "default"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+# replicas with their own test databases instead of mirrors of the primary
+UNMIRRORED_REPLICAS = [
+    alias
+    for alias in settings.DATABASE_REPLICAS
+    if not settings.DATABASES[alias].get("TEST", {}).get("MIRROR")
+]
+# replicas reading the default test database, taken out of routing by
+# my_app.test_runner.TestRunner
+MIRRORED_REPLICAS = [
+    alias
+    for alias in settings.DATABASES
+    if alias.startswith("replica_")
+    and settings.DATABASES[alias].get("TEST", {}).get("MIRROR")
+]
+
+
+@unittest.skipUnless(MIRRORED_REPLICAS, "needs DB_REPLICAS=replica.sqlite3")
+@override_settings(DATABASE_REPLICAS=MIRRORED_REPLICAS)
+class TestMirroredReplicas(TransactionTestCase):
+    """
+    Routes to replicas that mirror the default test database. Mirrors read
+    through their own connections, so the rows must be committed: this is
+    a TransactionTestCase.
+    """
+
+    databases = {"default", *MIRRORED_REPLICAS}
+
+    def setUp(self):
+        Player.objects.create(telegram_id=1001)
+
+    def test_routing(self):
+        # Writes go to the primary, later GETs of others to a replica
+        client = Client()
+        with CaptureQueriesContext(connections["default"]) as primary:
+            response = client.post(
+                "/api/campaign/create/",
+                json.dumps({"telegram_id": 1001, "title": "Fresh"}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(primary.captured_queries)
+
+        replica = connections[MIRRORED_REPLICAS[0]]
+        with CaptureQueriesContext(replica) as reads:
+            response = Client().get("/api/campaign/get/")
+        self.assertEqual([c["title"] for c in response.json()], ["Fresh"])
+        self.assertTrue(reads.captured_queries)
+
+
+@unittest.skipUnless(
+    UNMIRRORED_REPLICAS,
+    "needs DB_REPLICAS=replica.sqlite3 DB_REPLICAS_TEST_MIRROR=false",
+)
+class TestReplicaDatabases(TestCase):
+    """
+    Runs against real replica databases. Test databases are not replicated,
+    so rows written to the primary stay invisible on the replicas.
+    """
+
+    databases = {"default", *UNMIRRORED_REPLICAS}
+
+    def setUp(self):
+        Player.objects.create(telegram_id=1001)
+
+    def test_reads_own_writes(self):
+        # Client that created a campaign reads it back from the primary
+        client = Client()
+        response = client.post(
+            "/api/campaign/create/",
+            json.dumps({"telegram_id": 1001, "title": "Fresh"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        campaign_id = Campaign.objects.get(title="Fresh").id
+
+        url = f"/api/campaign/get/?campaign_id={campaign_id}"
+        self.assertEqual(client.get(url).status_code, 200)
+        # others read from a replica, which has not received it
+        self.assertEqual(Client().get(url).status_code, 404)
+
+    def test_get_reads_replica(self):
+        # Rows only present on replicas are served to GET requests
+        for alias in UNMIRRORED_REPLICAS:
+            Campaign.objects.using(alias).create(title="Replicated")
+        response = Client().get("/api/campaign/get/")
+        self.assertEqual([c["title"] for c in response.json()], ["Replicated"])
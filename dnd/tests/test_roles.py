@@ -0,0 +1,116 @@
+import json
+
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.test import Client, TestCase, override_settings
+
+from dnd.models import Campaign, CampaignMembership, Player
+from dnd.services import roles
+
+
+class TestRoleResolver(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.owner = Player.objects.create(telegram_id=1001)
+        self.player = Player.objects.create(telegram_id=1002)
+        self.campaign = Campaign.objects.create(title="Campaign")
+        CampaignMembership.objects.create(
+            user=self.owner, campaign=self.campaign, status=roles.OWNER
+        )
+
+    def test_roles(self):
+        # Members get their role, everyone else None
+        self.assertEqual(
+            roles.get_role(self.campaign.id, self.owner.id), roles.OWNER
+        )
+        self.assertIsNone(roles.get_role(self.campaign.id, self.player.id))
+        self.assertIsNone(roles.get_role(self.campaign.id, None))
+
+    @override_settings(ROLE_CACHE={"CACHE": "default", "TIMEOUT": 60})
+    def test_cached_across_calls(self):
+        # Warm roles, members or not, cost no queries
+        roles.get_role(self.campaign.id, self.owner.id)
+        roles.get_role(self.campaign.id, self.player.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(roles.is_owner(self.campaign.id, self.owner.id))
+            self.assertFalse(roles.is_owner(self.campaign.id, self.player.id))
+
+    def test_membership_writes_invalidate(self):
+        # Saving or deleting a membership is seen by the next check
+        self.assertIsNone(roles.get_role(self.campaign.id, self.player.id))
+        membership = CampaignMembership.objects.create(
+            user=self.player, campaign=self.campaign, status=roles.MASTER
+        )
+        self.assertEqual(
+            roles.get_role(self.campaign.id, self.player.id), roles.MASTER
+        )
+        membership.status = roles.PLAYER
+        membership.save()
+        self.assertEqual(
+            roles.get_role(self.campaign.id, self.player.id), roles.PLAYER
+        )
+        membership.delete()
+        self.assertIsNone(roles.get_role(self.campaign.id, self.player.id))
+
+    def test_invalidate_after_bulk_write(self):
+        # Writes without signals need an explicit invalidation
+        roles.get_role(self.campaign.id, self.owner.id)
+        CampaignMembership.objects.filter(user=self.owner).update(
+            status=roles.PLAYER
+        )
+        roles.invalidate_roles(self.campaign.id)
+        self.assertFalse(roles.is_owner(self.campaign.id, self.owner.id))
+
+    @override_settings(ROLE_CACHE={"CACHE": "default", "TIMEOUT": 60})
+    def test_invalidated_on_commit(self):
+        # The shared cache gets a new version only once the write commits
+        roles.get_role(self.campaign.id, self.owner.id)
+        key = roles._version_key(self.campaign.id)
+        version = cache.get(key)
+        membership = CampaignMembership.objects.get(user=self.owner)
+        with self.captureOnCommitCallbacks() as callbacks:
+            membership.status = roles.PLAYER
+            membership.save()
+            self.assertEqual(cache.get(key), version)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertNotEqual(cache.get(key), version)
+        self.assertFalse(roles.is_owner(self.campaign.id, self.owner.id))
+
+    def test_without_shared_cache(self):
+        # With no cache configured every check outside a request queries
+        with self.assertNumQueries(2):
+            roles.get_role(self.campaign.id, self.owner.id)
+            roles.get_role(self.campaign.id, self.owner.id)
+
+    @override_settings(ROLE_CACHE={"CACHE": "", "TIMEOUT": 60})
+    def test_memo_within_request(self):
+        # One request checks each role once, even without a shared cache
+        request_started.send(sender=self.__class__)
+        try:
+            with self.assertNumQueries(1):
+                roles.get_role(self.campaign.id, self.owner.id)
+                roles.get_role(self.campaign.id, self.owner.id)
+        finally:
+            request_finished.send(sender=self.__class__)
+        with self.assertNumQueries(1):
+            roles.get_role(self.campaign.id, self.owner.id)
+
+    def test_owner_check_warm(self):
+        # Permission checks of a warm owner cost no queries
+        payload = {
+            "owner_id": self.owner.id,
+            "user_id": self.owner.id,
+            "status": roles.OWNER,
+        }
+        url = f"/api/campaign/{self.campaign.id}/edit-permissions/"
+        self.client.post(
+            url, data=json.dumps(payload), content_type="application/json"
+        )
+        # campaign, role (the previous edit invalidated it), update
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                url, data=json.dumps(payload), content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,96 @@
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase
+
+from dnd.management.commands.seed_synthetic import campaign_sizes
+from dnd.models import Campaign, CampaignMembership, Character, Player
+
+
+def seed(**options):
+    args = [f"--{key}={value}" for key, value in options.items()]
+    call_command("seed_synthetic", *args, stdout=StringIO())
+
+
+def snapshot():
+    return (
+        list(Campaign.objects.values_list("title", "private")),
+        list(
+            CampaignMembership.objects.order_by("id").values_list(
+                "user__telegram_id", "campaign__title", "status"
+            )
+        ),
+        list(Character.objects.order_by("id").values_list("sheet", flat=True)),
+    )
+
+
+class TestCampaignSizes(SimpleTestCase):
+    def test_skewed(self):
+        # Popular campaigns get most members, every campaign has its owner
+        sizes = campaign_sizes(1000, 50_000, 10_000, 1.0, random.Random(0))
+        self.assertEqual(len(sizes), 1000)
+        self.assertGreaterEqual(min(sizes), 1)
+        self.assertGreater(sum(sorted(sizes)[-100:]), sum(sizes) / 2)
+        self.assertAlmostEqual(sum(sizes), 50_000, delta=2500)
+
+    def test_capped_by_players(self):
+        # A campaign cannot have more members than there are players
+        sizes = campaign_sizes(3, 1000, 20, 1.0, random.Random(0))
+        self.assertEqual(max(sizes), 20)
+
+
+class TestSeedSynthetic(TestCase):
+    options = {
+        "players": 50,
+        "campaigns": 10,
+        "memberships": 120,
+        "characters": 30,
+        "batch-size": 16,
+    }
+
+    def test_volumes(self):
+        # Creates the requested rows with valid, unique memberships
+        seed(**self.options)
+        self.assertEqual(Player.objects.count(), 50)
+        self.assertEqual(Campaign.objects.count(), 10)
+        self.assertEqual(Character.objects.count(), 30)
+        memberships = CampaignMembership.objects.count()
+        self.assertAlmostEqual(memberships, 120, delta=10)
+        owners = CampaignMembership.objects.filter(status=2)
+        self.assertEqual(
+            sorted(owners.values_list("campaign_id", flat=True)),
+            sorted(Campaign.objects.values_list("id", flat=True)),
+        )
+        for char_obj in Character.objects.all():
+            self.assertTrue(
+                CampaignMembership.objects.filter(
+                    user=char_obj.owner_id, campaign=char_obj.campaign_id
+                ).exists()
+            )
+            self.assertIn("stats", char_obj.sheet)
+
+    def test_deterministic(self):
+        # The same seed gives the same data, another seed does not
+        seeds = [3, 3, 4]
+        snapshots = []
+        for n in seeds:
+            seed(**self.options, seed=n)
+            snapshots.append(snapshot())
+            for model in (Character, CampaignMembership, Campaign, Player):
+                model.objects.all().delete()
+        self.assertEqual(snapshots[0], snapshots[1])
+        self.assertNotEqual(snapshots[0], snapshots[2])
+
+    def test_appends(self):
+        # Runs add to existing data and later rows get fresh ids
+        seed(**self.options)
+        seed(**self.options)
+        self.assertEqual(Player.objects.count(), 100)
+        campaign = Campaign.objects.create(title="After seeding")
+        self.assertEqual(campaign.id, 21)
+        busiest = CampaignMembership.objects.values("campaign").annotate(
+            members=Count("id")
+        )
+        self.assertTrue(all(row["members"] <= 50 for row in busiest))
@@ -0,0 +1,62 @@
+"""
+Gunicorn settings, read from the working directory on start.
+
+SERVER_PROFILE picks how the app is served:
+
+"sync" (default)
+    WSGI, every worker process handles one request at a time. A request
+    waiting on storage or PIL holds its worker for the whole wait.
+
+"asgi"
+    ASGI through uvicorn workers. Views are async and run blocking file,
+    image and ORM work in threads, so one worker keeps serving other
+    requests meanwhile. Needs uvicorn and uvicorn-worker. DB_CONN_MAX_AGE
+    defaults to 0 here: each request gets its own thread, so persistent
+    connections would only pile up; use DB_POOL on PostgreSQL instead.
+
+    A single process without gunicorn, e.g. for development:
+        uvicorn my_app.asgi:application --host 0.0.0.0 --port 8000
+
+DJANGO_SETTINGS_MODULE=my_app.settings_api boots API-only workers without
+the admin; see benchmarks/boot_time.py. WEB_CONCURRENCY sets the number of
+worker processes (roughly one per core for ASGI), PORT the port to listen
+on. See benchmarks/asgi_concurrency.py for the difference under slow
+storage.
+
+Workers share /api/metrics through files in METRICS_DIR (a directory in
+the system temp dir by default), emptied when the server starts. Gauges of
+workers that exit are dropped from their files.
+"""
+
+import os
+import shutil
+import tempfile
+
+profile = os.getenv("SERVER_PROFILE", "sync")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+accesslog = "-"
+errorlog = "-"
+
+os.environ.setdefault(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "dnd-metrics")
+)
+
+if profile == "asgi":
+    os.environ.setdefault("DB_CONN_MAX_AGE", "0")
+    wsgi_app = "my_app.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "my_app.wsgi:application"
+
+
+def on_starting(server):
+    # metrics of a previous run would be added to the new ones
+    shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+
+
+def child_exit(server, worker):
+    from dnd.services.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid, os.environ["METRICS_DIR"])
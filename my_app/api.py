@@ -3,10 +3,12 @@ from functools import partial
 from ninja import NinjaAPI
 
 from my_app import error_handlers
+from my_app.renderers import ORJSONRenderer
 
-api = NinjaAPI()
+api = NinjaAPI(renderer=ORJSONRenderer())
 
 api.add_router("/", "dnd.urls.dnd_api")
+api.add_router("/", "my_app.metrics.router")
 
 
 for exception, handler in error_handlers.exception_handlers:
@@ -0,0 +1,132 @@
+"""Builds the default database settings from environment variables."""
+
+from collections.abc import Mapping
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
+SQLITE = "SQLITE3"
+POSTGRESQL = "POSTGRESQL"
+# spelling accepted by earlier deployments
+ALIASES = {"POSTRESQL": POSTGRESQL}
+
+
+def database_config(env: Mapping[str, str], base_dir: Path) -> dict:
+    """
+    DATABASE selects SQLITE3 (default) or POSTGRESQL. DB_NAME, DB_USER,
+    DB_PASSWORD, DB_HOST and DB_PORT describe the connection.
+
+    Connections are kept for DB_CONN_MAX_AGE seconds (60, 0 closes them
+    after every request) and checked before reuse unless
+    DB_CONN_HEALTH_CHECKS is false. On PostgreSQL DB_POOL=true hands them
+    out from a psycopg pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE instead,
+    which needs psycopg[pool].
+
+    DB_SQLITE_TUNED=true prepares SQLite for several worker processes:
+    transactions begin IMMEDIATE and sqlite_pragmas() lists the PRAGMAs
+    apply_sqlite_pragmas() runs on each new connection.
+    """
+    engine = env.get("DATABASE", SQLITE).upper()
+    engine = ALIASES.get(engine, engine)
+
+    common = {
+        "CONN_MAX_AGE": int(env.get("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": _flag(env.get("DB_CONN_HEALTH_CHECKS", "true")),
+    }
+
+    if engine == SQLITE:
+        config = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": env.get("DB_NAME") or base_dir / "db.sqlite3",
+            "OPTIONS": {},
+            **common,
+        }
+        if _flag(env.get("DB_SQLITE_TUNED", "false")):
+            # take the write lock when a transaction starts: upgrading a
+            # read lock later fails at once instead of waiting busy_timeout
+            config["OPTIONS"]["transaction_mode"] = "IMMEDIATE"
+        return config
+    if engine != POSTGRESQL:
+        raise ImproperlyConfigured(f"Unsupported DATABASE {engine!r}")
+
+    config = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": env.get("DB_NAME", "dnd"),
+        "USER": env.get("DB_USER", "dnd"),
+        "PASSWORD": env.get("DB_PASSWORD", ""),
+        "HOST": env.get("DB_HOST", "127.0.0.1"),
+        "PORT": env.get("DB_PORT", "5432"),
+        "OPTIONS": {},
+        **common,
+    }
+    if _flag(env.get("DB_POOL", "false")):
+        # pooled connections go back to the pool, Django must not keep them
+        config["CONN_MAX_AGE"] = 0
+        config["OPTIONS"]["pool"] = {
+            "min_size": int(env.get("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(env.get("DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(env.get("DB_POOL_TIMEOUT", "10")),
+        }
+    return config
+
+
+def replica_configs(env: Mapping[str, str], base_dir: Path) -> dict:
+    """
+    Read replicas of the default database as aliases replica_1, replica_2...
+    DB_REPLICAS lists them comma separated: host or host:port on
+    PostgreSQL, database files on SQLite. Everything else is shared with
+    the default database; schema and data arrive by replication.
+    Tests read replicas through the default test database, as test
+    databases are not replicated, unless DB_REPLICAS_TEST_MIRROR is false.
+    """
+    primary = database_config(env, base_dir)
+    replicas = {}
+    entries = [e.strip() for e in env.get("DB_REPLICAS", "").split(",")]
+    mirror = _flag(env.get("DB_REPLICAS_TEST_MIRROR", "true"))
+    for n, entry in enumerate(filter(None, entries), start=1):
+        config = {**primary, "OPTIONS": {**primary.get("OPTIONS", {})}}
+        if config["ENGINE"] == "django.db.backends.sqlite3":
+            config["NAME"] = base_dir / entry
+        else:
+            host, _, port = entry.partition(":")
+            config["HOST"] = host
+            config["PORT"] = port or primary["PORT"]
+        if mirror:
+            config["TEST"] = {"MIRROR": "default"}
+        replicas[f"replica_{n}"] = config
+    return replicas
+
+
+def sqlite_pragmas(env: Mapping[str, str]) -> dict[str, str]:
+    """
+    PRAGMAs of the tuned SQLite mode, empty unless DB_SQLITE_TUNED is set.
+    WAL lets readers work next to the single writer, synchronous=NORMAL
+    only syncs on checkpoints (a power loss may lose the last commits, never
+    corrupt the file) and busy_timeout makes writers queue for the lock
+    instead of failing with "database is locked".
+    """
+    if not _flag(env.get("DB_SQLITE_TUNED", "false")):
+        return {}
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": env.get("DB_SQLITE_BUSY_TIMEOUT", "5000"),  # ms
+        "mmap_size": env.get("DB_SQLITE_MMAP_SIZE", str(256 * 2**20)),
+        # negative sizes are in KiB
+        "cache_size": env.get("DB_SQLITE_CACHE_SIZE", str(-64 * 2**10)),
+    }
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver applying settings.SQLITE_PRAGMAS."""
+    from django.conf import settings
+
+    if connection.vendor != "sqlite" or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() in {"1", "true", "yes", "on"}
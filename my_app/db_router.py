@@ -0,0 +1,116 @@
+"""
+Sends reads of GET requests to read replicas and everything else to the
+primary (default) database.
+
+ReplicaMiddleware decides per request: safe methods read from one randomly
+chosen alias of DATABASE_REPLICAS, other methods use the primary only.
+Once a request writes, its remaining reads go to the primary too and the
+client gets a cookie that keeps it on the primary for REPLICA_PIN_SECONDS,
+so it sees its own writes while replicas catch up. A request counts as
+writing as soon as the ORM asks for a write connection, even when no row
+changes (an update matching nothing, get_or_create finding its row): the
+router cannot tell, so such requests pin the client too.
+
+Outside of requests (management commands, jobs, tests calling the ORM
+directly) the router leaves everything on the primary.
+"""
+
+import contextvars
+import random
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest, HttpResponse
+
+PIN_COOKIE = "dnd_primary"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+@dataclass
+class Routing:
+    replica: str | None  # None reads from the primary
+    wrote: bool = False
+
+
+# shared with sync_to_async threads, which run in a copy of the context
+_routing: contextvars.ContextVar[Routing | None] = contextvars.ContextVar(
+    "dnd_db_routing", default=None
+)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints) -> str | None:
+        routing = _routing.get()
+        if routing is None or routing.wrote:
+            return DEFAULT_DB_ALIAS
+        return routing.replica or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints) -> str:
+        # called before the query runs, whether it changes rows or not
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool | None:
+        # replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+
+def start_routing(request: HttpRequest) -> Routing:
+    replicas = settings.DATABASE_REPLICAS
+    if (
+        not replicas
+        or request.method not in SAFE_METHODS
+        or PIN_COOKIE in request.COOKIES
+    ):
+        return Routing(replica=None)
+    return Routing(replica=random.choice(replicas))
+
+
+def finish_routing(routing: Routing, response: HttpResponse):
+    if routing.wrote and settings.DATABASE_REPLICAS:
+        response.set_cookie(
+            PIN_COOKIE,
+            "1",
+            max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing = start_routing(request)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        finish_routing(routing, response)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        routing = start_routing(request)
+        token = _routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        finish_routing(routing, response)
+        return response
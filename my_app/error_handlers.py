@@ -1,4 +1,3 @@
-import logging
 from http import HTTPStatus as status
 
 import django.core.exceptions
@@ -9,8 +8,7 @@ from ninja import errors as ninja_errors
 
 from dnd.schemas import error as error_schemas
 from my_app import errors as dnd_errors
-
-logger = logging.getLogger("django")
+from my_app.error_logging import report_error
 
 
 def handle_django_validation_error(
@@ -18,7 +16,7 @@ def handle_django_validation_error(
     exc: django.core.exceptions.ValidationError,
     router: NinjaAPI,
 ) -> HttpResponse:
-    logger.exception(exc)
+    report_error(request, exc, status.BAD_REQUEST)
 
     return router.create_response(
         request,
@@ -32,7 +30,7 @@ def handle_ninja_validation_error(
     exc: ninja_errors.ValidationError,
     router: NinjaAPI,
 ) -> HttpResponse:
-    logger.exception(exc)
+    report_error(request, exc, status.BAD_REQUEST)
     return router.create_response(
         request,
         error_schemas.ValidationError(message=exc.errors),
@@ -45,7 +43,7 @@ def handle_pydantic_validation_error(
     exc: pydantic_core.ValidationError,
     router: NinjaAPI,
 ) -> HttpResponse:
-    logger.exception(exc)
+    report_error(request, exc, status.BAD_REQUEST)
     return router.create_response(
         request,
         error_schemas.ValidationError(),
@@ -65,6 +63,18 @@ def handle_django_forbidden_error(
     )
 
 
+def handle_conflict_error(
+    request: HttpRequest,
+    exc: dnd_errors.ConflictError,
+    router: NinjaAPI,
+) -> HttpResponse:
+    return router.create_response(
+        request,
+        error_schemas.ConflictError(),
+        status=status.CONFLICT,
+    )
+
+
 def handle_django_not_found_error(
     request: HttpRequest,
     exc: Http404,
@@ -82,5 +92,6 @@ exception_handlers = [
     (ninja_errors.ValidationError, handle_ninja_validation_error),
     (pydantic_core.ValidationError, handle_pydantic_validation_error),
     (dnd_errors.ForbiddenError, handle_django_forbidden_error),
+    (dnd_errors.ConflictError, handle_conflict_error),
     (Http404, handle_django_not_found_error),
 ]
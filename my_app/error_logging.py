@@ -0,0 +1,155 @@
+"""
+Logging policy for errors turned into responses by my_app.error_handlers.
+
+Server errors (5xx) are always logged with their traceback. Client errors
+are expected from buggy or hostile clients and can arrive thousands of
+times a second, so they get a one-line summary at most: each exception
+type has a token bucket of ERROR_LOG["BURST"] lines refilled at
+ERROR_LOG["RATE"] per second, and once it is empty only a
+ERROR_LOG["SAMPLE"] share of errors is logged. Every error is counted
+either way; the counts are logged as one line every
+ERROR_LOG["FLUSH_SECONDS"], by a thread started with the first client
+error, so the end of a burst is logged too.
+"""
+
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+
+from django.conf import settings
+from django.http import HttpRequest
+
+logger = logging.getLogger("django")
+
+DETAIL_MAX_LENGTH = 200
+
+
+class ErrorLogPolicy:
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        sample: float,
+        flush_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.sample = sample
+        self.flush_seconds = flush_seconds
+        self.clock = clock
+        self.rng = rng
+
+        self._lock = threading.Lock()
+        # exception type -> (tokens, time of the last refill)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._counts: Counter = Counter()  # (type, status) -> errors
+        self._suppressed: Counter = Counter()
+        self._flushed_at = clock()
+        self._flusher: threading.Thread | None = None
+        self._closed = threading.Event()
+
+    def report(self, request: HttpRequest, exc: Exception, status: int):
+        if status >= 500:
+            logger.error(summary(request, exc, status), exc_info=exc)
+            return
+
+        name = type(exc).__name__
+        with self._lock:
+            self._start_flusher()
+            self._counts[name, status] += 1
+            if self._take_token(name):
+                sampled = False
+            elif self.rng() < self.sample:
+                sampled = True
+            else:
+                self._suppressed[name, status] += 1
+                self._flush_if_due()
+                return
+            self._flush_if_due()
+
+        line = summary(request, exc, status)
+        logger.warning(f"{line} sampled=true" if sampled else line)
+
+    def flush(self):
+        """Logs and resets the error counts."""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Stops the flushing thread."""
+        self._closed.set()
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(
+                target=self._flush_periodically,
+                name="error-log-flush",
+                daemon=True,
+            )
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_seconds):
+            with self._lock:
+                self._flush_if_due()
+
+    def _take_token(self, name: str) -> bool:
+        now = self.clock()
+        tokens, refilled_at = self._buckets.get(name, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - refilled_at) * self.rate)
+        taken = tokens >= 1
+        self._buckets[name] = (tokens - taken, now)
+        return taken
+
+    def _flush_if_due(self):
+        if self.clock() - self._flushed_at >= self.flush_seconds:
+            self._flush()
+
+    def _flush(self):
+        if self._counts:
+            counts = " ".join(
+                f"{name}/{status}={count}"
+                f"(suppressed={self._suppressed[name, status]})"
+                for (name, status), count in sorted(self._counts.items())
+            )
+            seconds = self.clock() - self._flushed_at
+            logger.warning(f"client errors in {seconds:.0f}s: {counts}")
+        self._counts.clear()
+        self._suppressed.clear()
+        self._flushed_at = self.clock()
+
+
+def summary(request: HttpRequest, exc: Exception, status: int) -> str:
+    detail = getattr(exc, "errors", None) or str(exc)
+    if callable(detail):  # pydantic
+        detail = detail(include_url=False)
+    if not isinstance(detail, str):
+        detail = json.dumps(detail, default=str, ensure_ascii=False)
+    detail = " ".join(detail.split())[:DETAIL_MAX_LENGTH]
+    return (
+        f"status={status} error={type(exc).__name__} "
+        f"method={request.method} path={request.path} "
+        f"detail={json.dumps(detail, ensure_ascii=False)}"
+    )
+
+
+@functools.cache
+def get_policy() -> ErrorLogPolicy:
+    config = settings.ERROR_LOG
+    return ErrorLogPolicy(
+        rate=config["RATE"],
+        burst=config["BURST"],
+        sample=config["SAMPLE"],
+        flush_seconds=config["FLUSH_SECONDS"],
+    )
+
+
+def report_error(request: HttpRequest, exc: Exception, status: int):
+    get_policy().report(request, exc, status)
@@ -1 +1,4 @@
 class ForbiddenError(Exception): ...
+
+
+class ConflictError(Exception): ...
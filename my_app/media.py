@@ -0,0 +1,36 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+)
+from django.utils._os import safe_join
+from django.utils.http import parse_etags
+
+from dnd.services.media_storage import get_media_storage
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def serve_blob(request: HttpRequest, name: str) -> HttpResponse:
+    """
+    Serves a file from the content-addressed media storage. Its name is
+    the hash of its content, so clients may cache the response forever.
+    """
+    storage = get_media_storage()
+    etag = f'"{name.rsplit("/", 1)[-1].split(".", 1)[0]}"'
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            path = safe_join(storage.location, name)
+            response = FileResponse(open(path, "rb"))  # noqa: SIM115
+        except (OSError, SuspiciousFileOperation) as e:
+            raise Http404(name) from e
+
+    response["ETag"] = etag
+    response["Cache-Control"] = IMMUTABLE
+    return response
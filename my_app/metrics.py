@@ -0,0 +1,102 @@
+"""
+Collects request metrics, see dnd.services.metrics. Put MetricsMiddleware
+first so the time of every other middleware is included.
+"""
+
+import hmac
+import time
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from ninja import Router
+from ninja.errors import HttpError
+
+from dnd.services import metrics
+
+
+router = Router()
+
+
+@router.get("metrics", include_in_schema=False)
+def metrics_api(request: HttpRequest):
+    token = settings.METRICS["TOKEN"]
+    if not token:
+        raise HttpError(404, "metrics are disabled")
+    sent = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(sent.encode(), f"Bearer {token}".encode()):
+        raise HttpError(401, "metrics need a valid bearer token")
+    return HttpResponse(
+        metrics.render_metrics(), content_type=metrics.CONTENT_TYPE
+    )
+
+
+def count_queries(sender, connection, **kwargs):
+    """connection_created receiver counting queries of requests."""
+    if metrics.count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.count_query)
+
+
+def operation_name(request: HttpRequest) -> str:
+    # route patterns, not paths, keep the number of series bounded
+    match = request.resolver_match
+    if match is None:
+        return "unmatched"
+    return f"{request.method} /{match.route}"
+
+
+def response_size(response: HttpResponse) -> int | None:
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with metrics.track_request() as stats:
+            response = self.get_response(request)
+        self.record(request, response, stats, started)
+        metrics.collector.flush()
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        started = time.perf_counter()
+        with metrics.track_request() as stats:
+            response = await self.get_response(request)
+        self.record(request, response, stats, started)
+        if metrics.collector.due():
+            # file I/O, keep it off the event loop
+            await sync_to_async(
+                metrics.collector.flush, thread_sensitive=False
+            )()
+        return response
+
+    def process_view(self, request: HttpRequest, view_func, args, kwargs):
+        stats = metrics.current_request()
+        if stats is not None:
+            stats.operation = operation_name(request)
+
+    @staticmethod
+    def record(request, response, stats, started):
+        stats.operation = operation_name(request)
+        metrics.record_request(
+            stats,
+            response.status_code,
+            time.perf_counter() - started,
+            response_size(response),
+        )
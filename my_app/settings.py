@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from my_app.database import database_config, replica_configs, sqlite_pragmas
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,7 +51,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "my_app.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "my_app.db_router.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -80,40 +84,30 @@ WSGI_APPLICATION = "my_app.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-# Default value
+# Configured through DATABASE and DB_* variables, see my_app/database.py
+
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+    "default": database_config(os.environ, BASE_DIR),
+    **replica_configs(os.environ, BASE_DIR),
 }
-# Handling environmental variables according to README.md
-database = os.environ.get("DATABASE")
-if not database:
-    if database == "SQLITE3":
-        DATABASES["default"] = {
-            "ENGINE": "django.db.backends.sqlite3",
-            "NAME": BASE_DIR / "db.sqlite3"
-            if not os.environ["NAME"]
-            else os.environ["NAME"],
-        }
-    elif database == "POSTRESQL":
-        DATABASES["default"] = {
-            "ENGINE": "django.db.backends.postgresql",
-            "NAME": "mydatabase"
-            if not os.environ["NAME"]
-            else os.environ["NAME"],
-            "USER": "mydatabaseuser"
-            if not os.environ["USER"]
-            else os.environ["USER"],
-            "PASSWORD": "mypassword"
-            if not os.environ["PASSWORD"]
-            else os.environ["PASSWORD"],
-            "HOST": "127.0.0.1"
-            if not os.environ["HOST"]
-            else os.environ["HOST"],
-            "PORT": "5432" if not os.environ["PORT"] else os.environ["PORT"],
-        }
+
+# GET requests read from a random replica, everything else and clients that
+# wrote within the last REPLICA_PIN_SECONDS go to default.
+# See my_app/db_router.py.
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["my_app.db_router.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "5"))
+
+# Tests read replicas through the primary and keep uploads in a temporary
+# media directory, see my_app/test_runner.py.
+
+TEST_RUNNER = "my_app.test_runner.TestRunner"
+
+# Opt-in SQLite tuning for several workers on one file (DB_SQLITE_TUNED),
+# applied to each new connection, see my_app/database.py.
+
+SQLITE_PRAGMAS = sqlite_pragmas(os.environ)
 
 
 # Password validation
@@ -152,7 +146,114 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Media files
+# Campaign icons and avatars live in a content-addressed store, see
+# dnd.services.media_storage; its URLs are served with immutable caching.
+
+MEDIA_URL = "/media/"
+# uploads outside the content-addressed store, such as pending campaign
+# icons and legacy character files; the project directory, as before
+MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", str(BASE_DIR)))
+MEDIA_BLOB_ROOT = Path(
+    os.getenv("MEDIA_BLOB_ROOT", str(BASE_DIR / "media" / "blobs"))
+)
+MEDIA_BLOB_URL = MEDIA_URL + "blobs/"
+MEDIA_GC_GRACE_SECONDS = int(os.getenv("MEDIA_GC_GRACE_SECONDS", "3600"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Character sheet storage: "database" keeps sheets in a JSON column,
+# "file" keeps the legacy one-file-per-character layout under MEDIA_ROOT.
+
+CHARACTER_STORAGE = os.getenv("CHARACTER_STORAGE", "database")
+
+# Parsed character sheets are cached in-process; set SHEET_CACHE_SHARED to
+# an alias from CACHES to also share them between workers.
+
+CHARACTER_SHEET_CACHE = {
+    "MAX_ENTRIES": int(os.getenv("SHEET_CACHE_MAX_ENTRIES", "1024")),
+    "MAX_BYTES": int(os.getenv("SHEET_CACHE_MAX_BYTES", str(64 * 2**20))),
+    "SHARED_CACHE": os.getenv("SHEET_CACHE_SHARED") or None,
+    "SHARED_TIMEOUT": int(os.getenv("SHEET_CACHE_SHARED_TIMEOUT", "300")),
+}
+
+# Batch character reads: max ids per request and threads reading sheets.
+
+CHARACTER_BATCH_MAX_IDS = int(os.getenv("CHARACTER_BATCH_MAX_IDS", "100"))
+CHARACTER_READ_WORKERS = int(os.getenv("CHARACTER_READ_WORKERS", "8"))
+
+# Rows fetched per database round trip while streaming campaign rosters.
+
+ROSTER_CHUNK_SIZE = int(os.getenv("ROSTER_CHUNK_SIZE", "200"))
+
+# Background jobs, run by `python manage.py run_worker`.
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", "10"))  # doubles per try
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_CLAIM_BATCH = 10
+
+# Limits for uploaded campaign icons, checked before pixels are decoded.
+
+CAMPAIGN_ICON_MAX_BYTES = int(os.getenv("ICON_MAX_BYTES", str(10 * 2**20)))
+CAMPAIGN_ICON_MAX_PIXELS = int(os.getenv("ICON_MAX_PIXELS", str(4096**2)))
+CAMPAIGN_ICON_FORMATS = ("PNG", "JPEG", "GIF", "WEBP")
+CAMPAIGN_ICON_THUMBNAIL_SIZES = (64, 128, 256)
+
+# Keyset pagination of the campaign list and its estimated total.
+
+CAMPAIGN_PAGE_DEFAULT_LIMIT = 50
+CAMPAIGN_PAGE_MAX_LIMIT = 200
+COUNT_ESTIMATE_CACHE_SECONDS = int(os.getenv("COUNT_ESTIMATE_TTL", "60"))
+
+# Campaign roles used by permission checks can be cached in this CACHES
+# alias. It must be shared by all worker processes (Redis, Memcached):
+# invalidations only reach the cache they are made in, so with a per-process
+# cache a demoted owner would keep passing checks in other workers for up to
+# TIMEOUT. Empty (the default) only memoizes roles within a request.
+
+ROLE_CACHE = {
+    "CACHE": os.getenv("ROLE_CACHE", ""),
+    "TIMEOUT": int(os.getenv("ROLE_CACHE_TIMEOUT", "60")),
+}
+
+# Max membership changes in one bulk request.
+
+MEMBERSHIP_BATCH_MAX = int(os.getenv("MEMBERSHIP_BATCH_MAX", "100"))
+
+# Client error logging, see my_app/error_logging.py: per exception type up
+# to BURST summary lines, refilled at RATE per second, then a SAMPLE share;
+# counts of all errors are logged every FLUSH_SECONDS. django.request would
+# log a line for every 4xx response on its own, so it only logs 5xx.
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "loggers": {
+        "django.request": {
+            "level": os.getenv("DJANGO_REQUEST_LOG_LEVEL", "ERROR"),
+        },
+    },
+}
+
+ERROR_LOG = {
+    "RATE": float(os.getenv("ERROR_LOG_RATE", "1")),
+    "BURST": int(os.getenv("ERROR_LOG_BURST", "10")),
+    "SAMPLE": float(os.getenv("ERROR_LOG_SAMPLE", "0.01")),
+    "FLUSH_SECONDS": int(os.getenv("ERROR_LOG_FLUSH_SECONDS", "60")),
+}
+
+# Request metrics served at /api/metrics to scrapers that send
+# "Authorization: Bearer <TOKEN>"; without a TOKEN the endpoint answers 404.
+# Worker processes write theirs to files in DIR at most every
+# FLUSH_SECONDS; with an empty DIR each process reports only its own.
+# gunicorn.conf.py sets one up. See dnd/services/metrics.py.
+
+METRICS = {
+    "TOKEN": os.getenv("METRICS_TOKEN", ""),
+    "DIR": os.getenv("METRICS_DIR", ""),
+    "FLUSH_SECONDS": float(os.getenv("METRICS_FLUSH_SECONDS", "5")),
+}
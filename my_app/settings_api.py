@@ -0,0 +1,27 @@
+"""
+API-only settings for the Telegram bot backend.
+
+Same as my_app.settings without the admin, auth, sessions, messages and
+static files apps and their middleware, so workers boot and answer faster.
+Select with DJANGO_SETTINGS_MODULE=my_app.settings_api.
+"""
+
+from my_app.settings import *  # noqa: F403
+
+INSTALLED_APPS = [
+    "dnd",
+]
+
+MIDDLEWARE = [
+    "my_app.metrics.MetricsMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "my_app.db_router.ReplicaMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "APP_DIRS": True,
+    },
+]
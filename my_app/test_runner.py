@@ -0,0 +1,41 @@
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Uploads and content-addressed blobs go to a temporary MEDIA_ROOT and
+    MEDIA_BLOB_ROOT, so tests never write to, and gc_media never sees test
+    files in, the real media directories.
+
+    Test databases are not replicated, so replicas are test mirrors of the
+    default database (see my_app/database.py). A mirror reads through its
+    own connection, which cannot see rows a TestCase writes inside its
+    transaction, so mirrored replicas are taken out of routing while tests
+    run; dnd.tests.test_replicas routes to them from a TransactionTestCase.
+    Replicas with their own test databases keep being routed to.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._media = tempfile.TemporaryDirectory(prefix="dnd-test-media-")
+        root = Path(self._media.name)
+        self._settings = override_settings(
+            MEDIA_ROOT=root,
+            MEDIA_BLOB_ROOT=root / "blobs",
+            DATABASE_REPLICAS=[
+                alias
+                for alias in settings.DATABASE_REPLICAS
+                if not settings.DATABASES[alias].get("TEST", {}).get("MIRROR")
+            ],
+        )
+        self._settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._settings.disable()
+        self._media.cleanup()
+        super().teardown_test_environment(**kwargs)